@@ -0,0 +1,75 @@
+# bench_gap_buffer.py
+# Measures how long GapBuffer takes to relocate the gap for random cursor
+# jumps on multi-megabyte documents.
+#
+# Usage:
+#   PYTHONPATH=./ python benchmarks/bench_gap_buffer.py [--sizes 1 4 10]
+import argparse
+import random
+import time
+from text_storage.gap_buffer import GapBuffer
+
+
+DEFAULT_SIZES_MB = [1, 4, 10]
+DEFAULT_JUMPS = 20
+GAP_SIZE = 1024
+
+
+def build_buffer(size: int) -> GapBuffer:
+    '''
+    Build a gap buffer holding `size` characters with the gap at the end.
+
+    Args:
+        size (int): The number of characters in the document.
+    Returns:
+        GapBuffer: The filled gap buffer.
+    '''
+    gap_buffer = GapBuffer(initial_size=size + GAP_SIZE)
+    gap_buffer.insert_text("x" * size)
+    return gap_buffer
+
+
+def time_random_jumps(gap_buffer: GapBuffer, jumps: int,
+                      seed: int = 0) -> list[float]:
+    '''
+    Move the cursor to random positions and time each move.
+
+    Args:
+        gap_buffer (GapBuffer): The buffer to move the cursor in.
+        jumps (int): The number of cursor moves to time.
+        seed (int): Seed for the random positions.
+    Returns:
+        list[float]: The latency of each move in seconds.
+    '''
+    rng = random.Random(seed)
+    length = gap_buffer.get_length()
+    latencies = []
+    for _ in range(jumps):
+        position = rng.randint(0, length)
+        start = time.perf_counter()
+        gap_buffer.move_cursor(position)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Random cursor jump latency for GapBuffer")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=DEFAULT_SIZES_MB,
+                        help="Document sizes in megabytes")
+    parser.add_argument("--jumps", type=int, default=DEFAULT_JUMPS,
+                        help="Number of random jumps per size")
+    args = parser.parse_args()
+
+    for size_mb in args.sizes:
+        gap_buffer = build_buffer(size_mb * 1024 * 1024)
+        latencies = time_random_jumps(gap_buffer, args.jumps)
+        mean_ms = sum(latencies) / len(latencies) * 1000
+        max_ms = max(latencies) * 1000
+        print(f"{size_mb:>4} MB: mean {mean_ms:9.3f} ms, "
+              f"max {max_ms:9.3f} ms over {args.jumps} jumps")
+
+
+if __name__ == "__main__":
+    main()
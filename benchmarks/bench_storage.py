@@ -0,0 +1,358 @@
+# bench_storage.py
+# Benchmarks every TextStorage backend and the editor operations built on
+# them: sequential typing, random cursor jumps, bulk insert/delete,
+# get_text, line wrapping and cursor mapping. Runs headless (no Tk).
+#
+# Reports ops/sec, latency percentiles and peak traced memory, and can
+# save the results as a baseline or fail when ops/sec drop below one.
+#
+# Usage:
+#   PYTHONPATH=./ python benchmarks/bench_storage.py
+#       [--backends gap_buffer rope] [--sizes 10KB 1MB 100MB]
+#       [--save-baseline baseline.json] [--baseline baseline.json]
+#       [--tolerance 0.25]
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from text_editor.editor_logic import EditorLogic
+from text_editor.layout import LayoutEngine
+from text_storage.gap_buffer import GapBuffer
+from text_storage.mapped_file import MappedFileStorage
+from text_storage.piece_table import PieceTable
+from text_storage.rope import Rope
+from text_storage.text_storage import TextStorage
+from text_storage.utf8_buffer import Utf8Buffer
+
+
+DEFAULT_SIZES = ["10KB", "1MB", "10MB", "100MB"]
+DEFAULT_TOLERANCE = 0.25
+SIZE_UNITS = {"KB": 1024, "MB": 1024 * 1024, "B": 1}
+BULK_SIZE = 4096
+MAX_CHARS_PER_LINE = 80
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur",
+         "adipiscing", "elit", "sed", "do", "eiusmod", "tempor"]
+
+
+def create_gap_buffer(text: str, path: str) -> GapBuffer:
+    '''
+    Create a gap buffer holding text, with room for the bulk inserts.
+    '''
+    gap_buffer = GapBuffer(initial_size=len(text) + BULK_SIZE)
+    gap_buffer.insert_text(text)
+    return gap_buffer
+
+
+# Each backend is created from the document's text and the path of a
+# file holding the same text
+BACKENDS = {
+    "gap_buffer": create_gap_buffer,
+    "piece_table": lambda text, path: PieceTable(text),
+    "rope": lambda text, path: Rope(text),
+    "mapped": lambda text, path: MappedFileStorage(path),
+    "utf8": lambda text, path: Utf8Buffer.from_file(path),
+}
+
+
+def parse_size(size: str) -> int:
+    '''
+    Parse a document size such as "10KB" or "100MB".
+
+    Args:
+        size (str): The size with an optional B, KB or MB suffix.
+    Returns:
+        int: The size in characters.
+    '''
+    size = size.upper()
+    for unit, factor in SIZE_UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+
+def make_document(size: int, seed: int = 0) -> str:
+    '''
+    Make a document of `size` ASCII characters, split into lines of
+    random words between 20 and 100 characters long.
+
+    Args:
+        size (int): The number of characters.
+        seed (int): Seed for the random words.
+    Returns:
+        str: The document.
+    '''
+    rng = random.Random(seed)
+    lines = []
+    # Build a few thousand distinct lines and repeat them
+    for _ in range(4096):
+        words = []
+        length = rng.randint(20, 100)
+        while sum(map(len, words)) + len(words) < length:
+            words.append(rng.choice(WORDS))
+        lines.append(" ".join(words))
+    block = "\n".join(lines) + "\n"
+    return (block * (size // len(block) + 1))[:size]
+
+
+# Operations
+# Each one runs `count` times on a storage and returns its latencies.
+
+def bench_typing(storage: TextStorage, rng: random.Random,
+                 count: int) -> list[float]:
+    '''Type characters one at a time at a random position.'''
+    editor_logic = EditorLogic(storage)
+    editor_logic.move_cursor(rng.randint(0, storage.get_length()))
+    return [_timed(editor_logic.insert_character, "x")
+            for _ in range(count)]
+
+
+def bench_random_jumps(storage: TextStorage, rng: random.Random,
+                       count: int) -> list[float]:
+    '''Move the cursor to random positions.'''
+    length = storage.get_length()
+    return [_timed(storage.move_cursor, rng.randint(0, length))
+            for _ in range(count)]
+
+
+def bench_bulk_insert(storage: TextStorage, rng: random.Random,
+                      count: int) -> list[float]:
+    '''Insert blocks of text at random positions.'''
+    text = "y" * BULK_SIZE
+    latencies = []
+    for _ in range(count):
+        position = rng.randint(0, storage.get_length())
+        latencies.append(_timed(_insert_at, storage, position, text))
+    return latencies
+
+
+def bench_bulk_delete(storage: TextStorage, rng: random.Random,
+                      count: int) -> list[float]:
+    '''Delete blocks of text at random positions.'''
+    latencies = []
+    for _ in range(count):
+        start = rng.randint(0, max(0, storage.get_length() - BULK_SIZE))
+        latencies.append(_timed(storage.delete_range, start,
+                                start + BULK_SIZE))
+    return latencies
+
+
+def bench_get_text(storage: TextStorage, rng: random.Random,
+                   count: int) -> list[float]:
+    '''Read the whole text.'''
+    return [_timed(storage.get_text) for _ in range(count)]
+
+
+def bench_line_wrapping(storage: TextStorage, rng: random.Random,
+                        count: int) -> list[float]:
+    '''Wrap random lines into rows, without a warm layout cache.'''
+    layout = LayoutEngine(EditorLogic(storage), MAX_CHARS_PER_LINE)
+    line_count = layout.get_line_count()
+    latencies = []
+    for _ in range(count):
+        line = rng.randrange(line_count)
+        layout.rows_cache.pop(line, None)
+        latencies.append(_timed(layout.get_rows, line))
+    return latencies
+
+
+def bench_cursor_mapping(storage: TextStorage, rng: random.Random,
+                         count: int) -> list[float]:
+    '''Map random offsets to rows and columns and back.'''
+    layout = LayoutEngine(EditorLogic(storage), MAX_CHARS_PER_LINE)
+    length = storage.get_length()
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        row, column = layout.offset_to_row_col(rng.randint(0, length))
+        layout.row_col_to_offset(row, column)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# Operation name: (function, number of operations)
+OPERATIONS = {
+    "typing": (bench_typing, 1000),
+    "random_jumps": (bench_random_jumps, 200),
+    "bulk_insert": (bench_bulk_insert, 50),
+    "bulk_delete": (bench_bulk_delete, 50),
+    "get_text": (bench_get_text, 3),
+    "line_wrapping": (bench_line_wrapping, 500),
+    "cursor_mapping": (bench_cursor_mapping, 500),
+}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    '''
+    Return the value at a fraction of a sorted list (nearest rank).
+    '''
+    index = min(len(sorted_values) - 1,
+                int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], peak_bytes: int) -> dict:
+    '''
+    Summarize the latencies of one operation.
+
+    Args:
+        latencies (list[float]): The latency of each call in seconds.
+        peak_bytes (int): The peak traced memory while it ran.
+    Returns:
+        dict: ops/sec, percentiles in milliseconds and peak memory.
+    '''
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": len(latencies) / total if total else float("inf"),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "peak_kb": peak_bytes / 1024,
+    }
+
+
+def run_benchmark(backend: str, text: str, path: str, operation: str,
+                  seed: int = 0) -> dict:
+    '''
+    Time one operation on a fresh storage, then run it again under
+    tracemalloc to measure its peak memory (tracing slows it down too
+    much to time it at the same time).
+
+    Args:
+        backend (str): The storage backend.
+        text (str): The document.
+        path (str): A file holding the document.
+        operation (str): The operation to run.
+        seed (int): Seed for the random positions.
+    Returns:
+        dict: The summary of the operation.
+    '''
+    function, count = OPERATIONS[operation]
+    storage = BACKENDS[backend](text, path)
+    latencies = function(storage, random.Random(seed), count)
+    _close(storage)
+
+    storage = BACKENDS[backend](text, path)
+    tracemalloc.start()
+    try:
+        function(storage, random.Random(seed), count)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        _close(storage)
+    return summarize(latencies, peak_bytes)
+
+
+def find_regressions(results: dict, baseline: dict,
+                     tolerance: float) -> list[str]:
+    '''
+    Compare results with a baseline.
+
+    Args:
+        results (dict): ops/sec summaries keyed by "backend/size/op".
+        baseline (dict): A previous run in the same format.
+        tolerance (float): The allowed drop in ops/sec, e.g. 0.25.
+    Returns:
+        list[str]: A message for each operation that got slower.
+    '''
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        expected = baseline[key]["ops_per_sec"]
+        actual = result["ops_per_sec"]
+        if actual < expected * (1 - tolerance):
+            regressions.append(
+                f"{key}: {actual:.0f} ops/sec, baseline {expected:.0f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the text storage backends")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS),
+                        default=list(BACKENDS),
+                        help="Backends to benchmark")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES,
+                        help="Document sizes, e.g. 10KB 1MB 100MB")
+    parser.add_argument("--operations", nargs="+",
+                        choices=list(OPERATIONS), default=list(OPERATIONS),
+                        help="Operations to benchmark")
+    parser.add_argument("--save-baseline", metavar="PATH",
+                        help="Write the results to a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="Fail if ops/sec fall below this baseline")
+    parser.add_argument("--tolerance", type=float,
+                        default=DEFAULT_TOLERANCE,
+                        help="Allowed drop in ops/sec against the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'backend':<12} {'size':>6} {'operation':<15} {'ops/sec':>11} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KB':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            text = make_document(parse_size(size))
+            path = os.path.join(directory, f"{size}.txt")
+            with open(path, "w", encoding="utf-8", newline="") as file:
+                file.write(text)
+
+            for backend in args.backends:
+                for operation in args.operations:
+                    result = run_benchmark(backend, text, path, operation)
+                    results[f"{backend}/{size}/{operation}"] = result
+                    print(f"{backend:<12} {size:>6} {operation:<15} "
+                          f"{result['ops_per_sec']:>11.0f} "
+                          f"{result['p50_ms']:>9.3f} "
+                          f"{result['p95_ms']:>9.3f} "
+                          f"{result['p99_ms']:>9.3f} "
+                          f"{result['peak_kb']:>10.0f}", flush=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+def _timed(function, *args) -> float:
+    '''
+    Call a function and return how long it took in seconds.
+    '''
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def _insert_at(storage: TextStorage, position: int, text: str):
+    '''
+    Insert text at a position of a storage.
+    '''
+    storage.move_cursor(position)
+    storage.insert_text(text)
+
+
+def _close(storage: TextStorage):
+    '''
+    Release a storage that holds a file open.
+    '''
+    close = getattr(storage, "close", None)
+    if close is not None:
+        close()
+
+
+if __name__ == "__main__":
+    main()
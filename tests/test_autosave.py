@@ -0,0 +1,136 @@
+import os
+import subprocess
+import sys
+import tempfile
+import pytest
+from text_editor.autosave import (Autosaver, JOURNAL_SUFFIX, find_recoveries,
+                                  get_recovery_path, has_recovery, recover)
+from text_editor.editor_logic import EditorLogic
+from text_storage.gap_buffer import GapBuffer
+from text_storage.piece_table import PieceTable
+
+@pytest.fixture
+def editor(tmp_path):
+    recovery_path = get_recovery_path(str(tmp_path / 'notes.txt'))
+    autosaver = Autosaver(recovery_path)
+    editor_logic = EditorLogic(PieceTable('first\nsecond\n'))
+    editor_logic.text_storage.subscribe(autosaver.record_changes)
+    yield editor_logic, autosaver
+    autosaver.close()
+
+def tick(editor_logic, autosaver):
+    autosaver.tick(editor_logic.text_storage)
+    autosaver.flush()
+
+def test_recovery_path_is_hidden_next_to_the_file(tmp_path):
+    assert get_recovery_path(str(tmp_path / 'notes.txt')) == \
+        str(tmp_path / '.notes.txt')
+
+def test_nothing_is_written_without_edits(editor):
+    editor_logic, autosaver = editor
+    tick(editor_logic, autosaver)
+    assert not has_recovery(autosaver.recovery_path)
+    assert autosaver.thread is None
+
+def test_recover_replays_the_journal(editor):
+    editor_logic, autosaver = editor
+    editor_logic.insert_text('new ')
+    tick(editor_logic, autosaver)
+    snapshot_id = autosaver.snapshot_id
+
+    editor_logic.move_cursor(10)
+    editor_logic.insert_character('"')
+    editor_logic.delete_range(0, 2)
+    editor_logic.undo()
+    editor_logic.insert_text('\r\n')
+    tick(editor_logic, autosaver)
+    assert autosaver.snapshot_id == snapshot_id
+    assert recover(autosaver.recovery_path) == editor_logic.get_text()
+    assert autosaver.error is None
+
+def test_journal_of_another_snapshot_is_ignored(editor):
+    editor_logic, autosaver = editor
+    editor_logic.insert_text('a')
+    tick(editor_logic, autosaver)
+    path = autosaver.recovery_path
+    with open(path + JOURNAL_SUFFIX, 'w') as file:
+        file.write('{"snapshot": "old"}\n[0, 0, "stale"]\n')
+    assert recover(path) == 'afirst\nsecond\n'
+
+def test_truncated_journal_entry_is_ignored(editor):
+    editor_logic, autosaver = editor
+    editor_logic.insert_text('a')
+    tick(editor_logic, autosaver)
+    editor_logic.insert_text('b')
+    tick(editor_logic, autosaver)
+    with open(autosaver.recovery_path + JOURNAL_SUFFIX, 'a') as file:
+        file.write('[3, 0, "cut sh')
+    assert recover(autosaver.recovery_path) == 'abfirst\nsecond\n'
+
+def test_large_journal_triggers_a_snapshot(editor, monkeypatch):
+    editor_logic, autosaver = editor
+    monkeypatch.setattr('text_editor.autosave.MAX_JOURNAL_SIZE', 100)
+    editor_logic.insert_text('a')
+    tick(editor_logic, autosaver)
+    first_id = autosaver.snapshot_id
+    editor_logic.insert_text('b' * 200)
+    tick(editor_logic, autosaver)
+    editor_logic.insert_text('c')
+    tick(editor_logic, autosaver)
+    assert autosaver.snapshot_id != first_id
+    assert recover(autosaver.recovery_path) == editor_logic.get_text()
+
+def test_discard_deletes_the_files(editor):
+    editor_logic, autosaver = editor
+    editor_logic.insert_text('a')
+    tick(editor_logic, autosaver)
+    autosaver.discard()
+    autosaver.flush()
+    assert not has_recovery(autosaver.recovery_path)
+    assert recover(autosaver.recovery_path) is None
+
+def test_copying_snapshots_are_spaced_by_length(tmp_path, monkeypatch):
+    monkeypatch.setattr('text_editor.autosave.MAX_JOURNAL_SIZE', 10)
+    monkeypatch.setattr('text_editor.autosave.SNAPSHOT_COPY_RATE', 100)
+    autosaver = Autosaver(get_recovery_path(str(tmp_path / 'notes.txt')))
+    editor_logic = EditorLogic(GapBuffer())
+    editor_logic.text_storage.subscribe(autosaver.record_changes)
+    editor_logic.insert_text('a' * 1000)
+    tick(editor_logic, autosaver)
+    first_id = autosaver.snapshot_id
+    # Copying 1000 characters waits 10 s, however long the journal
+    editor_logic.insert_text('b' * 50)
+    tick(editor_logic, autosaver)
+    assert autosaver.snapshot_id == first_id
+    assert recover(autosaver.recovery_path) == editor_logic.get_text()
+
+    autosaver.snapshot_time -= 11
+    editor_logic.insert_text('c')
+    tick(editor_logic, autosaver)
+    assert autosaver.snapshot_id != first_id
+    assert recover(autosaver.recovery_path) == editor_logic.get_text()
+    autosaver.close()
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+def test_untitled_recovery_files_are_per_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    recovery_path = get_recovery_path()
+    assert recovery_path == str(
+        tmp_path / f'text_editor_untitled-{os.getpid()}')
+
+    autosaver = Autosaver(recovery_path)
+    autosaver.save_snapshot(EditorLogic(PieceTable('mine')).text_storage)
+    autosaver.close()
+    # Files of this editor, or of one still running, are not offered
+    running_path = str(tmp_path / f'text_editor_untitled-{os.getppid()}')
+    os.rename(recovery_path + '.autosave', running_path + '.autosave')
+    assert find_recoveries() == []
+
+    exited_path = str(tmp_path / f'text_editor_untitled-{exited_pid()}')
+    os.rename(running_path + '.autosave', exited_path + '.autosave')
+    assert find_recoveries() == [exited_path]
+    assert recover(exited_path) == 'mine'
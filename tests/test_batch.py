@@ -0,0 +1,81 @@
+import json
+import pytest
+from text_editor.batch import get_output_path, load_script, run_batch
+
+SCRIPT = [
+    {"op": "move", "line": 1},
+    {"op": "insert", "text": "> "},
+    {"op": "replace", "find": "colour", "replace": "color"},
+    {"op": "move", "position": "end"},
+    {"op": "delete", "count": -1},
+]
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"file{i}.txt"
+        path.write_text(f"colour {i}\nsecond colour line\n")
+        paths.append(str(path))
+    return paths
+
+@pytest.mark.parametrize("backend", ["gap_buffer", "piece_table", "rope",
+                                     "mapped"])
+def test_run_batch_edits_files_in_place(files, backend):
+    results = run_batch(files, SCRIPT, backend, workers=1)
+    assert results == [(path, None) for path in files]
+    with open(files[2]) as file:
+        assert file.read() == "color 2\n> second color line"
+
+def test_run_batch_on_process_pool(files, tmp_path):
+    output_dir = str(tmp_path / "out")
+    results = run_batch(files, SCRIPT, "mapped", output_dir=output_dir,
+                        workers=2)
+    assert all(error is None for _, error in results)
+    with open(get_output_path(files[0], output_dir)) as file:
+        assert file.read() == "color 0\n> second color line"
+    # The inputs are untouched
+    with open(files[0]) as file:
+        assert file.read() == "colour 0\nsecond colour line\n"
+
+def test_run_batch_reports_missing_files(tmp_path):
+    missing = str(tmp_path / "missing.txt")
+    [(path, error)] = run_batch([missing], SCRIPT, "piece_table", workers=1)
+    assert path == missing
+    assert error
+
+def test_load_script_rejects_unknown_operations(tmp_path):
+    path = tmp_path / "script.json"
+    path.write_text(json.dumps([{"op": "insert", "text": "a"},
+                                {"op": "explode"}]))
+    with pytest.raises(ValueError, match="Operation 1"):
+        load_script(str(path))
+    path.write_text(json.dumps([{"op": "insert"}]))
+    with pytest.raises(ValueError, match="text"):
+        load_script(str(path))
+
+def test_run_batch_reports_files_in_another_encoding(tmp_path):
+    path = tmp_path / "latin1.txt"
+    path.write_bytes("colour café\n".encode("latin-1"))
+    [(_, error)] = run_batch([str(path)], SCRIPT, "mapped", workers=1)
+    assert error
+    assert path.read_bytes() == "colour café\n".encode("latin-1")
+
+@pytest.mark.parametrize("backend", ["piece_table", "mapped"])
+def test_backends_translate_newlines_alike(tmp_path, backend):
+    path = tmp_path / "crlf.txt"
+    path.write_bytes(b"colour 1\r\nsecond colour line\r\n")
+    assert run_batch([str(path)], SCRIPT, backend, workers=1) == [
+        (str(path), None)]
+    assert path.read_bytes() == b"color 1\n> second color line"
+
+@pytest.mark.parametrize("operation", [
+    {"op": "delete_range", "start": "0", "end": 3},
+    {"op": "delete", "count": True},
+    {"op": "insert", "text": 5},
+    {"op": "move", "position": "start"},
+    "insert",
+])
+def test_badly_typed_operations_are_rejected(files, operation):
+    with pytest.raises(ValueError, match="Operation 0"):
+        run_batch(files, [operation], "piece_table", workers=1)
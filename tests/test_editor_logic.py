@@ -1,10 +1,20 @@
 import pytest
 from text_editor.editor_logic import EditorLogic
 from text_storage.gap_buffer import GapBuffer
+from text_storage.piece_table import PieceTable
+from text_storage.rope import Rope
+from text_storage.utf8_buffer import Utf8Buffer
 
-@pytest.fixture
-def editor():
-    text_storage = GapBuffer(initial_size=50)
+STORAGE_FACTORIES = {
+    'gap_buffer': lambda: GapBuffer(initial_size=50),
+    'piece_table': PieceTable,
+    'rope': Rope,
+    'utf8_buffer': Utf8Buffer,
+}
+
+@pytest.fixture(params=STORAGE_FACTORIES)
+def editor(request):
+    text_storage = STORAGE_FACTORIES[request.param]()
     return EditorLogic(text_storage)
 
 def test_insert_character(editor):
@@ -83,3 +93,138 @@ def test_move_cursor_negative_position(editor):
     editor.insert_character('c')
     editor.move_cursor(-1)
     assert editor.cursor_position == 0  # Should be at the start of the text
+
+def test_insert_text(editor):
+    editor.insert_text('hello')
+    assert editor.get_text() == 'hello'
+    assert editor.cursor_position == 5
+
+def test_delete_range_before_cursor(editor):
+    editor.insert_text('hello world')
+    editor.delete_range(0, 6)
+    assert editor.get_text() == 'world'
+    assert editor.cursor_position == 5
+
+def test_delete_range_around_cursor(editor):
+    editor.insert_text('hello world')
+    editor.move_cursor(4)
+    editor.delete_range(2, 8)
+    editor.insert_character('_')
+    assert editor.get_text() == 'he_rld'
+    assert editor.cursor_position == 3
+
+def test_delete_range_after_cursor(editor):
+    editor.insert_text('hello world')
+    editor.move_cursor(1)
+    editor.delete_range(5, 20)
+    editor.insert_character('_')
+    assert editor.get_text() == 'h_ello'
+
+def test_save(editor, tmp_path):
+    editor.insert_text('saved\ntext')
+    path = tmp_path / 'saved.txt'
+    editor.save(str(path))
+    assert path.read_text() == 'saved\ntext'
+
+def test_get_range_and_lines(editor):
+    editor.insert_text('one\ntwo\nthree')
+    assert editor.get_length() == 13
+    assert editor.get_range(4, 7) == 'two'
+    assert editor.get_line_count() == 3
+    assert editor.get_line(2) == 'three'
+
+def test_typing_into_prefilled_storage_starts_at_the_beginning():
+    text_storage = GapBuffer(initial_size=50)
+    text_storage.insert_text('world')
+    editor = EditorLogic(text_storage)
+    editor.insert_character('!')
+    assert editor.get_text() == '!world'
+
+def test_multi_cursor_typing(editor):
+    editor.insert_text('ab\ncd\nef')
+    editor.move_cursor(0)
+    editor.add_cursor(3)
+    editor.add_cursor(6)
+    editor.insert_character('>')
+    editor.insert_character(' ')
+    assert editor.get_text() == '> ab\n> cd\n> ef'
+    assert editor.get_cursors() == [2, 7, 12]
+    assert editor.cursor_position == 2
+
+def test_multi_cursor_deletes_and_merges_cursors(editor):
+    editor.insert_text('xab')
+    editor.move_cursor(2)
+    editor.add_cursor(3)
+    editor.delete_character()
+    assert editor.get_text() == 'x'
+    assert editor.get_cursors() == [1]
+    editor.insert_text('yz')
+    editor.move_cursor(0)
+    editor.add_cursor(2)
+    editor.delete_next_character()
+    assert editor.get_text() == 'y'
+
+def test_multi_cursor_moves(editor):
+    editor.insert_text('abcd')
+    editor.move_cursor(0)
+    editor.add_cursor(2)
+    editor.move_left()
+    assert editor.get_cursors() == [0, 1]
+    editor.move_right()
+    editor.insert_character('-')
+    assert editor.get_text() == 'a-b-cd'
+    editor.move_cursor(0)
+    assert editor.get_cursors() == [0]
+
+def test_multi_cursor_step_is_one_undo_step(editor):
+    editor.insert_text('one\ntwo\nthree')
+    editor.move_cursor(3)
+    editor.add_cursor(7)
+    editor.add_cursor(13)
+    for char in '!!':
+        editor.insert_character(char)
+    editor.delete_character()
+    assert editor.get_text() == 'one!\ntwo!\nthree!'
+    editor.undo()
+    assert editor.get_text() == 'one!!\ntwo!!\nthree!!'
+    editor.undo()
+    assert editor.get_text() == 'one\ntwo\nthree'
+    assert editor.get_cursors() == [3, 7, 13]
+    editor.redo()
+    assert editor.get_text() == 'one!!\ntwo!!\nthree!!'
+    assert editor.get_cursors() == [5, 11, 19]
+
+def test_single_cursor_after_multi_cursor_editing(editor):
+    editor.insert_text('abc')
+    editor.move_cursor(3)
+    editor.add_cursor(0)
+    editor.insert_character('|')
+    editor.clear_cursors()
+    editor.insert_character('.')
+    assert editor.get_text() == '|abc|.'
+
+def test_storage_reports_each_operation(editor):
+    batches = []
+    editor.text_storage.subscribe(batches.append)
+    editor.insert_text('abc')
+    editor.delete_character()
+    editor.move_cursor(0)
+    editor.delete_next_character()
+    editor.undo()
+    assert [[change[:3] for change in batch] for batch in batches] == [
+        [(0, 0, 'abc')], [(2, 1, '')], [(0, 1, '')], [(0, 0, 'a')]]
+    versions = [batch[0].version for batch in batches]
+    assert versions == list(range(versions[0], versions[0] + 4))
+
+def test_multi_cursor_changes_arrive_together(editor):
+    editor.insert_text('ab\ncd')
+    batches = []
+    editor.text_storage.subscribe(batches.append)
+    editor.move_cursor(1)
+    editor.add_cursor(4)
+    editor.insert_character('x')
+    editor.replace_range(0, 2, 'yz')
+    editor.text_storage.unsubscribe(batches.append)
+    editor.undo()
+    assert [[change[:3] for change in batch] for batch in batches] == [
+        [(1, 0, 'x'), (5, 0, 'x')], [(0, 2, ''), (0, 0, 'yz')]]
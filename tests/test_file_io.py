@@ -0,0 +1,52 @@
+import os
+import pytest
+from text_storage.file_io import iter_file_chunks, save_storage
+from text_storage.piece_table import PieceTable
+from text_storage.rope import Rope
+from text_storage.mapped_file import MappedFileStorage
+
+TEXT = 'line one\nlínea dos €\n' * 100
+
+@pytest.fixture(params=[PieceTable, Rope])
+def storage(request):
+    return request.param(TEXT)
+
+def test_save_round_trip(storage, tmp_path):
+    path = tmp_path / 'out.txt'
+    save_storage(storage, str(path))
+    assert path.read_text(encoding='utf-8') == TEXT
+    assert os.listdir(tmp_path) == ['out.txt']
+
+def test_save_replaces_file_and_keeps_permissions(storage, tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('old')
+    os.chmod(path, 0o640)
+    save_storage(storage, str(path), encoding='utf-16')
+    assert path.read_text(encoding='utf-16') == TEXT
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+def test_failed_save_keeps_original(storage, tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('old')
+    with pytest.raises(UnicodeEncodeError):
+        save_storage(storage, str(path), encoding='ascii')
+    assert path.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['out.txt']
+
+def test_save_mapped_file_over_itself(tmp_path):
+    path = tmp_path / 'file.txt'
+    path.write_text(TEXT, encoding='utf-8')
+    storage = MappedFileStorage(str(path))
+    storage.insert_text('new first line\n')
+    save_storage(storage, str(path))
+    assert path.read_text(encoding='utf-8') == 'new first line\n' + TEXT
+    storage.close()
+
+def test_iter_file_chunks(tmp_path):
+    path = tmp_path / 'file.txt'
+    path.write_bytes('ünï\r\ncode\r€\n'.encode('utf-8') * 3)
+    chunks = list(iter_file_chunks(str(path), chunk_size=5,
+                                   first_chunk_size=2))
+    # Characters split between reads are decoded whole
+    assert ''.join(text for text, _ in chunks) == 'ünï\ncode\n€\n' * 3
+    assert [size for _, size in chunks][-1] == os.path.getsize(path)
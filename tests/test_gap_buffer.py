@@ -0,0 +1,58 @@
+import pytest
+from text_storage.gap_buffer import GapBuffer
+
+@pytest.fixture
+def gap_buffer():
+    return GapBuffer(initial_size=4)
+
+def insert_all(gap_buffer, text):
+    for char in text:
+        gap_buffer.insert(char)
+
+def test_latin_1_text_uses_one_byte_per_character(gap_buffer):
+    insert_all(gap_buffer, 'café' * 10)
+    assert gap_buffer.get_text() == 'café' * 10
+    assert len(gap_buffer.buffer) == 64  # 4 doubled four times
+
+def test_wide_character_widens_buffer(gap_buffer):
+    insert_all(gap_buffer, 'ab')
+    gap_buffer.move_cursor(1)
+    gap_buffer.insert('€')
+    assert gap_buffer.get_text() == 'a€b'
+    assert gap_buffer.char_size == 4
+    assert gap_buffer.get_length() == 3
+
+def test_edits_after_widening(gap_buffer):
+    insert_all(gap_buffer, 'x😀yz')
+    gap_buffer.move_cursor(2)
+    gap_buffer.delete()
+    gap_buffer.move_cursor(0)
+    gap_buffer.insert('>')
+    assert gap_buffer.get_text() == '>xyz'
+
+def test_move_cursor_is_bounded(gap_buffer):
+    insert_all(gap_buffer, 'abc')
+    gap_buffer.move_cursor(10)
+    gap_buffer.insert('!')
+    assert gap_buffer.get_text() == 'abc!'
+
+def test_move_cursor_across_many_characters(gap_buffer):
+    insert_all(gap_buffer, 'abcdefghij')
+    gap_buffer.move_cursor(2)
+    gap_buffer.insert('X')
+    gap_buffer.move_cursor(9)
+    gap_buffer.insert('Y')
+    assert gap_buffer.get_text() == 'abXcdefghYij'
+    assert gap_buffer.gap_start == 10
+
+def test_insert_text_expands_once(gap_buffer):
+    gap_buffer.insert_text('hello world')
+    assert gap_buffer.get_text() == 'hello world'
+    assert gap_buffer.gap_start == 11
+    assert len(gap_buffer.buffer) == 11
+
+def test_delete_range_leaves_cursor_at_start(gap_buffer):
+    gap_buffer.insert_text('hello world')
+    gap_buffer.delete_range(2, 7)
+    gap_buffer.insert('_')
+    assert gap_buffer.get_text() == 'he_orld'
@@ -0,0 +1,40 @@
+from text_editor.glyphs import GlyphWidths
+
+class FakeFont:
+    def __init__(self, widths=None):
+        self.widths = widths or {}
+        self.measured = []
+
+    def measure(self, text):
+        self.measured.append(text)
+        return sum(self.widths.get(char, 14 if ord(char) > 0x2e80 else 7)
+                   for char in text)
+
+def test_glyphs_are_measured_once():
+    font = FakeFont()
+    glyphs = GlyphWidths(font)
+    assert glyphs.is_monospace()
+    font.measured.clear()
+    assert glyphs.width('中') == 14
+    assert glyphs.width('中') == 14
+    assert glyphs.width('a') == 7
+    assert font.measured == ['中']
+
+def test_glyph_cache_is_bounded():
+    font = FakeFont()
+    glyphs = GlyphWidths(font, max_cached_glyphs=2)
+    for char in 'αβγ':
+        glyphs.width(char)
+    assert list(glyphs.glyph_widths) == ['β', 'γ']
+
+def test_positions_with_tabs_and_wide_glyphs():
+    glyphs = GlyphWidths(FakeFont())
+    assert list(glyphs.positions('ab')) == [0, 7, 14]
+    # Tabs advance to the next stop, eight zeros apart
+    assert list(glyphs.positions('a\tb')) == [0, 7, 56, 63]
+    assert list(glyphs.positions('中a\n')) == [0, 14, 21, 21]
+
+def test_proportional_font():
+    glyphs = GlyphWidths(FakeFont({'i': 3, 'W': 11}))
+    assert not glyphs.is_monospace()
+    assert list(glyphs.positions('iW')) == [0, 3, 14]
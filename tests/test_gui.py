@@ -1,7 +1,13 @@
+import subprocess
+import sys
+import tempfile
+import time
 import tkinter as tk
 import pytest
 from unittest.mock import MagicMock
+from text_editor.autosave import has_recovery, recover
 from text_editor.gui import TextEditorGUI
+from text_editor.loader import FileLoader
 from text_storage.gap_buffer import GapBuffer
 
 @pytest.fixture
@@ -10,6 +16,12 @@ def setup_gui():
     text_storage = GapBuffer(initial_size=50)
     gui = TextEditorGUI(root, text_storage)
     gui.editor_logic = MagicMock()
+    # Redraws read the (empty) text through these
+    gui.editor_logic.cursor_position = 0
+    gui.editor_logic.get_length.return_value = 0
+    gui.editor_logic.get_line_count.return_value = 1
+    gui.editor_logic.get_line_number.return_value = 0
+    gui.editor_logic.get_line_start.return_value = 0
     yield gui
     root.destroy()
 
@@ -21,4 +33,169 @@ def test_on_key_press_inserts_character(setup_gui):
 def test_on_key_press_handles_return(setup_gui):
     event = type("DummyEvent", (), {"char": "\r", "keysym": "Return"})()
     setup_gui.on_key_press(event)
-    setup_gui.editor_logic.insert_character.assert_called_with("\r")
\ No newline at end of file
+    setup_gui.editor_logic.insert_character.assert_called_with("\n")
+
+def test_on_key_press_escape_clears_cursors(setup_gui):
+    event = type("DummyEvent", (), {"char": "\x1b", "keysym": "Escape"})()
+    setup_gui.on_key_press(event)
+    setup_gui.editor_logic.clear_cursors.assert_called_once_with()
+    setup_gui.editor_logic.insert_character.assert_not_called()
+
+def test_on_key_press_inserts_tab(setup_gui):
+    event = type("DummyEvent", (), {"char": "\t", "keysym": "Tab"})()
+    setup_gui.on_key_press(event)
+    setup_gui.editor_logic.insert_character.assert_called_with("\t")
+
+@pytest.fixture
+def long_document_gui():
+    root = tk.Tk()
+    text_storage = GapBuffer(initial_size=50)
+    text_storage.insert_text('\n'.join(f'line {i}' for i in range(1000)))
+    gui = TextEditorGUI(root, text_storage)
+    gui.redraw()
+    yield gui
+    root.destroy()
+
+def test_redraw_only_creates_items_for_visible_rows(long_document_gui):
+    visible_rows = long_document_gui._get_visible_row_count()
+    assert len(long_document_gui.row_items) <= visible_rows
+
+def test_scroll_reuses_canvas_items(long_document_gui):
+    items = list(long_document_gui.row_items)
+    long_document_gui.on_scroll('moveto', 0.5)
+    long_document_gui.flush_redraw()
+    assert long_document_gui.scroll_row == 500
+    assert long_document_gui.row_items == items
+    assert long_document_gui.rendered_rows[0] == 'line 500\n'
+
+def test_key_presses_are_painted_once(long_document_gui, monkeypatch):
+    paints = []
+    render_text = long_document_gui.render_text
+    monkeypatch.setattr(long_document_gui, 'render_text',
+                        lambda lines: paints.append(lines) or render_text(lines))
+    for char in 'abc':
+        event = type("DummyEvent", (), {"char": char, "keysym": char})()
+        long_document_gui.on_key_press(event)
+    assert paints == []
+    assert long_document_gui.redraw_pending is not None
+
+    long_document_gui.flush_redraw()
+    assert len(paints) == 1
+    assert long_document_gui.rendered_rows[0] == 'abcline 0\n'
+    assert long_document_gui.redraw_pending is None
+
+def test_scrollbar_drag_is_painted_once(long_document_gui, monkeypatch):
+    paints = []
+    render_text = long_document_gui.render_text
+    monkeypatch.setattr(long_document_gui, 'render_text',
+                        lambda lines: paints.append(lines) or render_text(lines))
+    for fraction in ('0.1', '0.2', '0.3'):
+        long_document_gui.on_scroll('moveto', fraction)
+    assert paints == []
+
+    long_document_gui.flush_redraw()
+    assert len(paints) == 1
+    assert long_document_gui.rendered_rows[0] == 'line 300\n'
+
+def test_cursor_move_does_not_repaint_text(long_document_gui, monkeypatch):
+    paints = []
+    monkeypatch.setattr(long_document_gui, 'render_text', paints.append)
+    event = type("DummyEvent", (), {"char": "", "keysym": "Right"})()
+    long_document_gui.on_key_press(event)
+    long_document_gui.flush_redraw()
+    assert paints == []
+    assert long_document_gui.editor_logic.cursor_position == 1
+
+def test_find_bar_moves_cursor_to_match(long_document_gui):
+    long_document_gui.on_find()
+    long_document_gui.find_bar.insert(0, 'line 12')
+    long_document_gui.on_find_typed()
+    text = long_document_gui.editor_logic.get_text()
+    expected = text.index('line 12') + len('line 12')
+    assert long_document_gui.editor_logic.cursor_position == expected
+    long_document_gui.on_find_next()
+    expected = text.index('line 120') + len('line 12')
+    assert long_document_gui.editor_logic.cursor_position == expected
+
+def test_multi_cursor_typing_updates_every_row(long_document_gui):
+    editor_logic = long_document_gui.editor_logic
+    editor_logic.add_cursor(editor_logic.get_line_start(1))
+    editor_logic.add_cursor(editor_logic.get_line_start(2))
+    event = type("DummyEvent", (), {"char": "#", "keysym": "numbersign"})()
+    long_document_gui.on_key_press(event)
+    long_document_gui.flush_redraw()
+    assert long_document_gui.rendered_rows[:3] == [
+        '#line 0\n', '#line 1\n', '#line 2\n']
+    assert len(long_document_gui.secondary_cursor_items) == 2
+
+def test_file_loads_progressively(tmp_path):
+    path = tmp_path / 'long.txt'
+    text = ''.join(f'line {i}\n' for i in range(20000))
+    path.write_text(text)
+    root = tk.Tk()
+    gui = TextEditorGUI(root, GapBuffer(initial_size=50))
+    gui.start_loading(FileLoader(str(path)))
+    # The text is read-only while it loads
+    event = type("DummyEvent", (), {"char": "a", "keysym": "a"})()
+    gui.on_key_press(event)
+    for char, keysym in (("\x1b", "Escape"), ("\t", "Tab"),
+                         ("\r", "Return"), ("\x08", "BackSpace")):
+        gui.on_key_press(
+            type("DummyEvent", (), {"char": char, "keysym": keysym})())
+
+    deadline = time.monotonic() + 5
+    while gui.loader is not None and time.monotonic() < deadline:
+        gui._on_load_timer()
+    assert gui.editor_logic.get_text() == text
+    assert gui.layout.visual_line_count() == 20001
+    assert gui.editor_logic.cursor_position == 0
+    # The file holds the loaded text, so only edits are journaled
+    assert gui.autosaver.pending == []
+    gui.on_key_press(event)
+    assert gui.editor_logic.get_range(0, 6) == 'aline '
+    assert gui.autosaver.pending == [(0, 0, 'a')]
+    gui.autosaver.close()
+    root.destroy()
+
+def test_python_files_are_highlighted(tmp_path):
+    root = tk.Tk()
+    text_storage = GapBuffer(initial_size=50)
+    text_storage.insert_text('def f():\n    return "x"  # done\n' * 500)
+    gui = TextEditorGUI(root, text_storage,
+                        file_path=str(tmp_path / 'module.py'))
+    gui.redraw()
+    assert gui.rendered_rows[0] == 'def f():\n'
+    # Runs are placed at the x of their first character
+    assert gui.rendered_runs[0] == ('', (
+        (0, 'keyword', 'def'), (4 * gui.char_width, 'definition', 'f'),
+        (5 * gui.char_width, None, '():\n')))
+    # Opening a string recolors the rows after it on the next paint
+    gui.editor_logic.move_cursor(0)
+    event = type("DummyEvent", (), {"char": "'", "keysym": "apostrophe"})()
+    for _ in range(3):
+        gui.on_key_press(event)
+    gui.flush_redraw()
+    assert gui.rendered_runs[1] == ('', (
+        (0, 'string', '    return "x"  # done'),))
+    gui.autosaver.close()
+    root.destroy()
+
+def test_untitled_recovery_of_an_exited_editor(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    other_path = str(tmp_path / f'text_editor_untitled-{process.pid}')
+    with open(other_path + '.autosave', 'w') as file:
+        file.write('{"snapshot": "lost"}\nunsaved text')
+    monkeypatch.setattr('text_editor.gui.messagebox.askyesno',
+                        lambda *args: True)
+
+    root = tk.Tk()
+    gui = TextEditorGUI(root, GapBuffer(initial_size=50))
+    gui.offer_recovery()
+    assert gui.editor_logic.get_text() == 'unsaved text'
+    # The text moved to this editor's own recovery files
+    assert not has_recovery(other_path)
+    assert recover(gui.autosaver.recovery_path) == 'unsaved text'
+    gui.autosaver.close(discard=True)
+    root.destroy()
@@ -0,0 +1,97 @@
+import random
+import pytest
+from text_editor import highlighter
+from text_editor.editor_logic import EditorLogic
+from text_editor.highlighter import NORMAL, Highlighter, PythonLexer, get_lexer
+from text_storage.piece_table import PieceTable
+
+SOURCE = '''@decorator
+def f(x):
+    """doc
+    more"""
+    return len(x)  # comment
+'''
+
+def full_states(text):
+    lexer = PythonLexer()
+    states = []
+    state = NORMAL
+    for line in text.split('\n'):
+        state = lexer.lex_line(line, state)[1]
+        states.append(state)
+    return states
+
+def test_lex_line_tokens():
+    lexer = PythonLexer()
+    tokens, state = lexer.lex_line('def f(x): return len("a") + 1  # c',
+                                   NORMAL)
+    assert state == NORMAL
+    assert [kind for _, _, kind in tokens] == [
+        'keyword', 'definition', 'keyword', 'builtin', 'string', 'number',
+        'comment']
+    assert tokens[4] == (21, 24, 'string')
+
+def test_triple_quoted_strings_carry_state():
+    lexer = PythonLexer()
+    assert lexer.lex_line('x = """doc', NORMAL) == (
+        [(4, 10, 'string')], '"""')
+    assert lexer.lex_line('still doc', '"""') == ([(0, 9, 'string')], '"""')
+    tokens, state = lexer.lex_line('end""" if x', '"""')
+    assert state == NORMAL
+    assert tokens == [(0, 6, 'string'), (7, 9, 'keyword')]
+    assert lexer.end_state('a = \'\'\'', NORMAL) == "'''"
+
+def test_get_lexer_by_extension():
+    assert isinstance(get_lexer('module.py'), PythonLexer)
+    assert get_lexer('notes.txt') is None
+    assert get_lexer(None) is None
+
+def test_edit_relexes_until_states_converge():
+    editor = EditorLogic(PieceTable(SOURCE * 1000))
+    hl = Highlighter(editor, PythonLexer())
+    assert hl.lex_to(editor.get_line_count())
+    assert hl.get_tokens(1) == [(0, 3, 'keyword'), (4, 5, 'definition')]
+
+    # Typing inside a line does not change the state it ends in, so only
+    # that line is lexed again
+    editor.move_cursor(editor.get_line_start(10))
+    editor.insert_character('x')
+    hl.lines_changed(10, 0)
+    assert not hl.is_lexed(11)
+    hl.lex_to(11)
+    assert hl.valid_lines == editor.get_line_count()
+
+    # Opening a string changes every line after it
+    editor.move_cursor(0)
+    editor.insert_text('"""\n')
+    hl.lines_changed(0, 1)
+    assert hl.lex_to(editor.get_line_count())
+    assert hl.states == full_states(editor.get_text())
+
+def test_lex_to_stops_at_deadline():
+    editor = EditorLogic(PieceTable(SOURCE * 1000))
+    hl = Highlighter(editor, PythonLexer())
+    assert not hl.lex_to(editor.get_line_count(), deadline=0)
+    assert hl.get_tokens(10) is None
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_edits_match_full_lex(seed, monkeypatch):
+    monkeypatch.setattr(highlighter, 'LEX_BATCH_LINES', 3)
+    rng = random.Random(seed)
+    editor = EditorLogic(PieceTable(SOURCE * 20))
+    hl = Highlighter(editor, PythonLexer())
+    pieces = ['"""', "'''", '\n', 'x', ' # """', '\\"""']
+    for _ in range(100):
+        line_count = editor.get_line_count()
+        position = rng.randrange(editor.get_length() + 1)
+        editor.move_cursor(position)
+        first_line = editor.get_line_number(position)
+        if rng.random() < 0.3 and position < editor.get_length():
+            editor.delete_range(position,
+                                min(editor.get_length(), position + 5))
+        else:
+            editor.insert_text(rng.choice(pieces))
+        hl.lines_changed(first_line, editor.get_line_count() - line_count)
+        hl.lex_to(rng.randrange(editor.get_line_count() + 1))
+    hl.lex_to(editor.get_line_count())
+    assert hl.states == full_states(editor.get_text())
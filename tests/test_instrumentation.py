@@ -0,0 +1,57 @@
+import pstats
+from text_editor.instrumentation import (Instrumentation, LatencyHistogram,
+                                         PROFILE_ENV_VAR, STATS_ENV_VAR)
+from text_storage.gap_buffer import GapBuffer
+
+def test_histogram_percentiles_bound_the_samples():
+    histogram = LatencyHistogram()
+    for microseconds in range(1, 101):
+        histogram.record(microseconds / 1_000_000)
+    assert histogram.count == 100
+    assert 0.000050 <= histogram.percentile(0.5) <= 0.000064
+    assert histogram.percentile(1.0) == histogram.max
+
+def test_disabled_instrumentation_records_nothing():
+    instrumentation = Instrumentation()
+    instrumentation.event_started()
+    instrumentation.phase_done("storage")
+    instrumentation.count("canvas_items_created")
+    assert instrumentation.histograms == {}
+    assert instrumentation.counters == {}
+
+def test_event_to_paint_covers_every_phase():
+    instrumentation = Instrumentation(enabled=True)
+    instrumentation.event_started()
+    instrumentation.phase_done("storage")
+    instrumentation.phase_done("layout")
+    instrumentation.paint_started()
+    instrumentation.paint_done()
+    histograms = instrumentation.histograms
+    assert set(histograms) == {"storage", "layout", "paint",
+                               "event_to_paint"}
+    assert histograms["event_to_paint"].total >= histograms["paint"].total
+
+def test_report_includes_gap_buffer_counters(tmp_path):
+    gap_buffer = GapBuffer(initial_size=4)
+    gap_buffer.insert_text("hello world")
+    gap_buffer.move_cursor(0)
+    instrumentation = Instrumentation(enabled=True)
+    instrumentation.count("canvas_items_created", 3)
+    path = tmp_path / "stats.txt"
+    instrumentation.dump(str(path), gap_buffer)
+    report = path.read_text()
+    assert "gap_moves                1" in report
+    assert "gap_expansions           1" in report
+    assert "canvas_items_created     3" in report
+
+def test_environment_enables_stats_and_profile(tmp_path, monkeypatch):
+    stats_path = tmp_path / "stats.txt"
+    profile_path = tmp_path / "editor.prof"
+    monkeypatch.setenv(STATS_ENV_VAR, str(stats_path))
+    monkeypatch.setenv(PROFILE_ENV_VAR, str(profile_path))
+    instrumentation = Instrumentation.from_environment()
+    assert instrumentation.enabled
+    assert instrumentation.profiler is not None
+    instrumentation.close()
+    assert stats_path.exists()
+    pstats.Stats(str(profile_path))
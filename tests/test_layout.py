@@ -0,0 +1,130 @@
+import random
+import pytest
+from text_editor.editor_logic import EditorLogic
+from text_editor.glyphs import GlyphWidths
+from text_editor import layout as layout_module
+from text_editor.layout import LayoutEngine
+from text_editor.utils import split_text_into_lines
+from text_storage.piece_table import PieceTable
+
+@pytest.fixture
+def editor():
+    return EditorLogic(PieceTable('short\na much longer line of text\n\nend'))
+
+def all_rows(layout):
+    return [row for line in range(layout.get_line_count())
+            for row in layout.get_rows(line)]
+
+def edit(editor, layout, action):
+    line_count = editor.get_line_count()
+    first_line = editor.get_line_number(editor.cursor_position)
+    action()
+    cursor_line = editor.get_line_number(editor.cursor_position)
+    layout.lines_changed(min(first_line, cursor_line),
+                         editor.get_line_count() - line_count)
+
+def test_rows_match_split_text_into_lines(editor):
+    layout = LayoutEngine(editor, 8)
+    assert all_rows(layout) == split_text_into_lines(editor.get_text(), 8)
+    assert layout.visual_line_count() == len(all_rows(layout))
+    assert layout.rows_before(2) == 5
+
+def test_width_change_recounts_rows(editor):
+    layout = LayoutEngine(editor, 8)
+    layout.get_rows(1)
+    layout.set_max_chars_per_line(4)
+    assert layout.rows_cache == {}
+    assert all_rows(layout) == split_text_into_lines(editor.get_text(), 4)
+    assert layout.visual_line_count() == len(all_rows(layout))
+
+def test_edits_only_rewrap_touched_lines(editor):
+    layout = LayoutEngine(editor, 8)
+    all_rows(layout)
+    editor.move_cursor(2)
+    edit(editor, layout, lambda: editor.insert_text('\nxy'))
+    assert 0 not in layout.rows_cache
+    assert layout.rows_cache[2] == ['a much l', 'onger li', 'ne of te',
+                                    'xt\n']
+
+def test_random_edits_keep_layout_in_sync(editor):
+    rng = random.Random(0)
+    layout = LayoutEngine(editor, 5)
+    for _ in range(300):
+        editor.move_cursor(rng.randint(0, editor.get_length()))
+        if rng.random() < 0.6:
+            text = ''.join(rng.choice('ab\n') for _ in range(rng.randint(1, 9)))
+            edit(editor, layout, lambda: editor.insert_text(text))
+        else:
+            start = editor.cursor_position
+            end = start + rng.randint(1, 9)
+            edit(editor, layout, lambda: editor.delete_range(start, end))
+        expected = split_text_into_lines(editor.get_text(), 5) or ['']
+        # Only the lines drawn so far are cached
+        layout.get_rows(rng.randrange(layout.get_line_count()))
+        assert all_rows(layout) == expected
+        assert layout.visual_line_count() == len(expected)
+
+def test_offset_row_col_round_trip(editor):
+    layout = LayoutEngine(editor, 8)
+    text = editor.get_text()
+    rows = split_text_into_lines(text, 8)
+    for offset in range(len(text) + 1):
+        row, column = layout.offset_to_row_col(offset)
+        assert sum(len(r) for r in rows[:row]) + column == offset
+        assert layout.row_col_to_offset(row, column) == offset
+
+def test_row_col_to_offset_clamps_to_row(editor):
+    layout = LayoutEngine(editor, 8)
+    assert layout.row_col_to_offset(0, 50) == 5  # Before the newline
+    assert layout.row_col_to_offset(1, 50) == 13  # Stays on the row
+    assert layout.row_col_to_offset(99, 0) == editor.get_length()
+    assert layout.line_at_row(4) == (1, 1)
+
+class ProportionalFont:
+    def measure(self, text):
+        return sum(3 if char == 'i' else 7 for char in text)
+
+def test_proportional_rows_wrap_by_width():
+    editor = EditorLogic(PieceTable('iiiiiiiiii\nmmmmmmmmmm\n' * 3))
+    layout = LayoutEngine(editor,
+                          glyph_widths=GlyphWidths(ProportionalFont()))
+    layout.set_max_width(30)
+    # Rows are estimated from the average width until laid out
+    estimate = layout.visual_line_count()
+    assert layout.get_rows(0) == ['iiiiiiiiii\n']
+    assert layout.get_rows(1) == ['mmmm', 'mmmm', 'mm\n']
+    assert layout.get_row_count(0) == 1 and layout.get_row_count(1) == 3
+    all_rows(layout)
+    assert layout.visual_line_count() == 13 != estimate
+    assert layout.offset_to_row_col(11 + 9) == (3, 1)
+    assert layout.row_col_to_offset(3, 1) == 20
+
+def test_x_and_column_round_trip():
+    editor = EditorLogic(PieceTable('mimi\tm\n'))
+    layout = LayoutEngine(editor, 80,
+                          glyph_widths=GlyphWidths(ProportionalFont()))
+    for column in range(7):
+        assert layout.x_to_column(0, layout.column_to_x(0, column)) == column
+    # Clicks land in the nearest gap
+    assert layout.x_to_column(0, 8) == 1
+    assert layout.x_to_column(0, 9) == 2
+
+def test_long_texts_are_not_read_to_count_rows(monkeypatch):
+    monkeypatch.setattr(layout_module, 'MAX_COUNTED_LENGTH', 10)
+    editor = EditorLogic(PieceTable('ab\n' + 'c' * 20 + '\nd\ne'))
+    def read_everything():
+        raise AssertionError('all line lengths were read')
+    monkeypatch.setattr(editor, 'get_line_lengths', read_everything)
+    layout = LayoutEngine(editor, 4)
+    # Every line is estimated from the average line length
+    assert [layout.get_row_count(i) for i in range(4)] == [2, 2, 2, 2]
+    assert layout.offset_to_row_col(3 + 20) == (2 + 5, 0)
+    assert layout.get_row_count(1) == 6
+    assert layout.get_rows(0) == ['ab\n']
+    assert layout.get_row_count(0) == 1
+    # A width change keeps the counts until lines are laid out again
+    layout.set_max_chars_per_line(8)
+    assert layout.rows_cache == {}
+    assert layout.get_row_count(1) == 6
+    assert all_rows(layout) == split_text_into_lines(editor.get_text(), 8)
+    assert layout.visual_line_count() == len(all_rows(layout))
@@ -0,0 +1,55 @@
+import time
+import pytest
+import text_editor.loader as loader_module
+from text_editor.loader import FileLoader
+
+def read_all(loader, timeout=5):
+    chunks = []
+    deadline = time.monotonic() + timeout
+    while not loader.done and time.monotonic() < deadline:
+        chunk = loader.get_chunk()
+        if chunk is not None:
+            chunks.append(chunk)
+    return chunks
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(loader_module, 'FIRST_CHUNK_SIZE', 4)
+    monkeypatch.setattr(loader_module, 'LOAD_CHUNK_SIZE', 16)
+    monkeypatch.setattr(loader_module, 'MAX_QUEUED_CHUNKS', 2)
+
+def test_loads_file_in_chunks(tmp_path, small_chunks):
+    path = tmp_path / 'file.txt'
+    text = ''.join(f'line {i}\n' for i in range(50))
+    path.write_text(text)
+    loader = FileLoader(str(path))
+    assert loader.progress() == 0
+    loader.start()
+    chunks = read_all(loader)
+    assert loader.done and loader.error is None
+    assert chunks[0] == text[:4]
+    assert ''.join(chunks) == text
+    assert loader.progress() == 1.0
+
+def test_reports_decode_errors(tmp_path, small_chunks):
+    path = tmp_path / 'file.txt'
+    path.write_bytes(b'valid text\xff\xfe')
+    loader = FileLoader(str(path))
+    loader.start()
+    read_all(loader)
+    assert loader.done
+    assert isinstance(loader.error, UnicodeDecodeError)
+
+def test_cancel_stops_the_reader(tmp_path, small_chunks):
+    path = tmp_path / 'file.txt'
+    path.write_text('x' * 1000)
+    loader = FileLoader(str(path))
+    loader.start()
+    loader.cancel()
+    loader.thread.join(timeout=5)
+    assert not loader.thread.is_alive()
+    assert loader.get_chunk() is None
+
+def test_missing_file(tmp_path):
+    with pytest.raises(OSError):
+        FileLoader(str(tmp_path / 'missing.txt'))
@@ -0,0 +1,40 @@
+import os
+import pytest
+from unittest.mock import MagicMock
+from text_storage.gap_buffer import GapBuffer
+
+@pytest.fixture
+def main(monkeypatch):
+    # main.py is run as a script, with its own directory on the path
+    monkeypatch.syspath_prepend(os.path.join(
+        os.path.dirname(__file__), os.pardir, 'text_editor'))
+    import main
+    monkeypatch.setattr(main, 'messagebox', MagicMock())
+    return main
+
+@pytest.fixture
+def invalid_file(tmp_path):
+    path = tmp_path / 'latin1.txt'
+    path.write_bytes('café\n'.encode('latin-1'))
+    return str(path)
+
+def test_open_storage_without_a_file(main):
+    text_storage, loader = main.open_storage('gap_buffer')
+    assert isinstance(text_storage, GapBuffer)
+    assert loader is None
+
+def test_invalid_utf8_is_reported_by_mapped_storage(main, invalid_file):
+    assert main.open_storage('mapped', invalid_file) is None
+    title, message = main.messagebox.showerror.call_args.args
+    assert title == 'Open Error'
+    assert "can't decode" in message
+
+def test_invalid_utf8_is_reported_by_utf8_storage(main, invalid_file):
+    assert main.open_storage('utf8', invalid_file) is None
+    title, message = main.messagebox.showerror.call_args.args
+    assert title == 'Open Error'
+    assert "can't decode" in message
+
+def test_missing_file_is_reported(main, tmp_path):
+    assert main.open_storage('mapped', str(tmp_path / 'missing')) is None
+    main.messagebox.showerror.assert_called_once()
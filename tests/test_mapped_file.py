@@ -0,0 +1,83 @@
+import pytest
+import text_storage.mapped_file as mapped_file
+from text_storage.mapped_file import MappedFileStorage
+
+TEXT = 'plain line\nünïcode line €\n\nlast line'
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    # Small pages so the text spans many of them
+    monkeypatch.setattr(mapped_file, 'PAGE_SIZE', 7)
+    path = tmp_path / 'file.txt'
+    path.write_bytes(TEXT.encode('utf-8'))
+    storage = MappedFileStorage(str(path))
+    yield storage
+    storage.close()
+
+def test_reads_file_lazily(storage):
+    assert storage.get_length() == len(TEXT)
+    assert storage.page_cache == {}
+    assert storage.get_range(11, 18) == 'ünïcode'
+    assert 0 < len(storage.page_cache) < len(storage.page_byte_starts) - 1
+    assert storage.get_text() == TEXT
+
+def test_line_queries(storage):
+    assert storage.line_count() == 4
+    assert [storage.get_line(i) for i in range(4)] == TEXT.split('\n')
+    assert storage.line_of(len(TEXT)) == 3
+    assert storage.offset_of(2) == TEXT.index('\n\n') + 1
+
+def test_edits_do_not_touch_the_file(storage, tmp_path):
+    storage.move_cursor(11)
+    storage.insert_text('new\n')
+    storage.delete_range(0, 6)
+    assert storage.get_text() == 'line\nnew\n' + TEXT[11:]
+    assert storage.line_count() == 5
+    assert storage.get_line(1) == 'new'
+    assert (tmp_path / 'file.txt').read_bytes() == TEXT.encode('utf-8')
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    storage = MappedFileStorage(str(path))
+    storage.insert_text('a\nb')
+    assert storage.get_text() == 'a\nb'
+    assert storage.line_count() == 2
+    storage.close()
+
+def test_line_lengths(storage):
+    assert list(storage.line_lengths()) == [11, 15, 1, 9]
+    assert storage.line_length(1) == 15
+
+def test_snapshot_does_not_use_the_page_cache(storage):
+    storage.move_cursor(11)
+    storage.insert_text('new\n')
+    snapshot = storage.snapshot()
+    storage.delete_range(0, 20)
+    storage.page_cache.clear()
+    assert snapshot.get_text() == TEXT[:11] + 'new\n' + TEXT[11:]
+    assert storage.page_cache == {}
+
+def test_runs_of_continuation_bytes_are_invalid(tmp_path, monkeypatch):
+    monkeypatch.setattr(mapped_file, 'PAGE_SIZE', 7)
+    path = tmp_path / 'binary.bin'
+    path.write_bytes(b'ab' + b'\x80' * 20)
+    with pytest.raises(UnicodeDecodeError):
+        MappedFileStorage(str(path))
+
+def test_newlines_are_translated(tmp_path, monkeypatch):
+    monkeypatch.setattr(mapped_file, 'PAGE_SIZE', 4)
+    path = tmp_path / 'crlf.txt'
+    path.write_bytes(b'ab\r\ncd\r\r\nef\rg\r\n')
+    storage = MappedFileStorage(str(path))
+    assert storage.get_text() == 'ab\ncd\n\nef\ng\n'
+    assert storage.line_count() == 6
+    assert storage.get_line(3) == 'ef'
+    storage.close()
+
+def test_invalid_bytes_are_rejected(tmp_path):
+    path = tmp_path / 'latin1.txt'
+    path.write_bytes('café\n'.encode('latin-1'))
+    with pytest.raises(UnicodeDecodeError):
+        MappedFileStorage(str(path))
+    assert MappedFileStorage(str(path), 'latin-1').get_text() == 'café\n'
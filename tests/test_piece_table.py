@@ -0,0 +1,58 @@
+import pytest
+from text_storage.piece_table import (PieceTable, ORIGINAL, ADD,
+                                      LARGE_INSERT_SIZE)
+
+@pytest.fixture
+def piece_table():
+    return PieceTable('hello world')
+
+def test_original_text_is_a_single_piece(piece_table):
+    assert piece_table.pieces == [(ORIGINAL, 0, 11)]
+    assert piece_table.get_text() == 'hello world'
+
+def test_typing_extends_one_piece(piece_table):
+    piece_table.move_cursor(5)
+    for char in ', big':
+        piece_table.insert(char)
+    assert piece_table.get_text() == 'hello, big world'
+    assert [piece.source for piece in piece_table.pieces] == [
+        ORIGINAL, ADD, ORIGINAL]
+
+def test_delete_range_across_pieces(piece_table):
+    piece_table.move_cursor(5)
+    piece_table.insert_text(' there')
+    piece_table.delete_range(3, 14)
+    assert piece_table.get_text() == 'helrld'
+    assert piece_table.cursor == 3
+
+def test_delete_at_start_of_piece(piece_table):
+    piece_table.move_cursor(0)
+    piece_table.insert_text('> ')
+    piece_table.delete()
+    assert piece_table.get_text() == '>hello world'
+
+def test_piece_lengths_follow_scattered_edits():
+    piece_table = PieceTable('0123456789' * 10)
+    for position in range(95, 0, -7):
+        piece_table.move_cursor(position)
+        piece_table.insert_text('ab')
+    piece_table.delete_range(3, 40)
+    assert piece_table.piece_lengths.values() == [
+        piece.length for piece in piece_table.pieces]
+    assert piece_table._find_piece(piece_table.get_length()) == (
+        len(piece_table.pieces), piece_table.get_length())
+
+def test_snapshots_share_large_inserts():
+    piece_table = PieceTable()
+    chunk = 'line\n' * LARGE_INSERT_SIZE
+    for _ in range(3):
+        piece_table.insert_text(chunk)
+    piece_table.move_cursor(2)
+    piece_table.insert_text('ab')
+    snapshot = piece_table.snapshot()
+    assert snapshot.add_text == 'ab'
+    assert snapshot.pieces[0].source is chunk
+    piece_table.delete_range(0, 10)
+    assert snapshot.get_range(0, 8) == 'liabne\nl'
+    assert snapshot.get_length() == 3 * len(chunk) + 2
+    assert piece_table.get_range(0, 6) == 'e\nline'
@@ -0,0 +1,35 @@
+import random
+from text_storage.prefix_sum import PrefixSumList, FenwickTree
+
+def test_fenwick_prefix_and_search():
+    tree = FenwickTree([3, 0, 2, 5])
+    assert tree.prefix(3) == 5
+    assert tree.search(4) == (2, 3)
+    tree.add(1, 4)
+    assert tree.search(4) == (1, 3)
+    assert tree.search(100) == (4, 14)
+
+def test_find_skips_zero_values():
+    values = PrefixSumList([2, 0, 0, 3])
+    assert values.find(1) == (0, 0)
+    assert values.find(2) == (3, 2)
+    assert values.find(5) == (4, 5)
+
+def test_random_edits_match_list():
+    rng = random.Random(0)
+    expected = [rng.randint(0, 5) for _ in range(2000)]
+    values = PrefixSumList(expected)
+    for _ in range(500):
+        index = rng.randint(0, len(expected))
+        if rng.random() < 0.5:
+            new_values = [rng.randint(0, 5) for _ in range(rng.randint(1, 800))]
+            expected[index:index] = new_values
+            values.insert(index, new_values)
+        else:
+            end = index + rng.randint(0, 900)
+            del expected[index:end]
+            values.delete(index, end)
+        index = rng.randint(0, len(expected))
+        assert values.prefix(index) == sum(expected[:index])
+    assert values.values() == expected
+    assert values.total() == sum(expected)
@@ -0,0 +1,51 @@
+import random
+import pytest
+from text_storage.rope import Rope, RopeLeaf, MAX_LEAF_SIZE, iter_leaves
+
+def assert_balanced(node):
+    if isinstance(node, RopeLeaf):
+        assert 0 < node.length <= MAX_LEAF_SIZE
+        return
+    assert abs(node.left.height - node.right.height) <= 1
+    assert node.length == node.left.length + node.right.length
+    assert_balanced(node.left)
+    assert_balanced(node.right)
+
+@pytest.fixture
+def rope():
+    return Rope('x' * (MAX_LEAF_SIZE * 8))
+
+def test_build_splits_text_into_leaves(rope):
+    assert rope.get_length() == MAX_LEAF_SIZE * 8
+    assert len(list(iter_leaves(rope.root))) == 8
+    assert rope.root.height == 4
+
+def test_insert_text_larger_than_a_leaf(rope):
+    rope.move_cursor(10)
+    rope.insert_text('y' * (MAX_LEAF_SIZE * 3))
+    assert rope.get_text() == ('x' * 10 + 'y' * (MAX_LEAF_SIZE * 3)
+                               + 'x' * (MAX_LEAF_SIZE * 8 - 10))
+    assert_balanced(rope.root)
+
+def test_random_edits_match_string_and_stay_balanced(rope):
+    rng = random.Random(1)
+    expected = rope.get_text()
+    for _ in range(500):
+        position = rng.randint(0, len(expected))
+        rope.move_cursor(position)
+        if rng.random() < 0.6:
+            text = 'ab' * rng.randint(1, MAX_LEAF_SIZE)
+            rope.insert_text(text)
+            expected = expected[:position] + text + expected[position:]
+        else:
+            end = position + rng.randint(1, MAX_LEAF_SIZE * 2)
+            rope.delete_range(position, end)
+            expected = expected[:position] + expected[end:]
+        assert rope.get_length() == len(expected)
+    assert rope.get_text() == expected
+    assert_balanced(rope.root)
+
+def test_delete_everything(rope):
+    rope.delete_range(0, rope.get_length())
+    assert rope.root is None
+    assert rope.get_text() == ''
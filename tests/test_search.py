@@ -0,0 +1,88 @@
+import re
+import pytest
+from text_editor.editor_logic import EditorLogic
+from text_editor.search import (IncrementalSearch, find, find_next,
+                                iter_matches, replace_all)
+from text_storage.gap_buffer import GapBuffer
+from text_storage.piece_table import PieceTable
+from text_storage.rope import Rope
+from text_storage.utf8_buffer import Utf8Buffer
+from text_storage.text_storage import DEFAULT_CHUNK_SIZE
+
+STORAGE_FACTORIES = {
+    'gap_buffer': lambda: GapBuffer(initial_size=50),
+    'piece_table': PieceTable,
+    'rope': Rope,
+    'utf8_buffer': Utf8Buffer,
+}
+
+@pytest.fixture(params=STORAGE_FACTORIES)
+def editor(request):
+    text_storage = STORAGE_FACTORIES[request.param]()
+    return EditorLogic(text_storage)
+
+def test_find_and_find_next(editor):
+    editor.insert_text('one two one two')
+    storage = editor.text_storage
+    assert find(storage, 'two') == (4, 7)
+    assert find(storage, 'two', 5) == (12, 15)
+    assert find(storage, 'three') is None
+    assert find_next(storage, 'one', 1) == (8, 11)
+    # Wraps around to the start
+    assert find_next(storage, 'one', 9) == (0, 3)
+    assert find_next(storage, 'one', 9, wrap=False) is None
+
+def test_find_across_the_gap(editor):
+    editor.insert_text('hello world')
+    editor.move_cursor(7)
+    assert find(editor.text_storage, 'o wor') == (4, 9)
+
+def test_matches_across_chunk_edges(editor):
+    # Put matches on both sides of, and straddling, a chunk edge
+    text = ('x' * (DEFAULT_CHUNK_SIZE - 3) + 'needle\n'
+            + 'y' * DEFAULT_CHUNK_SIZE + 'needle')
+    editor.insert_text(text)
+    storage = editor.text_storage
+    expected = [(m.start(), m.end()) for m in re.finditer('needle', text)]
+    assert list(iter_matches(storage, 'needle')) == expected
+    assert list(iter_matches(storage, r'^y+', regex=True)) == [
+        (m.start(), m.end()) for m in re.finditer(r'^y+', text, re.M)]
+
+def test_regex_and_ignore_case(editor):
+    editor.insert_text('Cat cat CAT dog')
+    storage = editor.text_storage
+    assert len(list(iter_matches(storage, 'cat', ignore_case=True))) == 3
+    assert list(iter_matches(storage, r'\b[a-z]{3}\b', regex=True)) == [
+        (4, 7), (12, 15)]
+
+def test_replace_all_is_one_undo_step(editor):
+    editor.insert_text('colour and colour, no colours')
+    editor.move_cursor(len('colour and colour, no '))
+    assert replace_all(editor, 'colour', 'color') == 3
+    assert editor.get_text() == 'color and color, no colors'
+    # The cursor stays in front of the same text
+    assert editor.cursor_position == len('color and color, no ')
+    editor.undo()
+    assert editor.get_text() == 'colour and colour, no colours'
+
+def test_replace_all_expands_groups(editor):
+    editor.insert_text('a=1, b=2')
+    assert replace_all(editor, r'(\w)=(\d)', r'\2=\1', regex=True) == 2
+    assert editor.get_text() == '1=a, 2=b'
+
+def test_incremental_search_reuses_results(editor, monkeypatch):
+    editor.insert_text('abc abd abe')
+    search = IncrementalSearch(editor.text_storage, origin=1)
+    assert search.update('a') == (4, 5)
+    assert search.update('ab') == (4, 6)
+    assert search.update('abe') == (8, 11)
+    assert search.update('abz') is None
+    # Shorter and dead-end queries come from the cache
+    monkeypatch.setattr('text_editor.search.find', None)
+    assert search.update('ab') == (4, 6)
+    assert search.update('abzz') is None
+
+def test_incremental_search_wraps_around(editor):
+    editor.insert_text('abc abd')
+    search = IncrementalSearch(editor.text_storage, origin=5)
+    assert search.update('abc') == (0, 3)
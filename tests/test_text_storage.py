@@ -0,0 +1,98 @@
+import pytest
+from text_storage.gap_buffer import GapBuffer
+from text_storage.piece_table import PieceTable
+from text_storage.rope import Rope
+from text_storage.utf8_buffer import Utf8Buffer
+
+TEXT = 'first line\nsecond\n\nlast'
+
+def gap_buffer_with(text):
+    gap_buffer = GapBuffer(initial_size=8)
+    gap_buffer.insert_text(text)
+    return gap_buffer
+
+STORAGE_FACTORIES = {
+    'gap_buffer': gap_buffer_with,
+    'piece_table': PieceTable,
+    'rope': Rope,
+    'utf8_buffer': lambda text: Utf8Buffer(text.encode()),
+}
+
+@pytest.fixture(params=STORAGE_FACTORIES)
+def storage(request):
+    return STORAGE_FACTORIES[request.param](TEXT)
+
+def test_line_queries(storage):
+    assert storage.line_count() == 4
+    assert storage.offset_of(1) == 11
+    assert storage.line_of(0) == 0
+    assert storage.line_of(11) == 1
+    assert storage.line_of(len(TEXT)) == 3
+    assert [storage.get_line(i) for i in range(4)] == TEXT.split('\n')
+
+def test_line_index_follows_inserts(storage):
+    storage.move_cursor(5)
+    storage.insert_text('\nnew\n')
+    storage.insert('x')
+    assert storage.line_count() == 6
+    assert storage.get_line(1) == 'new'
+    assert storage.get_line(2) == 'x line'
+    assert storage.line_of(storage.get_length()) == 5
+
+def test_line_index_follows_deletes(storage):
+    storage.delete_range(5, 13)
+    assert storage.get_line(0) == 'firstcond'
+    assert storage.line_count() == 3
+    storage.move_cursor(10)
+    storage.delete()
+    assert storage.line_count() == 2
+    assert storage.get_line(1) == 'last'
+
+def test_line_index_with_wide_characters(storage):
+    storage.move_cursor(storage.get_length())
+    storage.insert_text('\n€uro')
+    assert storage.get_line(4) == '€uro'
+    assert storage.offset_of(4) == len(TEXT) + 1
+
+def test_iter_chunks(storage):
+    chunks = list(storage.iter_chunks(size=5))
+    assert ''.join(chunks) == TEXT
+    assert all(len(chunk) <= 5 for chunk in chunks)
+    assert ''.join(storage.iter_chunks(3, 15, size=4)) == TEXT[3:15]
+
+def test_get_range(storage):
+    assert storage.get_range(6, 15) == TEXT[6:15]
+    assert storage.get_range(20, 100) == TEXT[20:]
+    assert storage.get_range(5, 5) == ''
+
+def test_snapshot_is_not_changed_by_edits(storage):
+    storage.move_cursor(5)
+    storage.insert_text('€')
+    text = storage.get_text()
+    snapshot = storage.snapshot()
+    storage.delete_range(0, 8)
+    storage.insert_text('new')
+    assert snapshot.get_length() == len(text)
+    assert snapshot.get_range(3, 12) == text[3:12]
+    assert ''.join(snapshot.iter_chunks(size=4)) == text
+
+def test_edits_report_changes(storage):
+    changes = []
+    storage.subscribe(changes.extend)
+    storage.move_cursor(5)
+    storage.insert('x')
+    storage.insert_text('yz')
+    storage.delete()
+    storage.delete_range(0, 2)
+    with storage.batch():
+        storage.insert_text('a')
+        storage.delete_range(3, 5)
+        assert len(changes) == 4
+    assert [change[:3] for change in changes] == [
+        (5, 0, 'x'), (6, 0, 'yz'), (7, 1, ''), (0, 2, ''), (0, 0, 'a'),
+        (3, 2, '')]
+    assert changes[-1].version == storage.version
+
+def test_reversed_range_is_empty(storage):
+    assert storage.get_range(5, 2) == ''
+    assert storage.get_range(len(TEXT), len(TEXT) + 3) == ''
@@ -0,0 +1,103 @@
+import pytest
+from text_editor.editor_logic import EditorLogic
+from text_editor.undo_redo import (COMMAND_OVERHEAD, EditCommand,
+                                   UndoManager)
+from text_storage.gap_buffer import GapBuffer
+from text_storage.piece_table import PieceTable
+from text_storage.rope import Rope
+from text_storage.utf8_buffer import Utf8Buffer
+
+STORAGE_FACTORIES = {
+    'gap_buffer': lambda: GapBuffer(initial_size=50),
+    'piece_table': PieceTable,
+    'rope': Rope,
+    'utf8_buffer': Utf8Buffer,
+}
+
+@pytest.fixture(params=STORAGE_FACTORIES)
+def editor(request):
+    text_storage = STORAGE_FACTORIES[request.param]()
+    return EditorLogic(text_storage)
+
+def type_text(editor, text):
+    for char in text:
+        editor.insert_character(char)
+
+def test_undo_typing_removes_whole_words(editor):
+    type_text(editor, 'hello world')
+    assert editor.undo() == 6
+    assert editor.get_text() == 'hello '
+    assert editor.cursor_position == 6
+    editor.undo()
+    assert editor.get_text() == ''
+    assert editor.undo() is None
+
+def test_redo_restores_undone_edits(editor):
+    type_text(editor, 'hello world')
+    editor.undo()
+    editor.undo()
+    editor.redo()
+    assert editor.get_text() == 'hello '
+    editor.redo()
+    assert editor.get_text() == 'hello world'
+    assert editor.cursor_position == 11
+    assert editor.redo() is None
+
+def test_backspace_run_is_one_undo_step(editor):
+    type_text(editor, 'abc')
+    editor.move_cursor(3)
+    for _ in range(3):
+        editor.delete_character()
+    editor.undo()
+    assert editor.get_text() == 'abc'
+    assert editor.cursor_position == 3
+
+def test_delete_key_run_is_one_undo_step(editor):
+    editor.insert_text('abcdef')
+    editor.move_cursor(1)
+    editor.delete_next_character()
+    editor.delete_next_character()
+    assert editor.get_text() == 'adef'
+    editor.undo()
+    assert editor.get_text() == 'abcdef'
+    assert editor.cursor_position == 1
+
+def test_cursor_move_breaks_coalescing(editor):
+    type_text(editor, 'ab')
+    editor.move_cursor(0)
+    type_text(editor, 'c')
+    editor.undo()
+    assert editor.get_text() == 'ab'
+
+def test_bulk_operations_are_single_steps(editor):
+    editor.insert_text('hello world')
+    editor.delete_range(0, 6)
+    editor.undo()
+    assert editor.get_text() == 'hello world'
+    editor.undo()
+    assert editor.get_text() == ''
+
+def test_new_edit_clears_redo(editor):
+    editor.insert_text('abc')
+    editor.undo()
+    editor.insert_text('x')
+    assert editor.redo() is None
+    assert editor.get_text() == 'x'
+
+def test_memory_limit_evicts_oldest_first():
+    manager = UndoManager(memory_limit=3 * (COMMAND_OVERHEAD + 1))
+    for position in range(5):
+        manager.record(EditCommand(position, '', 'a', position, position + 1))
+    assert len(manager.undo_stack) == 3
+    assert manager.undo_stack[0].position == 2
+    assert manager.memory_used <= manager.memory_limit
+
+def test_memory_used_tracks_merges_and_redo():
+    manager = UndoManager()
+    manager.record(EditCommand(0, '', 'a', 0, 1), coalesce=True)
+    manager.record(EditCommand(1, '', 'b', 1, 2), coalesce=True)
+    assert len(manager.undo_stack) == 1
+    assert manager.memory_used == COMMAND_OVERHEAD + 2
+    manager.pop_undo()
+    manager.record(EditCommand(0, '', 'c', 0, 1))
+    assert manager.memory_used == COMMAND_OVERHEAD + 1
@@ -0,0 +1,62 @@
+import random
+import pytest
+from text_storage import utf8_buffer
+from text_storage.file_io import load_storage, save_storage
+from text_storage.utf8_buffer import Utf8Buffer
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(utf8_buffer, 'MAX_BLOCK_SIZE', 8)
+    monkeypatch.setattr(utf8_buffer, 'MIN_BLOCK_SIZE', 2)
+
+def test_ascii_text_is_one_byte_per_character(small_blocks):
+    buffer = Utf8Buffer(b'hello world, plain ascii')
+    assert sum(map(len, buffer.blocks)) == buffer.get_length() == 24
+    assert buffer.get_range(6, 11) == 'world'
+
+def test_blocks_do_not_split_characters(small_blocks):
+    text = 'café €\U0001f600 naïve' * 3
+    buffer = Utf8Buffer(text.encode())
+    for block in buffer.blocks:
+        block.decode('utf-8')
+    assert buffer.get_text() == text
+    assert buffer.get_range(3, 9) == text[3:9]
+    assert buffer.line_length(0) == len(text)
+
+def test_random_edits_match_a_string(small_blocks):
+    rng = random.Random(1)
+    text = 'abé\n€'
+    buffer = Utf8Buffer(text.encode())
+    for _ in range(500):
+        position = rng.randrange(len(text) + 1)
+        buffer.move_cursor(position)
+        if rng.random() < 0.4:
+            end = min(len(text), position + rng.randrange(1, 12))
+            buffer.delete_range(position, end)
+            text = text[:position] + text[end:]
+        else:
+            insert = rng.choice(['x', 'é\n', '\U0001f600', 'long ascii'])
+            buffer.insert_text(insert)
+            text = text[:position] + insert + text[position:]
+            assert buffer.cursor == position + len(insert)
+    assert buffer.get_text() == text
+    assert buffer.line_count() == text.count('\n') + 1
+    start = len(text) // 3
+    assert buffer.get_range(start, start + 20) == text[start:start + 20]
+    assert buffer.snapshot().get_range(start, start + 20) == \
+        text[start:start + 20]
+
+def test_load_and_save_keep_the_bytes(tmp_path):
+    path = tmp_path / 'log.txt'
+    path.write_bytes('id=1 café\r\nid=2\n'.encode())
+    storage = load_storage('utf8', str(path))
+    assert storage.get_text() == 'id=1 café\nid=2\n'
+    assert list(storage.iter_encoded_chunks('utf-8')) == storage.blocks
+    storage.move_cursor(0)
+    storage.insert_text('> ')
+    save_storage(storage, str(path))
+    assert path.read_bytes() == '> id=1 café\nid=2\n'.encode()
+    with pytest.raises(UnicodeEncodeError):
+        save_storage(storage, str(path), encoding='ascii')
+    with pytest.raises(ValueError):
+        load_storage('utf8', str(path), encoding='latin-1')
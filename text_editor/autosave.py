@@ -0,0 +1,384 @@
+# autosave.py
+# Periodic crash recovery that never blocks the event loop.
+#
+# Every edit is appended to an in-memory list as a small delta. On each
+# tick (every AUTOSAVE_INTERVAL_MS, from the GUI's event loop) the deltas
+# are handed to a background thread that appends them to a journal file.
+# Now and then the tick instead takes a snapshot of the storage, which
+# shares the text of a rope, piece table or UTF-8 buffer but copies all
+# of a gap buffer on the event loop, and the thread streams it to the
+# recovery file and starts a new journal. Copying snapshots are spaced
+# further apart the longer the text, so they take a bounded share of the
+# event loop's time. Recovering replays the journal on top of the last
+# snapshot, so a crash loses at most one tick of typing.
+#
+# Both files carry the id of the snapshot; a journal is only replayed on
+# the snapshot it was started for.
+#
+# A file's recovery files sit next to it. Untitled documents have theirs
+# in the temporary directory, named after the editor's process so that
+# two editors never share them; a new editor offers the ones left by
+# processes that are no longer running.
+import glob
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from text_storage.file_io import WRITE_BUFFER_SIZE
+from text_storage.piece_table import PieceTable
+from text_storage.text_storage import TextSnapshot, TextStorage
+
+
+# Time between autosave ticks
+AUTOSAVE_INTERVAL_MS = 2000
+# Longest time between full snapshots while the text keeps changing
+SNAPSHOT_INTERVAL = 60.0
+# Characters journaled after which the next tick writes a snapshot
+MAX_JOURNAL_SIZE = 1024 * 1024
+# Characters per second between two snapshots that copy the text, e.g.
+# a snapshot of 100M characters at most every 100 seconds
+SNAPSHOT_COPY_RATE = 1024 * 1024
+# Rough size of a journal entry apart from its inserted text
+JOURNAL_ENTRY_OVERHEAD = 16
+SNAPSHOT_SUFFIX = ".autosave"
+JOURNAL_SUFFIX = ".autosave-journal"
+UNTITLED_NAME = "text_editor_untitled"
+RECOVERY_ENCODING = "utf-8"
+
+
+def get_recovery_path(file_path: str = None) -> str:
+    '''
+    Return the base path of the recovery files of a document: a hidden
+    file next to it, or one in the temporary directory for an untitled
+    document.
+
+    Args:
+        file_path (str): The file the document was loaded from, if any.
+    Returns:
+        str: The path the suffixes are added to.
+    '''
+    if file_path is None:
+        return os.path.join(tempfile.gettempdir(),
+                            f"{UNTITLED_NAME}-{os.getpid()}")
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, "." + name)
+
+
+def find_recoveries(file_path: str = None) -> list[str]:
+    '''
+    Return the recovery files a document could be restored from: the
+    ones of its file, or for an untitled document those left by editors
+    that are no longer running, the most recent first.
+
+    Args:
+        file_path (str): The file the document was loaded from, if any.
+    Returns:
+        list[str]: The base paths of the recovery files.
+    '''
+    if file_path is not None:
+        recovery_path = get_recovery_path(file_path)
+        return [recovery_path] if has_recovery(recovery_path) else []
+
+    recovery_paths = []
+    prefix = os.path.join(tempfile.gettempdir(), UNTITLED_NAME + "-")
+    for path in glob.glob(glob.escape(prefix) + "*" + SNAPSHOT_SUFFIX):
+        recovery_path = path[:-len(SNAPSHOT_SUFFIX)]
+        pid = recovery_path[len(prefix):]
+        if not pid.isdigit() or _is_running(int(pid)):
+            continue
+        try:
+            recovery_paths.append((os.path.getmtime(path), recovery_path))
+        except OSError:
+            pass
+    recovery_paths.sort(reverse=True)
+    return [recovery_path for _, recovery_path in recovery_paths]
+
+
+def has_recovery(recovery_path: str) -> bool:
+    '''
+    Return whether a recovery snapshot exists.
+
+    Args:
+        recovery_path (str): The base path from get_recovery_path().
+    '''
+    return os.path.exists(recovery_path + SNAPSHOT_SUFFIX)
+
+
+def recover(recovery_path: str) -> str:
+    '''
+    Rebuild the text from the recovery snapshot and its journal. A
+    journal entry cut short by the crash, and everything after it, is
+    ignored.
+
+    Args:
+        recovery_path (str): The base path from get_recovery_path().
+    Returns:
+        str: The recovered text, or None if there is no snapshot.
+    '''
+    try:
+        with open(recovery_path + SNAPSHOT_SUFFIX,
+                  encoding=RECOVERY_ENCODING, newline="") as file:
+            header = file.readline()
+            storage = PieceTable(file.read())
+    except (OSError, ValueError):
+        return None
+
+    try:
+        with open(recovery_path + JOURNAL_SUFFIX,
+                  encoding=RECOVERY_ENCODING) as file:
+            # A journal started for another snapshot is already in it
+            if file.readline() == header:
+                for line in file:
+                    position, removed_length, inserted = json.loads(line)
+                    _apply_delta(storage, position, removed_length,
+                                 inserted)
+    except (OSError, ValueError, TypeError):
+        pass
+    return storage.get_text()
+
+
+def discard_recovery(recovery_path: str):
+    '''
+    Delete the recovery files of a document, if there are any.
+
+    Args:
+        recovery_path (str): The base path from get_recovery_path().
+    '''
+    for suffix in (SNAPSHOT_SUFFIX, JOURNAL_SUFFIX):
+        try:
+            os.remove(recovery_path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+class Autosaver:
+    '''
+    Writes crash recovery files for a document from a background thread.
+    Subscribe record_changes() to the storage and call tick()
+    periodically on the thread that owns the storage.
+    '''
+
+    def __init__(self, recovery_path: str):
+        '''
+        Initialize the autosaver. Nothing is written before the first
+        tick that follows an edit.
+
+        Args:
+            recovery_path (str): The base path from get_recovery_path().
+        '''
+        self.recovery_path = recovery_path
+        # Edits since the last tick, as (position, removed, inserted)
+        self.pending = []
+        # Id of the last snapshot, or None before the first one
+        self.snapshot_id = None
+        self.snapshot_time = 0.0
+        self.journal_size = 0
+        # The last error the writer thread hit, if any
+        self.error = None
+        self.tasks = queue.Queue()
+        self.thread = None
+
+    # Public Methods
+
+    def record_changes(self, changes: list):
+        '''
+        Remember the changes of an operation for the next tick.
+
+        Args:
+            changes (list): The storage's ChangeEvents.
+        '''
+        self.pending.extend((change.offset, change.removed_length,
+                             change.inserted) for change in changes)
+
+    def tick(self, storage: TextStorage):
+        '''
+        Hand the edits since the last tick to the writer thread: as a
+        journal append, or as a new snapshot when there is none yet, the
+        journal has grown large or the last one is old. A storage whose
+        snapshots copy the text waits at least one second per
+        SNAPSHOT_COPY_RATE characters between them and keeps journaling
+        meanwhile.
+
+        Args:
+            storage (TextStorage): The storage being edited.
+        '''
+        if not self.pending:
+            return
+        if self.snapshot_id is None or self._snapshot_due(storage):
+            self.save_snapshot(storage)
+            return
+
+        deltas, self.pending = self.pending, []
+        self.journal_size += sum(len(inserted) + JOURNAL_ENTRY_OVERHEAD
+                                 for _, _, inserted in deltas)
+        self._submit(_append_journal, self.recovery_path, deltas)
+
+    def save_snapshot(self, storage: TextStorage):
+        '''
+        Snapshot the storage now and write it in the background. The
+        snapshot holds every edit so far, so the pending ones are dropped.
+
+        Args:
+            storage (TextStorage): The storage being edited.
+        '''
+        self.snapshot_id = uuid.uuid4().hex
+        self.snapshot_time = time.monotonic()
+        self.journal_size = 0
+        self.pending = []
+        self._submit(_write_snapshot, self.recovery_path, self.snapshot_id,
+                     storage.snapshot())
+
+    def discard(self):
+        '''
+        Forget the pending edits and delete the recovery files, e.g.
+        after the document was saved.
+        '''
+        self.pending = []
+        self.snapshot_id = None
+        self._submit(discard_recovery, self.recovery_path)
+
+    def flush(self):
+        '''
+        Wait until the writer thread has written everything handed to it.
+        '''
+        if self.thread is not None:
+            self.tasks.join()
+
+    def close(self, discard: bool = False):
+        '''
+        Finish writing and stop the writer thread.
+
+        Args:
+            discard (bool): Whether to delete the recovery files too.
+        '''
+        if discard:
+            self.discard()
+        if self.thread is not None:
+            self.tasks.put(None)
+            self.thread.join()
+            self.thread = None
+
+    # Protected Methods
+
+    def _snapshot_due(self, storage: TextStorage) -> bool:
+        '''
+        Return whether the next tick should replace the last snapshot.
+
+        Args:
+            storage (TextStorage): The storage being edited.
+        '''
+        age = time.monotonic() - self.snapshot_time
+        if (self.journal_size < MAX_JOURNAL_SIZE
+                and age < SNAPSHOT_INTERVAL):
+            return False
+        if storage.snapshot_copies_text:
+            return age >= storage.get_length() / SNAPSHOT_COPY_RATE
+        return True
+
+    def _submit(self, function, *args):
+        '''
+        Queue work for the writer thread, starting it if needed. The
+        thread runs the work in order.
+        '''
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run,
+                                           name="autosave", daemon=True)
+            self.thread.start()
+        self.tasks.put((function, args))
+
+    def _run(self):
+        '''
+        The writer thread: run queued work until close() is called.
+        '''
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                function, args = task
+                function(*args)
+            except (OSError, ValueError) as e:
+                self.error = e
+            finally:
+                self.tasks.task_done()
+
+
+def _write_snapshot(recovery_path: str, snapshot_id: str,
+                    snapshot: TextSnapshot):
+    '''
+    Write a snapshot to a temporary file that then replaces the recovery
+    file, and start an empty journal for it. Until the new journal exists
+    the old one names the old snapshot and is ignored.
+    '''
+    path = recovery_path + SNAPSHOT_SUFFIX
+    header = json.dumps({"snapshot": snapshot_id}) + "\n"
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                     prefix=".", suffix=".tmp")
+    try:
+        with open(fd, "w", encoding=RECOVERY_ENCODING, newline="",
+                  buffering=WRITE_BUFFER_SIZE) as file:
+            file.write(header)
+            for chunk in snapshot.iter_chunks():
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    with open(recovery_path + JOURNAL_SUFFIX, "w",
+              encoding=RECOVERY_ENCODING) as file:
+        file.write(header)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _append_journal(recovery_path: str, deltas: list[tuple]):
+    '''
+    Append edits to the journal of the last snapshot, one JSON line each.
+    '''
+    lines = "".join(json.dumps(delta) + "\n" for delta in deltas)
+    with open(recovery_path + JOURNAL_SUFFIX, "a",
+              encoding=RECOVERY_ENCODING) as file:
+        file.write(lines)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _is_running(pid: int) -> bool:
+    '''
+    Return whether a process is running, counting this one. Other
+    processes can only be checked on POSIX systems; elsewhere they are
+    taken to have exited.
+    '''
+    if pid == os.getpid():
+        return True
+    if os.name != "posix":
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # It exists but belongs to another user
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _apply_delta(storage: TextStorage, position: int, removed_length: int,
+                 inserted: str):
+    '''
+    Replay one journaled edit on a storage.
+    '''
+    if removed_length:
+        storage.delete_range(position, position + removed_length)
+    storage.move_cursor(position)
+    if inserted:
+        storage.insert_text(inserted)
@@ -0,0 +1,281 @@
+# batch.py
+# Applies a scripted sequence of edits to many files without the GUI.
+#
+# The script is a JSON list of operations applied in order with
+# EditorLogic, e.g.:
+#   [{"op": "move", "line": 0},
+#    {"op": "insert", "text": "# Header\n"},
+#    {"op": "replace", "find": "colou?r", "replace": "hue", "regex": true},
+#    {"op": "move", "position": "end"},
+#    {"op": "delete", "count": -1}]
+#
+# Files are spread over a process pool; each one is loaded and saved
+# through the streaming file I/O of the chosen storage backend.
+#
+# Usage:
+#   PYTHONPATH=./ python text_editor/batch.py script.json FILE...
+#       [--storage mapped] [--workers 8] [--output-dir out/]
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from text_editor.editor_logic import EditorLogic
+from text_editor.search import compile_pattern, replace_all
+from text_editor.undo_redo import UndoManager
+from text_storage.file_io import (DEFAULT_ENCODING, FILE_STORAGE_BACKENDS,
+                                  STORAGE_BACKENDS, load_storage,
+                                  save_storage)
+
+
+# The mapped backend reads each file lazily instead of loading it. Like
+# the other backends it rejects files that are not valid in their
+# encoding and translates newlines to "\n".
+DEFAULT_BATCH_BACKEND = "mapped"
+# Operation name: the fields it needs
+OPERATIONS = {
+    "move": (),
+    "insert": ("text",),
+    "delete": ("count",),
+    "delete_range": ("start", "end"),
+    "replace": ("find", "replace"),
+}
+# Field name: the type its value must have. "position" may also be "end".
+FIELD_TYPES = {
+    "text": str,
+    "count": int,
+    "start": int,
+    "end": int,
+    "find": str,
+    "replace": str,
+    "regex": bool,
+    "ignore_case": bool,
+    "position": int,
+    "line": int,
+    "column": int,
+}
+
+
+def load_script(path: str) -> list[dict]:
+    '''
+    Read and check an edit script.
+
+    Args:
+        path (str): The JSON file holding the list of operations.
+    Returns:
+        list[dict]: The operations.
+    Raises:
+        ValueError: If the script is not valid; see check_script.
+    '''
+    with open(path, encoding="utf-8") as file:
+        operations = json.load(file)
+    check_script(operations)
+    return operations
+
+
+def check_script(operations: list[dict]):
+    '''
+    Check an edit script before it is applied, so a bad operation fails
+    the whole run at once instead of every file in a worker.
+
+    Args:
+        operations (list[dict]): The operations.
+    Raises:
+        ValueError: If an operation is unknown, misses a field, has a
+            field of the wrong type or an invalid regular expression.
+    '''
+    if not isinstance(operations, list):
+        raise ValueError("An edit script must be a list of operations")
+
+    for i, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Operation {i}: not an object")
+        name = operation.get("op")
+        if name not in OPERATIONS:
+            raise ValueError(f"Operation {i}: unknown op {name!r}")
+        missing = [field for field in OPERATIONS[name]
+                   if field not in operation]
+        if name == "move" and not ("position" in operation
+                                   or "line" in operation):
+            missing.append("position or line")
+        if missing:
+            raise ValueError(f"Operation {i} ({name}): missing "
+                             f"{', '.join(missing)}")
+        for field, value in operation.items():
+            if not _has_field_type(field, value):
+                raise ValueError(f"Operation {i} ({name}): invalid "
+                                 f"{field} {value!r}")
+        if name == "replace" and operation.get("regex"):
+            try:
+                compile_pattern(operation["find"], regex=True)
+            except re.error as e:
+                raise ValueError(f"Operation {i} ({name}): {e}") from e
+
+
+def apply_operation(editor_logic: EditorLogic, operation: dict):
+    '''
+    Apply one script operation.
+
+    Args:
+        editor_logic (EditorLogic): The editor holding the file.
+        operation (dict): The operation.
+    '''
+    name = operation["op"]
+    if name == "move":
+        if "line" in operation:
+            line = min(operation["line"], editor_logic.get_line_count() - 1)
+            position = (editor_logic.get_line_start(line)
+                        + operation.get("column", 0))
+        elif operation["position"] == "end":
+            position = editor_logic.get_length()
+        else:
+            position = operation["position"]
+        editor_logic.move_cursor(position)
+    elif name == "insert":
+        editor_logic.insert_text(operation["text"])
+    elif name == "delete":
+        # Positive counts delete after the cursor, negative ones before
+        cursor = editor_logic.cursor_position
+        count = operation["count"]
+        editor_logic.delete_range(min(cursor, cursor + count),
+                                  max(cursor, cursor + count))
+    elif name == "delete_range":
+        editor_logic.delete_range(operation["start"], operation["end"])
+    elif name == "replace":
+        replace_all(editor_logic, operation["find"], operation["replace"],
+                    operation.get("regex", False),
+                    operation.get("ignore_case", False))
+
+
+def get_output_path(path: str, output_dir: str = None) -> str:
+    '''
+    Return where the edited file is written: in place, or mirrored under
+    output_dir by its absolute path so files with the same name from
+    different directories do not collide.
+    '''
+    if output_dir is None:
+        return path
+    relative = os.path.splitdrive(os.path.abspath(path))[1].lstrip(os.sep)
+    return os.path.join(output_dir, relative)
+
+
+def process_file(path: str, operations: list[dict], backend: str,
+                 encoding: str = DEFAULT_ENCODING,
+                 output_dir: str = None) -> tuple[str, str]:
+    '''
+    Apply an edit script to one file. Runs in a worker process.
+
+    Args:
+        path (str): The file to edit.
+        operations (list[dict]): The edit script.
+        backend (str): The storage backend to load the file with.
+        encoding (str): The encoding of the file.
+        output_dir (str): Where to write the result, or None to edit in
+            place.
+    Returns:
+        tuple[str, str]: The path and an error message, or None.
+    '''
+    storage = None
+    try:
+        storage = load_storage(backend, path, encoding)
+        # Nothing is undone in a batch, so keep no history
+        editor_logic = EditorLogic(storage, UndoManager(memory_limit=0))
+        for operation in operations:
+            apply_operation(editor_logic, operation)
+
+        output_path = get_output_path(path, output_dir)
+        if output_dir is not None:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        save_storage(storage, output_path, encoding)
+    except (OSError, ValueError) as e:
+        return path, str(e)
+    finally:
+        close = getattr(storage, "close", None)
+        if close is not None:
+            close()
+    return path, None
+
+
+def run_batch(paths: list[str], operations: list[dict], backend: str,
+              encoding: str = DEFAULT_ENCODING, output_dir: str = None,
+              workers: int = None) -> list[tuple[str, str]]:
+    '''
+    Apply an edit script to many files on a process pool.
+
+    Args:
+        paths (list[str]): The files to edit.
+        operations (list[dict]): The edit script.
+        backend (str): The storage backend to load the files with.
+        encoding (str): The encoding of the files.
+        output_dir (str): Where to write the results, or None to edit in
+            place.
+        workers (int): The number of processes, all cores by default.
+            1 runs in this process.
+    Returns:
+        list[tuple[str, str]]: Each path with an error message or None.
+    Raises:
+        ValueError: If the script is not valid; see check_script.
+    '''
+    check_script(operations)
+    task = partial(process_file, operations=operations, backend=backend,
+                   encoding=encoding, output_dir=output_dir)
+    if workers == 1:
+        return [task(path) for path in paths]
+
+    workers = workers or os.cpu_count() or 1
+    # Hand out files in batches to keep the pool's overhead low
+    chunk_size = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(task, paths, chunksize=chunk_size))
+
+
+def _has_field_type(field: str, value) -> bool:
+    '''
+    Return whether an operation's field has the type it needs. Fields
+    the operations do not use are ignored.
+    '''
+    expected = FIELD_TYPES.get(field)
+    if expected is None or (field == "position" and value == "end"):
+        return True
+    if expected is int and isinstance(value, bool):
+        # JSON true is not a number
+        return False
+    return isinstance(value, expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Apply an edit script to files without the GUI")
+    parser.add_argument("script", help="JSON list of edit operations")
+    parser.add_argument("paths", nargs="+", help="Files to edit")
+    parser.add_argument("--storage",
+                        choices=[*STORAGE_BACKENDS, *FILE_STORAGE_BACKENDS],
+                        default=DEFAULT_BATCH_BACKEND,
+                        help="The text storage backend to use")
+    parser.add_argument("--encoding", default=DEFAULT_ENCODING,
+                        help="The encoding of the files")
+    parser.add_argument("--output-dir",
+                        help="Write edited files here instead of in place")
+    parser.add_argument("--workers", type=int,
+                        help="Number of worker processes (default: cores)")
+    args = parser.parse_args()
+
+    try:
+        operations = load_script(args.script)
+    except (OSError, ValueError) as e:
+        parser.error(f"Invalid script: {e}")
+
+    results = run_batch(args.paths, operations, args.storage, args.encoding,
+                        args.output_dir, args.workers)
+    failures = [(path, error) for path, error in results if error]
+    for path, error in failures:
+        print(f"{path}: {error}", file=sys.stderr)
+    print(f"Edited {len(results) - len(failures)} of {len(results)} files")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
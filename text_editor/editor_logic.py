@@ -1,12 +1,24 @@
 # editor_logic.py
+from bisect import insort
+from text_storage.file_io import DEFAULT_ENCODING, save_storage
 from text_storage.text_storage import TextStorage
+from text_editor.undo_redo import EditCommand, MultiEditCommand, UndoManager
 
 
 class EditorLogic:
     # Constructor
-    def __init__(self, text_storage: TextStorage):
+    def __init__(self, text_storage: TextStorage,
+                 undo_manager: UndoManager = None):
         self.text_storage = text_storage  # Text storage
         self.cursor_position = 0  # Current cursor position
+        # Sorted positions of the other cursors in multi-cursor editing.
+        # While there are any, the storage cursor is left wherever the
+        # last edit put it instead of following cursor_position.
+        self.secondary_cursors = []
+        # Storage that already holds text may have its cursor elsewhere
+        self.text_storage.move_cursor(self.cursor_position)
+        # Undo and redo history
+        self.undo_manager = undo_manager or UndoManager()
 
     # Public Methods
     def insert_character(self, char: str):
@@ -16,58 +28,256 @@ class EditorLogic:
         Args:
             char (str): The character to insert.
         '''
+        if self.secondary_cursors:
+            self._edit_at_cursors(lambda cursor: (cursor, cursor, char),
+                                  coalesce=True)
+            return
 
+        position = self.cursor_position
         self.text_storage.insert(char)
         self.cursor_position += 1
+        self._record(position, "", char, position, coalesce=True)
+
+    def insert_text(self, text: str):
+        '''
+        Insert a string into the text editor as a single operation.
+
+        Args:
+            text (str): The text to insert.
+        '''
+
+        if not text:
+            return
+        if self.secondary_cursors:
+            self._edit_at_cursors(lambda cursor: (cursor, cursor, text))
+            return
+
+        position = self.cursor_position
+        self.text_storage.insert_text(text)
+        self.cursor_position += len(text)
+        self._record(position, "", text, position)
+
+    def append_text(self, text: str):
+        '''
+        Add text at the end without moving the cursor or recording it in
+        the undo history, e.g. while a file is loading. The storage cursor
+        stays at the end until the cursor is next moved, so appending
+        again does not move it back and forth.
+
+        Args:
+            text (str): The text to append.
+        '''
+        self.text_storage.move_cursor(self.text_storage.get_length())
+        self.text_storage.insert_text(text)
 
     def delete_character(self):
         '''
         Delete a character from the text editor.
         '''
+        if self.secondary_cursors:
+            self._edit_at_cursors(
+                lambda cursor: (cursor - 1, cursor, "") if cursor else None,
+                coalesce=True)
+            return
         if self.cursor_position == 0:
             return
 
+        position = self.cursor_position
+        removed = self.text_storage.get_range(position - 1, position)
         self.text_storage.delete()
         self.cursor_position -= 1
+        self._record(position - 1, removed, "", position, coalesce=True)
 
     def delete_next_character(self):
         '''
         Deletes the next character in the text editor
         '''
-        if self.cursor_position + 1 > self.text_storage.get_length():
+        if self.secondary_cursors:
+            length = self.text_storage.get_length()
+            self._edit_at_cursors(
+                lambda cursor: ((cursor, cursor + 1, "")
+                                if cursor < length else None),
+                coalesce=True)
+            return
+        position = self.cursor_position
+        if position + 1 > self.text_storage.get_length():
+            return
+
+        removed = self.text_storage.get_range(position, position + 1)
+        # The storage leaves its cursor at the deleted position
+        self.text_storage.delete_range(position, position + 1)
+        self._record(position, removed, "", position, coalesce=True)
+
+    def delete_range(self, start: int, end: int):
+        '''
+        Delete the text between two positions as a single operation.
+
+        Args:
+            start (int): The position of the first character to delete.
+            end (int): The position after the last character to delete.
+        '''
+        start = self._get_bounded_position(start)
+        end = self._get_bounded_position(end)
+        if start >= end:
             return
 
-        self.move_right()
-        self.delete_character()
+        cursor_before = self.cursor_position
+        removed = self.text_storage.get_range(start, end)
+        self.text_storage.delete_range(start, end)
+
+        # Shift the cursor by the removed length once
+        if self.cursor_position >= end:
+            self.cursor_position -= end - start
+        elif self.cursor_position > start:
+            self.cursor_position = start
+        # The storage leaves its cursor at start
+        if self.cursor_position != start:
+            self.text_storage.move_cursor(self.cursor_position)
+        self._shift_secondary_cursors(start, end, 0)
+        self._record(start, removed, "", cursor_before)
+
+    def replace_range(self, start: int, end: int, text: str,
+                      cursor: int = None):
+        '''
+        Replace the text between two positions as a single operation,
+        whose changes reach the storage's listeners together.
+
+        Args:
+            start (int): The position of the first character to replace.
+            end (int): The position after the last character to replace.
+            text (str): The text to put instead.
+            cursor (int): Where to leave the cursor. By default it stays
+                in front of the same text, or moves to start if that text
+                was replaced.
+        '''
+        start = self._get_bounded_position(start)
+        end = max(start, self._get_bounded_position(end))
+        cursor_before = self.cursor_position
+        removed = self.text_storage.get_range(start, end)
+        with self.text_storage.batch():
+            self._replace(start, end - start, text)
+
+            if cursor is None:
+                if cursor_before >= end:
+                    cursor = cursor_before + len(text) - (end - start)
+                elif cursor_before > start:
+                    cursor = start
+                else:
+                    cursor = cursor_before
+            self.cursor_position = self._get_bounded_position(cursor)
+            self.text_storage.move_cursor(self.cursor_position)
+            self._shift_secondary_cursors(start, end, len(text))
+        self._record(start, removed, text, cursor_before)
+
+    def undo(self) -> int:
+        '''
+        Undo the last edit.
+
+        Returns:
+            int: The position where the text changed, or None if there
+                was nothing to undo.
+        '''
+        command = self.undo_manager.pop_undo()
+        if command is None:
+            return None
+
+        # Edit positions are in the text before the command, which the
+        # edits already undone have restored up to each next one
+        with self.text_storage.batch():
+            for edit in command.edits:
+                self._replace(edit.position, len(edit.inserted),
+                              edit.removed)
+            self._set_cursors(command.cursors_before)
+        return command.edits[0].position
+
+    def redo(self) -> int:
+        '''
+        Redo the last undone edit.
+
+        Returns:
+            int: The position where the text changed, or None if there
+                was nothing to redo.
+        '''
+        command = self.undo_manager.pop_redo()
+        if command is None:
+            return None
+
+        shift = 0
+        with self.text_storage.batch():
+            for edit in command.edits:
+                self._replace(edit.position + shift, len(edit.removed),
+                              edit.inserted)
+                shift += len(edit.inserted) - len(edit.removed)
+            self._set_cursors(command.cursors_after)
+        return command.edits[0].position
+
+    def add_cursor(self, position: int):
+        '''
+        Add another cursor for multi-cursor editing.
+
+        Args:
+            position (int): Where to put the cursor.
+        '''
+        position = self._get_bounded_position(position)
+        if (position != self.cursor_position
+                and position not in self.secondary_cursors):
+            insort(self.secondary_cursors, position)
+        self.undo_manager.seal()
+
+    def clear_cursors(self):
+        '''
+        Remove every cursor but the primary one.
+        '''
+        self._set_cursors([self.cursor_position])
+
+    def get_cursors(self) -> list[int]:
+        '''
+        Return the positions of all cursors in ascending order.
+        '''
+        if not self.secondary_cursors:
+            return [self.cursor_position]
+        return sorted([self.cursor_position, *self.secondary_cursors])
 
     def move_left(self):
         '''
         Move the cursor to the left
         '''
+        if self.secondary_cursors:
+            self._set_cursors([cursor - 1 for cursor in self._cursor_list()])
+            self.undo_manager.seal()
+            return
         # Ensure the cursor position does not go below 0
         self.cursor_position = self._get_bounded_position(
             self.cursor_position - 1)
         self.text_storage.move_cursor(self.cursor_position)
+        self.undo_manager.seal()
 
     def move_right(self):
         '''
         Move the cursor to the right
         '''
+        if self.secondary_cursors:
+            self._set_cursors([cursor + 1 for cursor in self._cursor_list()])
+            self.undo_manager.seal()
+            return
         # Limit the cursor position to the length of the text
         self.cursor_position = self._get_bounded_position(
             self.cursor_position + 1)
         self.text_storage.move_cursor(self.cursor_position)
+        self.undo_manager.seal()
 
     def move_cursor(self, position: int):
         '''
-        Move the cursor to a specific position in the text editor.
+        Move the cursor to a specific position in the text editor. Any
+        other cursors are removed.
 
         Args:
             position (int): The new cursor position.
         '''
-
+        self.secondary_cursors = []
         self.cursor_position = self._get_bounded_position(position)
         self.text_storage.move_cursor(self.cursor_position)
+        self.undo_manager.seal()
 
     def get_text(self) -> str:
         '''
@@ -78,7 +288,200 @@ class EditorLogic:
         '''
         return self.text_storage.get_text()
 
+    def get_length(self) -> int:
+        '''
+        Return the length of the text in the text editor.
+        '''
+        return self.text_storage.get_length()
+
+    def get_range(self, start: int, end: int) -> str:
+        '''
+        Return part of the text without reading the rest of it.
+
+        Args:
+            start (int): The position of the first character.
+            end (int): The position after the last character.
+        Returns:
+            str: The text between the two positions.
+        '''
+        return self.text_storage.get_range(start, end)
+
+    def get_line_count(self) -> int:
+        '''
+        Return the number of lines in the text editor.
+        '''
+        return self.text_storage.line_count()
+
+    def get_line(self, line: int) -> str:
+        '''
+        Return a line of text without its newline.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.text_storage.get_line(line)
+
+    def get_line_length(self, line: int) -> int:
+        '''
+        Return the length of a line, counting its newline.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.text_storage.line_length(line)
+
+    def get_line_lengths(self):
+        '''
+        Return the lengths of all lines, counting their newlines.
+        '''
+        return self.text_storage.line_lengths()
+
+    def get_line_number(self, position: int) -> int:
+        '''
+        Return the line containing a position.
+
+        Args:
+            position (int): The position in the text.
+        '''
+        return self.text_storage.line_of(position)
+
+    def get_line_start(self, line: int) -> int:
+        '''
+        Return the position where a line starts.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.text_storage.offset_of(line)
+
+    def save(self, path: str, encoding: str = DEFAULT_ENCODING):
+        '''
+        Save the text to a file, streaming it from the text storage.
+
+        Args:
+            path (str): The file to write.
+            encoding (str): The encoding to write the text with.
+        '''
+        save_storage(self.text_storage, path, encoding)
+
     # Protected Methods
+    def _record(self, position: int, removed: str, inserted: str,
+                cursor_before: int, coalesce: bool = False):
+        '''
+        Record an edit that was just applied in the undo history.
+
+        Args:
+            position (int): Where the edit happened.
+            removed (str): The text the edit removed.
+            inserted (str): The text the edit inserted.
+            cursor_before (int): The cursor position before the edit.
+            coalesce (bool): Whether the edit is a keystroke.
+        '''
+        self.undo_manager.record(
+            EditCommand(position, removed, inserted, cursor_before,
+                        self.cursor_position),
+            coalesce)
+
+    def _edit_at_cursors(self, make_edit, coalesce: bool = False):
+        '''
+        Apply an edit at every cursor in one pass. Cursors are visited in
+        ascending order, so the storage cursor only moves forward, and
+        each edit's position is shifted by the length change of the
+        edits before it instead of being looked up again. The whole step
+        is recorded as one MultiEditCommand, and its changes reach the
+        storage's listeners as one batch.
+
+        Args:
+            make_edit: Called with each cursor's position in the text
+                before the step; returns (start, end, text) to replace,
+                or None to leave that cursor alone.
+            coalesce (bool): Whether the step is a keystroke.
+        '''
+        cursors_before = self._cursor_list()
+        primary = self.cursor_position
+        edits = []
+        new_positions = {}
+        shift = 0
+        previous_end = 0
+        with self.text_storage.batch():
+            for cursor in sorted(cursors_before):
+                edit = make_edit(cursor)
+                if edit is None or edit[0] < previous_end:
+                    new_positions[cursor] = cursor + shift
+                    continue
+                start, end, text = edit
+                removed = (self.text_storage.get_range(start + shift,
+                                                       end + shift)
+                           if end > start else "")
+                self._replace(start + shift, end - start, text)
+                edits.append(EditCommand(start, removed, text, cursor, 0))
+                new_positions[cursor] = start + shift + len(text)
+                shift += len(text) - (end - start)
+                previous_end = end
+
+            self.cursor_position = new_positions[primary]
+            self.secondary_cursors = sorted(
+                {new_positions[cursor] for cursor in cursors_before[1:]}
+                - {self.cursor_position})
+        if edits:
+            self.undo_manager.record(
+                MultiEditCommand(edits, cursors_before, self._cursor_list()),
+                coalesce)
+
+    def _cursor_list(self) -> list[int]:
+        '''
+        Return all cursors, the primary one first.
+        '''
+        return [self.cursor_position, *self.secondary_cursors]
+
+    def _set_cursors(self, cursors: list[int]):
+        '''
+        Replace all cursors, merging the ones that meet.
+
+        Args:
+            cursors (list[int]): The cursors, the primary one first.
+        '''
+        self.cursor_position = self._get_bounded_position(cursors[0])
+        self.secondary_cursors = sorted(
+            {self._get_bounded_position(cursor) for cursor in cursors[1:]}
+            - {self.cursor_position})
+        if not self.secondary_cursors:
+            self.text_storage.move_cursor(self.cursor_position)
+        self.undo_manager.seal()
+
+    def _shift_secondary_cursors(self, start: int, end: int, length: int):
+        '''
+        Keep the other cursors on the same text after the text between
+        start and end was replaced by length characters.
+        '''
+        if not self.secondary_cursors:
+            return
+        shifted = []
+        for cursor in self.secondary_cursors:
+            if cursor >= end:
+                cursor += length - (end - start)
+            elif cursor > start:
+                cursor = start
+            shifted.append(cursor)
+        self._set_cursors([self.cursor_position, *shifted])
+
+    def _replace(self, position: int, length: int, text: str):
+        '''
+        Replace text without recording it in the undo history.
+
+        Args:
+            position (int): Where the replaced text starts.
+            length (int): The length of the replaced text.
+            text (str): The text to insert instead.
+        '''
+        if length:
+            self.text_storage.delete_range(position, position + length)
+        else:
+            self.text_storage.move_cursor(position)
+        if text:
+            self.text_storage.insert_text(text)
+        self.cursor_position = position + len(text)
+
     def _get_bounded_position(self, position: int) -> int:
         '''
         Ensure the cursor position is within bounds.
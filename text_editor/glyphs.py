@@ -0,0 +1,114 @@
+# glyphs.py
+from collections import OrderedDict
+
+
+# Widths of code points past ASCII kept per font
+MAX_CACHED_GLYPHS = 4096
+# Cumulative widths of rows kept per font
+MAX_CACHED_ROWS = 2000
+# Tab stops are this many "0" digits apart, as Tk draws them
+TAB_SIZE = 8
+ASCII_SIZE = 128
+
+
+class GlyphWidths:
+    '''
+    The widths of the characters of a font, measured once per code point.
+
+    Laying out and hit testing a row needs the x position of every
+    character in it. Asking Tk for each one is a round trip per call, so
+    widths are measured with Font.measure the first time a character is
+    seen and kept: ASCII in a table, other code points in an LRU cache.
+    The cumulative widths of recently drawn rows are cached as well.
+    '''
+
+    def __init__(self, font, max_cached_glyphs: int = MAX_CACHED_GLYPHS):
+        '''
+        Initialize the cache.
+
+        Args:
+            font (tkinter.font.Font): The font the text is drawn with.
+            max_cached_glyphs (int): The number of non-ASCII widths kept.
+        '''
+        self.font = font
+        self.max_cached_glyphs = max_cached_glyphs
+        self.ascii_widths = [font.measure(chr(code)) if code >= 32 else 0
+                             for code in range(ASCII_SIZE)]
+        self.glyph_widths = OrderedDict()
+        self.row_positions = OrderedDict()
+        self.tab_width = max(1, TAB_SIZE * self.ascii_widths[ord("0")])
+        printable = self.ascii_widths[32:127]
+        # The width of every ASCII character in a monospace font, else 0
+        self.fixed_width = (printable[0]
+                            if min(printable) == max(printable) else 0)
+        self.average_width = max(1, round(sum(printable) / len(printable)))
+
+    # Public Methods
+
+    def is_monospace(self) -> bool:
+        '''Return whether every ASCII character has the same width.'''
+        return bool(self.fixed_width)
+
+    def width(self, char: str) -> int:
+        '''
+        Return the width of a character, measuring it on first use. Tabs
+        depend on where they are; see positions().
+
+        Args:
+            char (str): The character.
+        '''
+        code = ord(char)
+        if code < ASCII_SIZE:
+            return self.ascii_widths[code]
+        width = self.glyph_widths.get(char)
+        if width is not None:
+            self.glyph_widths.move_to_end(char)
+            return width
+        width = self.font.measure(char)
+        self.glyph_widths[char] = width
+        if len(self.glyph_widths) > self.max_cached_glyphs:
+            self.glyph_widths.popitem(last=False)
+        return width
+
+    def positions(self, row: str):
+        '''
+        Return the x position of every character of a row, plus the end.
+        Tabs advance to the next tab stop from the start of the row.
+
+        Args:
+            row (str): The text of the row, drawn from x = 0.
+        Returns:
+            A sequence of len(row) + 1 increasing x positions.
+        '''
+        if self.fixed_width and row.isascii() and "\t" not in row:
+            # Every character has the same width
+            return range(0, (len(row) + 1) * self.fixed_width,
+                         self.fixed_width)
+        positions = self.row_positions.get(row)
+        if positions is not None:
+            self.row_positions.move_to_end(row)
+            return positions
+
+        positions = [0]
+        x = 0
+        for char in row:
+            x += self.advance(x, char)
+            positions.append(x)
+        self.row_positions[row] = positions
+        if len(self.row_positions) > MAX_CACHED_ROWS:
+            self.row_positions.popitem(last=False)
+        return positions
+
+    def advance(self, x: int, char: str) -> int:
+        '''
+        Return how far a character at x moves the next one.
+
+        Args:
+            x (int): The position of the character from the row start.
+            char (str): The character.
+        '''
+        if char == "\t":
+            return self.tab_width - x % self.tab_width
+        if char == "\n":
+            return 0
+        return self.width(char)
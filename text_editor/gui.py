@@ -1,11 +1,21 @@
 # gui.py
+import time
+from bisect import bisect_left, bisect_right
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox, simpledialog
 from tkinter.font import Font
+from text_editor.autosave import (AUTOSAVE_INTERVAL_MS, Autosaver,
+                                  discard_recovery, find_recoveries,
+                                  get_recovery_path, recover)
 from text_editor.editor_logic import EditorLogic
+from text_editor.glyphs import GlyphWidths
+from text_editor.highlighter import Highlighter, get_lexer
+from text_editor.instrumentation import Instrumentation
+from text_editor.layout import LayoutEngine
+from text_editor.loader import FileLoader
+from text_editor.search import IncrementalSearch, find_next, replace_all
 from text_storage.text_storage import TextStorage
-from text_editor.utils import get_max_chars_per_line, split_text_into_lines
-from text_editor.utils import get_cursor_position
+from text_editor.utils import get_max_chars_per_line
 
 
 class TextEditorGUI:
@@ -17,18 +27,100 @@ class TextEditorGUI:
     DEFAULT_FONT_SIZE = 12
     DEFAULT_LINE_HEIGHT = 10
     DEFAULT_FONT_COLOR = "black"
+    TEXT_PADDING = 10
+    # Shortest time between two paints, about one frame at 60 Hz
+    FRAME_INTERVAL_MS = 16
+    # Time per frame spent adding loaded text to the storage
+    LOAD_BUDGET_MS = 8
+    # Keys that move or clear the cursors; all other handled keys edit
+    # the text and are ignored while a file is loading
+    NAVIGATION_KEYS = ("Left", "Right", "Escape")
+    # Colors of the highlighted token kinds
+    TOKEN_COLORS = {
+        "keyword": "#0000c0",
+        "definition": "#006080",
+        "builtin": "#7a3e9d",
+        "string": "#008000",
+        "comment": "#808080",
+        "number": "#b05000",
+        "decorator": "#a08000",
+    }
+    # Time per paint spent lexing up to the visible lines; rows whose
+    # lines are not lexed yet are drawn plain until the idle lexer is done
+    HIGHLIGHT_BUDGET_MS = 4
+    # Time per idle callback spent lexing ahead of the visible lines
+    IDLE_LEX_BUDGET_MS = 8
+    # Lines after the last visible one lexed in idle time
+    HIGHLIGHT_LOOKAHEAD = 500
 
-    def __init__(self, root: tk.Tk, text_storage: TextStorage):
+    def __init__(self, root: tk.Tk, text_storage: TextStorage,
+                 file_path: str = None,
+                 instrumentation: Instrumentation = None):
         '''
         Initialize the GUI for the custom text editor.
         :param root: The main application window (Tk).
+        :param file_path: The file the text was loaded from, if any.
+        :param instrumentation: Hot path timing, configured from the
+            environment by default.
         '''
         self.root = root
+        self.file_path = file_path
+        self.instrumentation = (instrumentation
+                                or Instrumentation.from_environment())
         # self.text_storage = GapBuffer(initial_size=50)  # Text storage
         # self.cursor_position = 0  # Current cursor position
         self.editor_logic = EditorLogic(text_storage)
+
+        # Virtual scrolling: the first visual row shown on the canvas
+        self.scroll_row = 0
+        # Offset of the first character shown on the canvas
+        self.first_visible_offset = 0
+        # Canvas items reused between redraws, one per visible row
+        self.row_items = []
+        self.rendered_rows = []
+        self.cursor_item = None
+        self.secondary_cursor_items = []
+        self.visible_lines = []
+        # The logical line and column each visible row starts at
+        self.visible_row_starts = []
+        # Colored items drawn over each row, and the layers they show
+        self.run_items = []
+        self.rendered_runs = []
+
+        # Paints are coalesced: events only mark what is dirty and one
+        # paint per frame is scheduled on the event loop
+        self.redraw_pending = None
+        self.last_paint_time = 0.0
+        self.text_dirty = True
+        self.follow_cursor = False
+        self.painted_scroll_row = None
+
+        # The file being read in the background, while it loads
+        self.loader = None
+        # The window title, shown with the progress while loading
+        self.window_title = None
+
         self._setup_ui()
 
+        # Wrapped rows are cached by the layout engine
+        self.layout = LayoutEngine(
+            self.editor_logic,
+            get_max_chars_per_line(self.char_width, self.DEFAULT_WIDTH),
+            self.glyph_widths)
+
+        # Syntax highlighting, for the file types there is a lexer for
+        self.highlighter = None
+        self.highlight_pending = None
+        self._setup_highlighter()
+
+        # Crash recovery files are written from a background thread
+        self.autosaver = Autosaver(get_recovery_path(file_path))
+        # The layout, the highlighter and the autosaver follow the changes
+        # the storage reports
+        text_storage.subscribe(self._on_text_changed)
+        text_storage.subscribe(self.autosaver.record_changes)
+        self.root.after(AUTOSAVE_INTERVAL_MS, self._on_autosave_timer)
+
         # Handle close button
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
@@ -39,6 +131,7 @@ class TextEditorGUI:
         '''
         self._setup_canvas()
         self._setup_scrollbar()
+        self._setup_find_bar()
         self._setup_menu()
         self._setup_bindings()
         self._setup_font()
@@ -52,11 +145,20 @@ class TextEditorGUI:
         self.text_area.pack(expand=True, fill="both")
 
     def _setup_scrollbar(self):
-        # Add a scrollbar (optional)
+        # The scrollbar drives self.scroll_row instead of scrolling the
+        # canvas, so only the visible lines ever need canvas items
         self.scrollbar = tk.Scrollbar(self.text_area)
         self.scrollbar.pack(side="right", fill="y")
-        self.text_area.config(yscrollcommand=self.scrollbar.set)
-        self.scrollbar.config(command=self.text_area.yview)
+        self.scrollbar.config(command=self.on_scroll)
+
+    def _setup_find_bar(self):
+        # Search as you type; shown below the canvas by Ctrl+F
+        self.find_bar = tk.Entry(self.root)
+        self.find_bar.bind("<KeyRelease>", self.on_find_typed)
+        self.find_bar.bind("<Return>", lambda event: self.on_find_next())
+        self.find_bar.bind("<Escape>", lambda event: self.on_find_close())
+        self.incremental_search = None
+        self.find_query = ""
 
     def _setup_menu(self):
         # Add a basic menu bar
@@ -65,24 +167,80 @@ class TextEditorGUI:
 
         # File menu
         file_menu = tk.Menu(menu_bar, tearoff=False)
+        file_menu.add_command(label="Save", accelerator="Ctrl+S",
+                              command=self.on_save)
+        file_menu.add_command(label="Save As...", command=self.on_save_as)
+        file_menu.add_separator()
         file_menu.add_command(label="Quit", command=self.on_close)
         menu_bar.add_cascade(label="File", menu=file_menu)
 
+        # Edit menu
+        edit_menu = tk.Menu(menu_bar, tearoff=False)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z",
+                              command=self.on_undo)
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y",
+                              command=self.on_redo)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Find...", accelerator="Ctrl+F",
+                              command=self.on_find)
+        edit_menu.add_command(label="Find Next", accelerator="F3",
+                              command=self.on_find_next)
+        edit_menu.add_command(label="Replace All...",
+                              command=self.on_replace_all)
+        menu_bar.add_cascade(label="Edit", menu=edit_menu)
+
+        # Debug menu
+        self.stats_enabled = tk.BooleanVar(
+            self.root, value=self.instrumentation.enabled)
+        self.profile_enabled = tk.BooleanVar(
+            self.root, value=self.instrumentation.profiler is not None)
+        debug_menu = tk.Menu(menu_bar, tearoff=False)
+        debug_menu.add_checkbutton(label="Record Stats",
+                                   variable=self.stats_enabled,
+                                   command=self.on_toggle_stats)
+        debug_menu.add_command(label="Dump Stats...",
+                               command=self.on_dump_stats)
+        debug_menu.add_checkbutton(label="Profile",
+                                   variable=self.profile_enabled,
+                                   command=self.on_toggle_profile)
+        menu_bar.add_cascade(label="Debug", menu=debug_menu)
+
     def _setup_bindings(self):
         # Event Bindings
         self.text_area.bind("<Key>", self.on_key_press)
         self.text_area.bind("<Button-1>", self.on_mouse_click)
-        self.text_area.bind("<Configure>", lambda event: self.redraw())
+        self.text_area.bind("<Control-Button-1>", self.on_mouse_add_cursor)
+        self.text_area.bind("<Control-s>", lambda event: self.on_save())
+        self.text_area.bind("<Control-z>", lambda event: self.on_undo())
+        self.text_area.bind("<Control-y>", lambda event: self.on_redo())
+        self.text_area.bind("<Control-Z>", lambda event: self.on_redo())
+        self.text_area.bind("<Control-f>", lambda event: self.on_find())
+        self.text_area.bind("<F3>", lambda event: self.on_find_next())
+        self.text_area.bind("<Configure>",
+                            lambda event: self.schedule_redraw())
+        self.text_area.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.text_area.bind("<Button-4>", self.on_mouse_wheel)
+        self.text_area.bind("<Button-5>", self.on_mouse_wheel)
 
         # Ensure Canvas widget has focus to receive key events
         self.text_area.focus_set()
 
+    def _setup_highlighter(self):
+        '''
+        Highlight the text if there is a lexer for the file's type.
+        '''
+        lexer = get_lexer(self.file_path)
+        self.highlighter = (Highlighter(self.editor_logic, lexer)
+                            if lexer is not None else None)
+
     def _setup_font(self):
         self.font = Font(
             family=self.DEFAULT_FONT_FAMILY, size=self.DEFAULT_FONT_SIZE)
         self.line_height = self.DEFAULT_LINE_HEIGHT
         self.font_fill = self.DEFAULT_FONT_COLOR
         self.char_width = self.font.measure("m")
+        # Widths of every character drawn, measured once each
+        self.glyph_widths = GlyphWidths(self.font)
 
     # Event Handlers
     def on_key_press(self, event):
@@ -90,33 +248,225 @@ class TextEditorGUI:
         Handle key press events in the text editor.
         :param event: The key press event.
         '''
-        if event.char and event.keysym.isprintable():
-            self.editor_logic.insert_character(event.char)
-        elif event.keysym == "Return":
-            self.editor_logic.insert_character("\n")
-        elif event.keysym == "BackSpace":
-            self.editor_logic.delete_character()
-        elif event.keysym == "Delete":
-            self.editor_logic.delete_next_character()
-        elif event.keysym == "Left":
-            self.editor_logic.move_left()
-        elif event.keysym == "Right":
-            self.editor_logic.move_right()
-        else:
+        is_edit = event.keysym not in self.NAVIGATION_KEYS
+        if self.loader is not None and is_edit:
+            # The text is read-only until the whole file is loaded
             return
+        self.instrumentation.event_started()
+
+        # The changes reach the layout when the batch ends
+        with self.editor_logic.text_storage.batch():
+            # Named keys first: Escape and others also carry a char
+            if event.keysym == "Return":
+                self.editor_logic.insert_character("\n")
+            elif event.keysym == "BackSpace":
+                self.editor_logic.delete_character()
+            elif event.keysym == "Delete":
+                self.editor_logic.delete_next_character()
+            elif event.keysym == "Left":
+                self.editor_logic.move_left()
+            elif event.keysym == "Right":
+                self.editor_logic.move_right()
+            elif event.keysym == "Escape":
+                self.editor_logic.clear_cursors()
+            elif event.char and (event.char.isprintable()
+                                 or event.char == "\t"):
+                self.editor_logic.insert_character(event.char)
+            else:
+                return
+            self.instrumentation.phase_done("storage")
+        if is_edit:
+            self.instrumentation.phase_done("layout")
 
-        # Redraw the canvas after every valid change
-        self.redraw()
+        # Paint once the pending input has been handled
+        self.schedule_redraw(text_changed=is_edit, follow_cursor=True)
 
     def on_mouse_click(self, event):
         '''
         Handle mouse click events in the text editor.
         :param event: The mouse click event.
         '''
+        self.instrumentation.event_started()
         cursor_position = self._get_text_cursor_position(event.x, event.y)
+        self.instrumentation.phase_done("layout")
 
         self.editor_logic.move_cursor(cursor_position)
-        self.redraw()
+        self.instrumentation.phase_done("storage")
+        self.schedule_redraw(text_changed=False)
+
+    def on_mouse_add_cursor(self, event):
+        '''
+        Handle Ctrl+click by adding a cursor for multi-cursor editing.
+        :param event: The mouse click event.
+        '''
+        cursor_position = self._get_text_cursor_position(event.x, event.y)
+        self.editor_logic.add_cursor(cursor_position)
+        self.schedule_redraw(text_changed=False)
+        # Keep the plain click binding from moving the primary cursor
+        return "break"
+
+    def on_scroll(self, *args):
+        '''
+        Handle scrollbar commands.
+        :param args: ("moveto", fraction) or ("scroll", count, what).
+        '''
+        if args[0] == "moveto":
+            row = int(float(args[1]) * self.layout.visual_line_count())
+        elif args[0] == "scroll":
+            count = int(args[1])
+            if args[2] == "pages":
+                count *= max(1, self._get_visible_row_count() - 1)
+            row = self.scroll_row + count
+        else:
+            return
+        if self._set_scroll_row(row):
+            self.schedule_redraw(text_changed=False)
+
+    def on_mouse_wheel(self, event):
+        '''
+        Handle mouse wheel events by scrolling three rows at a time.
+        :param event: The mouse wheel event.
+        '''
+        if event.num == 4 or event.delta > 0:
+            row = self.scroll_row - 3
+        elif event.num == 5 or event.delta < 0:
+            row = self.scroll_row + 3
+        else:
+            return
+        if self._set_scroll_row(row):
+            self.schedule_redraw(text_changed=False)
+
+    def on_undo(self):
+        '''
+        Undo the last edit.
+        '''
+        self._apply_history(self.editor_logic.undo)
+
+    def on_redo(self):
+        '''
+        Redo the last undone edit.
+        '''
+        self._apply_history(self.editor_logic.redo)
+
+    def on_find(self):
+        '''
+        Show the find bar and start searching from the cursor.
+        '''
+        self.incremental_search = IncrementalSearch(
+            self.editor_logic.text_storage,
+            self.editor_logic.cursor_position)
+        self.find_query = ""
+        self.find_bar.pack(side="bottom", fill="x", before=self.text_area)
+        self.find_bar.focus_set()
+        self.on_find_typed()
+
+    def on_find_typed(self, event=None):
+        '''
+        Move the cursor to the first match of the find bar's text after
+        where the search started.
+        '''
+        query = self.find_bar.get()
+        if query == self.find_query or self.incremental_search is None:
+            return
+        self.find_query = query
+        match = self.incremental_search.update(query)
+        if match is not None:
+            self._move_to_match(match)
+
+    def on_find_next(self):
+        '''
+        Move the cursor to the next match after it, wrapping around.
+        '''
+        query = self.find_bar.get()
+        if not query:
+            self.on_find()
+            return
+        match = find_next(self.editor_logic.text_storage, query,
+                          self.editor_logic.cursor_position)
+        if match is not None:
+            self._move_to_match(match)
+
+    def on_find_close(self):
+        '''
+        Hide the find bar.
+        '''
+        self.find_bar.pack_forget()
+        self.incremental_search = None
+        self.text_area.focus_set()
+
+    def on_replace_all(self):
+        '''
+        Ask for a text and its replacement, and replace every match as a
+        single edit.
+        '''
+        if self.loader is not None:
+            return
+        query = simpledialog.askstring("Replace All", "Find:",
+                                       initialvalue=self.find_bar.get(),
+                                       parent=self.root)
+        if not query:
+            return
+        replacement = simpledialog.askstring("Replace All", "Replace with:",
+                                             parent=self.root)
+        if replacement is None:
+            return
+
+        count = replace_all(self.editor_logic, query, replacement)
+        if count:
+            self.schedule_redraw(follow_cursor=True)
+        messagebox.showinfo("Replace All", f"Replaced {count} matches.")
+
+    def on_save(self):
+        '''
+        Save the text to the current file, asking for one if needed.
+        '''
+        if self.file_path is None:
+            self.on_save_as()
+            return
+        self._save_to(self.file_path)
+
+    def on_save_as(self):
+        '''
+        Ask for a file and save the text to it.
+        '''
+        file_path = filedialog.asksaveasfilename(parent=self.root)
+        if file_path:
+            self._save_to(file_path)
+
+    def on_toggle_stats(self):
+        '''
+        Start or stop recording latencies and counters.
+        '''
+        self.instrumentation.enabled = self.stats_enabled.get()
+
+    def on_dump_stats(self):
+        '''
+        Ask for a file and write the recorded stats to it.
+        '''
+        file_path = filedialog.asksaveasfilename(
+            parent=self.root, defaultextension=".txt")
+        if not file_path:
+            return
+        try:
+            self.instrumentation.dump(file_path,
+                                      self.editor_logic.text_storage)
+        except OSError as e:
+            messagebox.showerror("Save Error", f"Failed to save stats: {e}")
+
+    def on_toggle_profile(self):
+        '''
+        Start a cProfile capture, or stop it and ask where to save it.
+        '''
+        if self.profile_enabled.get():
+            self.instrumentation.start_profile()
+            return
+        file_path = filedialog.asksaveasfilename(
+            parent=self.root, defaultextension=".prof")
+        try:
+            self.instrumentation.stop_profile(file_path or None)
+        except OSError as e:
+            messagebox.showerror("Save Error",
+                                 f"Failed to save profile: {e}")
 
     def on_close(self):
         '''
@@ -124,78 +474,624 @@ class TextEditorGUI:
         '''
         # Confirm the exit with a dialog box
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
+            if self.loader is not None:
+                self.loader.cancel()
+            self.autosaver.close(discard=True)
+            self.instrumentation.close(self.editor_logic.text_storage)
             self.root.destroy()
 
+    def offer_recovery(self):
+        '''
+        If an earlier session left recovery files for this document, ask
+        whether to restore their text, one set of files at a time until
+        one is restored. It replaces the loaded text as one edit that can
+        be undone.
+        '''
+        for recovery_path in find_recoveries(self.file_path):
+            if not messagebox.askyesno(
+                    "Recover", "The editor did not close properly. "
+                    "Recover the unsaved changes?"):
+                discard_recovery(recovery_path)
+                continue
+            text = recover(recovery_path)
+            if text is None:
+                messagebox.showerror("Recover Error",
+                                     "The recovery file could not be read.")
+                return
+            # The recovered text already holds the whole file
+            if self.loader is not None:
+                self.loader.cancel()
+                self._finish_loading()
+            self.editor_logic.replace_range(
+                0, self.editor_logic.get_length(), text, cursor=0)
+            if recovery_path != self.autosaver.recovery_path:
+                # Another editor's files: keep the text in this editor's
+                # own before deleting them
+                self.autosaver.save_snapshot(self.editor_logic.text_storage)
+                self.autosaver.flush()
+                if self.autosaver.error is None:
+                    discard_recovery(recovery_path)
+            self.schedule_redraw(follow_cursor=True)
+            return
+
+    def start_loading(self, loader: FileLoader):
+        '''
+        Stream a file into the (empty) text storage. The loader reads it
+        in the background and every frame adds what has arrived, so the
+        first screen is painted as soon as it is read and the text can be
+        scrolled while the rest loads. Editing waits until it is done.
+
+        Args:
+            loader (FileLoader): The loader of the file, not started yet.
+        '''
+        self.loader = loader
+        # The file already holds what is loaded, so it is not journaled
+        self.editor_logic.text_storage.unsubscribe(
+            self.autosaver.record_changes)
+        self.window_title = self.root.title()
+        loader.start()
+        self.root.after_idle(self._on_load_timer)
+
     # Rendering Methods
+    def schedule_redraw(self, text_changed: bool = True,
+                        follow_cursor: bool = False):
+        '''
+        Mark part of the canvas as dirty and schedule a paint. However
+        many events arrive before it runs, only one paint happens, and
+        paints are at least FRAME_INTERVAL_MS apart.
+
+        Args:
+            text_changed (bool): Whether the visible text may have
+                changed, or only the cursor moved.
+            follow_cursor (bool): Whether to scroll the cursor into view
+                before painting.
+        '''
+        self.text_dirty = self.text_dirty or text_changed
+        self.follow_cursor = self.follow_cursor or follow_cursor
+        if self.redraw_pending is not None:
+            return
+
+        elapsed_ms = (time.monotonic() - self.last_paint_time) * 1000
+        delay_ms = int(self.FRAME_INTERVAL_MS - elapsed_ms)
+        if delay_ms > 0:
+            self.redraw_pending = self.root.after(
+                delay_ms, self._on_redraw_timer)
+        else:
+            self.redraw_pending = self.root.after_idle(
+                self._on_redraw_timer)
+
+    def flush_redraw(self):
+        '''
+        Run a scheduled paint now instead of waiting for the event loop.
+        '''
+        if self.redraw_pending is not None:
+            self._paint()
+
     def redraw(self):
         '''
-        Redraw the text editor canvas.
+        Redraw the visible part of the text editor canvas now.
+        '''
+        self.text_dirty = True
+        self._paint()
+
+    def _on_redraw_timer(self):
+        '''
+        Run the paint scheduled by schedule_redraw.
+        '''
+        self.redraw_pending = None
+        self._paint()
+
+    def _paint(self):
+        '''
+        Paint the dirty parts of the canvas: the rows only if the text or
+        the scroll position changed, then the cursor.
         '''
-        self.text_area.delete("all")  # Clear the canvas
-        lines = self._get_text_lines()
+        self.instrumentation.paint_started()
+        # A direct paint replaces the scheduled one
+        if self.redraw_pending is not None:
+            self.root.after_cancel(self.redraw_pending)
+            self.redraw_pending = None
+        if self.follow_cursor:
+            self._scroll_to_cursor()
+            self.follow_cursor = False
 
-        self.render_text(lines)
-        self.render_cursor(lines)
+        if self.text_dirty or self.scroll_row != self.painted_scroll_row:
+            self.visible_lines = self._get_text_lines()
+            self.render_text(self.visible_lines)
+            self._update_scrollbar(self.visible_lines)
+            self.painted_scroll_row = self.scroll_row
+            self.text_dirty = False
+        self.render_cursor(self.visible_lines)
+        self.last_paint_time = time.monotonic()
+        self.instrumentation.paint_done()
 
     def render_text(self, lines: list[str]):
         '''
-        Render the text on the canvas.
+        Render the visible lines on the canvas. Canvas items from the
+        previous redraw are reused and only rows whose text or colors
+        changed are updated.
         '''
+        row_tokens = self._get_row_tokens(lines) or ()
         for i, line in enumerate(lines):
-            y_position = 10 + i * self.line_height
-            self.text_area.create_text(10, y_position, anchor="nw", text=line,
-                                       font=self.font, fill=self.font_fill)
+            tokens = row_tokens[i] if i < len(row_tokens) else None
+            runs = (_split_runs(line, tokens,
+                                self.layout.get_positions(line))
+                    if tokens else ())
+            if i < len(self.row_items):
+                if self.rendered_rows[i] != line or \
+                        self.rendered_runs[i] != runs:
+                    text = runs[0] if runs else line
+                    self.text_area.itemconfigure(self.row_items[i],
+                                                 text=text)
+                    self.rendered_rows[i] = line
+                    self._render_runs(i, runs)
+                continue
+            y_position = self.TEXT_PADDING + i * self.line_height
+            item = self.text_area.create_text(
+                self.TEXT_PADDING, y_position, anchor="nw",
+                text=runs[0] if runs else line, font=self.font,
+                fill=self.font_fill)
+            self.instrumentation.count("canvas_items_created")
+            self.row_items.append(item)
+            self.rendered_rows.append(line)
+            self.run_items.append([])
+            self.rendered_runs.append(())
+            self._render_runs(i, runs)
+
+        # Blank the rows below the end of the text
+        for i in range(len(lines), len(self.row_items)):
+            if self.rendered_rows[i]:
+                self.text_area.itemconfigure(self.row_items[i], text="")
+                self.rendered_rows[i] = ""
+            self._render_runs(i, ())
+
+    def _render_runs(self, row: int, runs: tuple):
+        '''
+        Draw the runs of a highlighted row after its base item, each at
+        the x position the layout gives its first character. Items are
+        reused and the spare ones blanked.
+
+        Args:
+            row (int): The index of the visible row.
+            runs (tuple): The row's runs from _split_runs(), or ().
+        '''
+        if self.rendered_runs[row] == runs:
+            return
+        items = self.run_items[row]
+        y_position = self.TEXT_PADDING + row * self.line_height
+        placed = runs[1] if runs else ()
+        for i, (x, kind, text) in enumerate(placed):
+            x_position = self.TEXT_PADDING + x
+            fill = self.TOKEN_COLORS.get(kind, self.font_fill)
+            if i < len(items):
+                self.text_area.coords(items[i], x_position, y_position)
+                self.text_area.itemconfigure(items[i], text=text, fill=fill)
+                continue
+            items.append(self.text_area.create_text(
+                x_position, y_position, anchor="nw", text=text,
+                font=self.font, fill=fill))
+            self.instrumentation.count("canvas_items_created")
+        for item in items[len(placed):]:
+            self.text_area.itemconfigure(item, text="")
+        self.rendered_runs[row] = runs
 
     def render_cursor(self, lines: list[str]):
         '''
-        Render the cursor on the canvas.
-        :param cursor_line: The line number where the cursor is located.
-        :param cursor_offset: The offset within the line where
-        the cursor is located.
+        Render the cursor on the canvas, hiding it when it is outside the
+        visible rows.
         '''
         cursor_position = self.editor_logic.cursor_position
 
         # Calculate the cursor position
-        cursor_line, cursor_offset = get_cursor_position(lines,
-                                                         cursor_position)
+        cursor_row, cursor_offset = self.layout.offset_to_row_col(
+            cursor_position)
+        cursor_line = cursor_row - self.scroll_row
+
+        cursor_y = self.TEXT_PADDING + cursor_line * self.line_height
+        cursor_x = self.TEXT_PADDING + self.layout.column_to_x(
+            cursor_row, cursor_offset)
+        if self.cursor_item is None:
+            self.cursor_item = self.text_area.create_line(
+                0, 0, 0, 0, fill="green", width=2)
+            self.instrumentation.count("canvas_items_created")
+        self.text_area.coords(self.cursor_item, cursor_x, cursor_y,
+                              cursor_x, cursor_y + self.line_height)
+
+        visible = 0 <= cursor_line < self._get_visible_row_count()
+        self.text_area.itemconfigure(
+            self.cursor_item, state="normal" if visible else "hidden")
+        self._render_secondary_cursors()
+
+    def _render_secondary_cursors(self):
+        '''
+        Render the other cursors of multi-cursor editing. Only the ones
+        between the first and last visible offsets are mapped to rows;
+        their canvas items are reused and the spare ones hidden.
+        '''
+        cursors = self.editor_logic.secondary_cursors
+        visible_rows = self._get_visible_row_count()
+        if cursors:
+            last_visible_offset = self.layout.row_col_to_offset(
+                self.scroll_row + visible_rows, 0)
+            cursors = cursors[
+                bisect_left(cursors, self.first_visible_offset):
+                bisect_right(cursors, last_visible_offset)]
 
-        cursor_y = 10 + cursor_line * self.line_height
-        # cursor_x = 10 + (self.editor_logic.cursor_position * 7)
-        cursor_x = 10 + cursor_offset * self.char_width
-        self.text_area.create_line(cursor_x, cursor_y,
-                                   cursor_x, cursor_y + self.line_height,
-                                   fill="green", width=2)
+        for i, cursor in enumerate(cursors):
+            row, column = self.layout.offset_to_row_col(cursor)
+            y = self.TEXT_PADDING + (row - self.scroll_row) * self.line_height
+            x = self.TEXT_PADDING + self.layout.column_to_x(row, column)
+            if i == len(self.secondary_cursor_items):
+                self.secondary_cursor_items.append(
+                    self.text_area.create_line(0, 0, 0, 0, fill="green",
+                                               width=2))
+                self.instrumentation.count("canvas_items_created")
+            item = self.secondary_cursor_items[i]
+            self.text_area.coords(item, x, y, x, y + self.line_height)
+            self.text_area.itemconfigure(item, state="normal")
+
+        for item in self.secondary_cursor_items[len(cursors):]:
+            self.text_area.itemconfigure(item, state="hidden")
 
     # Protected Utility Methods
+    def _save_to(self, file_path: str):
+        '''
+        Save the text to a file, reporting any error in a dialog.
+        '''
+        if self.loader is not None:
+            messagebox.showinfo("Save", "The file is still loading.")
+            return
+        try:
+            self.editor_logic.save(file_path)
+        except OSError as e:
+            messagebox.showerror("Save Error", f"Failed to save file: {e}")
+            return
+        # The file holds every edit now
+        self.autosaver.discard()
+        self.autosaver.recovery_path = get_recovery_path(file_path)
+        if file_path != self.file_path:
+            self.file_path = file_path
+            self._setup_highlighter()
+            self.schedule_redraw()
+
+    def _on_load_timer(self):
+        '''
+        Add the chunks the loader has read, for at most LOAD_BUDGET_MS,
+        and schedule the next frame until the file is loaded.
+        '''
+        loader = self.loader
+        if loader is None:
+            return
+        deadline = time.monotonic() + self.LOAD_BUDGET_MS / 1000
+        appended = False
+        while time.monotonic() < deadline:
+            chunk = loader.get_chunk()
+            if chunk is None:
+                break
+            self.editor_logic.append_text(chunk)
+            appended = True
+
+        if appended:
+            self.schedule_redraw()
+
+        if loader.done:
+            self._finish_loading()
+            if loader.error is not None:
+                messagebox.showerror(
+                    "Open Error", f"Failed to load file: {loader.error}")
+            return
+        self.root.title(
+            f"{self.window_title} - loading {loader.progress():.0%}")
+        self.root.after(self.FRAME_INTERVAL_MS, self._on_load_timer)
+
+    def _finish_loading(self):
+        '''
+        Make the text editable again once loading has stopped.
+        '''
+        self.loader = None
+        self.root.title(self.window_title)
+        self.editor_logic.text_storage.subscribe(
+            self.autosaver.record_changes)
+        # Appending left the storage cursor at the end
+        self.editor_logic.move_cursor(self.editor_logic.cursor_position)
+
+    def _on_autosave_timer(self):
+        '''
+        Hand the edits since the last tick to the autosaver and schedule
+        the next tick. Only a snapshot is taken here; writing happens in
+        the background.
+        '''
+        self.autosaver.tick(self.editor_logic.text_storage)
+        self.root.after(AUTOSAVE_INTERVAL_MS, self._on_autosave_timer)
+
+    def _get_visible_row_count(self) -> int:
+        '''
+        Return the number of rows that fit on the canvas.
+        '''
+        return max(1, self.text_area.winfo_height() // self.line_height)
+
+    def _set_scroll_row(self, row: int) -> bool:
+        '''
+        Scroll so that a visual row is the first one shown.
+
+        Returns:
+            bool: Whether the scroll position changed.
+        '''
+        last_row = self.layout.visual_line_count() - 1
+        row = max(0, min(row, last_row))
+        if row == self.scroll_row:
+            return False
+        self.scroll_row = row
+        return True
+
+    def _scroll_to_cursor(self):
+        '''
+        Adjust the scroll position so the cursor's row is visible.
+        '''
+        cursor_row, _ = self.layout.offset_to_row_col(
+            self.editor_logic.cursor_position)
+        visible_rows = self._get_visible_row_count()
+        if cursor_row < self.scroll_row:
+            self.scroll_row = cursor_row
+        elif cursor_row >= self.scroll_row + visible_rows:
+            self.scroll_row = cursor_row - visible_rows + 1
+
+    def _move_to_match(self, match: tuple[int, int]):
+        '''
+        Move the cursor to the end of a search match and show it.
+        '''
+        self.editor_logic.move_cursor(match[1])
+        self.schedule_redraw(text_changed=False, follow_cursor=True)
+
+    def _apply_history(self, step):
+        '''
+        Apply an undo or redo step and update the view.
+
+        Args:
+            step: EditorLogic.undo or EditorLogic.redo.
+        '''
+        if self.loader is not None:
+            return
+        self.instrumentation.event_started()
+        with self.editor_logic.text_storage.batch():
+            position = step()
+            if position is None:
+                return
+            self.instrumentation.phase_done("storage")
+        self.instrumentation.phase_done("layout")
+        self.schedule_redraw(follow_cursor=True)
+
+    def _on_text_changed(self, changes: list):
+        '''
+        Update the layout, the highlighter and the search results after
+        an operation changed the text, a storage change listener. The
+        layout still has the line count from before the operation.
+
+        A single change touched the lines from the one at its offset.
+        Several changes in ascending order (an edit at every cursor) that
+        kept the number of lines each touched only the line at their
+        offset; otherwise the line numbers between them moved, so the
+        layout is rebuilt.
+
+        Args:
+            changes (list): The storage's ChangeEvents.
+        '''
+        editor_logic = self.editor_logic
+        line_delta = (editor_logic.get_line_count()
+                      - self.layout.get_line_count())
+        if len(changes) == 1:
+            self._lines_changed(
+                editor_logic.get_line_number(changes[0].offset), line_delta)
+        elif line_delta or not _in_one_line_each(changes):
+            self._reset_layout()
+        else:
+            lines = {editor_logic.get_line_number(change.offset)
+                     for change in changes}
+            for line in lines:
+                self._lines_changed(line, 0)
+        # Cached search results are stale after an edit
+        if self.incremental_search is not None:
+            self.incremental_search.reset()
+
+    def _lines_changed(self, first_line: int, line_delta: int):
+        '''
+        Tell the layout engine and the highlighter which lines an edit
+        touched. See LayoutEngine.lines_changed.
+        '''
+        self.layout.lines_changed(first_line, line_delta)
+        if self.highlighter is not None:
+            self.highlighter.lines_changed(first_line, line_delta)
+
+    def _reset_layout(self):
+        '''
+        Rebuild the layout and the highlighter after an edit that may have
+        changed any line.
+        '''
+        self.layout.reset()
+        if self.highlighter is not None:
+            self.highlighter.reset()
+
+    def _update_scrollbar(self, lines: list[str]):
+        '''
+        Size the scrollbar to the visible share of the wrapped rows.
+        '''
+        total_rows = self.layout.visual_line_count()
+        first = self.scroll_row / total_rows
+        last = min(1.0, (self.scroll_row + max(1, len(lines))) / total_rows)
+        self.scrollbar.set(first, last)
+
     def _get_text_lines(self):
         '''
-        Get the text lines based on the current text content.
+        Get the rows of text that fit on the canvas, starting at the
+        first visible row and reading only those lines from the text
+        storage.
+
+        Monospace fonts wrap rows by characters, which needs no text to
+        count the rows; other fonts wrap them by the width of their
+        glyphs.
         '''
-        text = self.editor_logic.get_text()
         canvas_width = self.text_area.winfo_width()
-        max_chars_per_line = get_max_chars_per_line(self.char_width,
-                                                    canvas_width)
-        return split_text_into_lines(text, max_chars_per_line)
+        max_chars = get_max_chars_per_line(self.char_width, canvas_width)
+        if self.glyph_widths.is_monospace():
+            self.layout.set_max_chars_per_line(max_chars)
+        else:
+            self.layout.set_max_width(max_chars * self.char_width)
+        self.scroll_row = min(self.scroll_row,
+                              self.layout.visual_line_count() - 1)
+        line_number, first_row = self.layout.line_at_row(self.scroll_row)
+        starts = self.layout.get_row_starts(line_number)
+        skipped_rows = min(self.scroll_row - first_row, len(starts) - 1)
+        self.first_visible_offset = (
+            self.editor_logic.get_line_start(line_number)
+            + starts[skipped_rows])
+        self.visible_row_starts = []
+        if not self.editor_logic.get_length():
+            return []
+
+        visible_rows = self._get_visible_row_count()
+        line_count = self.layout.get_line_count()
+        lines = []
+        while line_number < line_count and len(lines) < visible_rows:
+            rows = self.layout.get_rows(line_number)[skipped_rows:]
+            starts = self.layout.get_row_starts(line_number)[skipped_rows:]
+            lines.extend(rows)
+            self.visible_row_starts.extend(
+                (line_number, column) for column in starts)
+            line_number += 1
+            skipped_rows = 0
+        del self.visible_row_starts[visible_rows:]
+        return lines[:visible_rows]
+
+    def _get_row_tokens(self, lines: list[str]) -> list:
+        '''
+        Return the highlighted tokens of every visible row, lexing up to
+        the visible lines for at most HIGHLIGHT_BUDGET_MS. Rows whose
+        lines are not lexed by then are drawn plain; the idle lexer
+        repaints them.
+
+        Args:
+            lines (list[str]): The visible rows.
+
+        Returns:
+            list: Per row, the tokens as (start, end, kind) columns of
+                the row, or None if the text is not highlighted.
+        '''
+        highlighter = self.highlighter
+        if highlighter is None or not self.visible_row_starts:
+            return None
+        deadline = time.monotonic() + self.HIGHLIGHT_BUDGET_MS / 1000
+        highlighter.lex_to(self.visible_row_starts[-1][0], deadline)
+
+        row_tokens = []
+        tokens_line = tokens = None
+        for (line, column), row in zip(self.visible_row_starts, lines):
+            if line != tokens_line:
+                tokens_line = line
+                tokens = highlighter.get_tokens(line) or ()
+            end = column + len(row)
+            row_tokens.append([
+                (max(start, column) - column, min(stop, end) - column, kind)
+                for start, stop, kind in tokens
+                if start < end and stop > column])
+        self._schedule_highlight()
+        return row_tokens
+
+    def _schedule_highlight(self):
+        '''
+        Lex ahead of the visible lines when the event loop is idle, unless
+        that is already scheduled or done.
+        '''
+        if self.highlight_pending is not None:
+            return
+        last_line = self.visible_row_starts[-1][0]
+        if not self.highlighter.is_lexed(last_line + self.HIGHLIGHT_LOOKAHEAD):
+            self.highlight_pending = self.root.after_idle(
+                self._on_highlight_idle)
+
+    def _on_highlight_idle(self):
+        '''
+        Lex up to HIGHLIGHT_LOOKAHEAD lines past the visible ones for at
+        most IDLE_LEX_BUDGET_MS, repainting once the visible lines can be
+        highlighted, and continue later if there is more to lex.
+        '''
+        self.highlight_pending = None
+        highlighter = self.highlighter
+        if highlighter is None or not self.visible_row_starts:
+            return
+        last_line = self.visible_row_starts[-1][0]
+        was_lexed = highlighter.is_lexed(last_line)
+        deadline = time.monotonic() + self.IDLE_LEX_BUDGET_MS / 1000
+        done = highlighter.lex_to(last_line + self.HIGHLIGHT_LOOKAHEAD,
+                                  deadline)
+        if not was_lexed and highlighter.is_lexed(last_line):
+            self.schedule_redraw()
+        if not done:
+            # Let the events that arrived meanwhile run first
+            self.highlight_pending = self.root.after(
+                1, self._on_highlight_idle)
 
     def _get_text_cursor_position(self, x: int, y: int):
         '''
         Get the cursor position based on the mouse click coordinates.
         '''
-        lines = self._get_text_lines()
+        clicked_row = self.scroll_row + max(
+            0, (y - self.TEXT_PADDING) // self.line_height)
+        # The nearest gap between two characters
+        clicked_column = self.layout.x_to_column(clicked_row,
+                                                 x - self.TEXT_PADDING)
 
-        line_height = self.line_height
-        clicked_line_index = (y // line_height) - 1
-        clicked_offset_index = (x // self.char_width) - 1
+        # Rows below the last line place the cursor at the end of the text
+        return self.layout.row_col_to_offset(clicked_row, clicked_column)
 
-        if clicked_line_index < len(lines):
-            line_text = lines[clicked_line_index]
-            cursor_position = sum(
-                len(line) for line in lines[:clicked_line_index]
-                ) + min(clicked_offset_index, len(line_text))
-        else:
-            # Place at the end of the text if clicked below the last line
-            cursor_position = len(
-                self.editor_logic.get_text()
-                )
 
-        return cursor_position
+def _in_one_line_each(changes: list) -> bool:
+    '''
+    Return whether changes are in ascending order and inserted no
+    newlines. If they kept the number of lines, they removed none either,
+    so each stayed on the line at its offset.
+    '''
+    end = 0
+    for change in changes:
+        if change.offset < end or "\n" in change.inserted:
+            return False
+        end = change.offset + len(change.inserted)
+    return True
+
+
+def _split_runs(row: str, tokens: list, positions) -> tuple:
+    '''
+    Split a highlighted row into runs drawn as separate canvas items: the
+    tokens and the plain text between them, each placed at the x of its
+    first character, so they line up whatever the widths of the glyphs.
+    Runs are split at tabs too, since Tk lays out tabs from the start of
+    an item rather than the row.
+
+    Args:
+        row (str): The text of the row.
+        tokens (list): The row's tokens as (start, end, kind) columns.
+        positions: The x position of every character of the row.
+    Returns:
+        tuple: The text of the row's base item, drawn at the start of the
+            row, and the other runs as a tuple of (x, kind, text), kind
+            being None for plain text.
+    '''
+    segments = []
+    column = 0
+    for start, end, kind in sorted(tokens):
+        if start > column:
+            segments.append((column, start, None))
+        segments.append((start, end, kind))
+        column = end
+    segments.append((column, len(row), None))
+
+    base = ""
+    runs = []
+    for start, end, kind in segments:
+        for part in row[start:end].split("\t"):
+            if part.strip():
+                if start == 0 and kind is None:
+                    base = part
+                else:
+                    runs.append((positions[start], kind, part))
+            start += len(part) + 1
+    return base, tuple(runs)
@@ -0,0 +1,287 @@
+# highlighter.py
+import builtins
+import keyword
+import os
+import re
+import time
+
+
+# End state of a line that is not inside a multi-line token
+NORMAL = 0
+# Lines read from the storage at a time while lexing
+LEX_BATCH_LINES = 256
+
+# Where the next token can start on a line of Python, outside strings
+PYTHON_TOKEN = re.compile(r'''
+      (?P<comment>\#.*)
+    | (?P<string>(?:\b[rRbBuUfF]{1,2})?
+                 (?:\'\'\'|"""|'(?:\\.|[^\\'])*'?|"(?:\\.|[^\\"])*"?))
+    | (?P<number>\b\d[\w.]*|\.\d[\w.]*)
+    | (?P<name>[^\W\d]\w*)
+''', re.VERBOSE)
+PYTHON_DECORATOR = re.compile(r"\s*(@[\w.]*)")
+
+
+class PythonLexer:
+    '''
+    Lexes Python a line at a time. The state a line ends in is NORMAL or
+    the quotes of the triple-quoted string it ends inside, which is all
+    the next line needs to know.
+    '''
+    KEYWORDS = frozenset(keyword.kwlist)
+    BUILTINS = frozenset(name for name in dir(builtins)
+                         if not name.startswith("_"))
+    DEFINERS = ("def", "class")
+
+    def end_state(self, line: str, state) -> object:
+        '''
+        Return the state a line ends in, without building its tokens when
+        it can not open or close a triple-quoted string.
+
+        Args:
+            line (str): The line without its newline.
+            state: The state the line starts in.
+        '''
+        if state == NORMAL:
+            if '"""' not in line and "'''" not in line:
+                return NORMAL
+        elif state not in line:
+            return state
+        return self.lex_line(line, state)[1]
+
+    def lex_line(self, line: str, state) -> tuple[list, object]:
+        '''
+        Split a line into highlighted tokens. Text between tokens is not
+        highlighted.
+
+        Args:
+            line (str): The line without its newline.
+            state: The state the line starts in.
+        Returns:
+            tuple[list, object]: The tokens as (start, end, kind), and
+                the state the line ends in.
+        '''
+        tokens = []
+        position = 0
+        if state != NORMAL:
+            position = _find_closing_quotes(line, 0, state)
+            if position < 0:
+                return [(0, len(line), "string")], state
+            tokens.append((0, position, "string"))
+
+        decorator = PYTHON_DECORATOR.match(line, position)
+        if decorator and decorator.group(1) != "@":
+            tokens.append((decorator.start(1), decorator.end(), "decorator"))
+            position = decorator.end()
+
+        previous_name = None
+        while True:
+            match = PYTHON_TOKEN.search(line, position)
+            if match is None:
+                return tokens, NORMAL
+            kind = match.lastgroup
+            start, position = match.span()
+            text = match.group()
+            if kind == "string" and text[-3:] in ('"""', "'''") and \
+                    len(text.lstrip("rRbBuUfF")) == 3:
+                # A triple-quoted string runs until its closing quotes,
+                # maybe on a later line
+                quotes = text[-3:]
+                position = _find_closing_quotes(line, position, quotes)
+                if position < 0:
+                    tokens.append((start, len(line), "string"))
+                    return tokens, quotes
+            elif kind == "name":
+                if text in self.KEYWORDS:
+                    kind = "keyword"
+                elif previous_name in self.DEFINERS:
+                    kind = "definition"
+                elif text in self.BUILTINS:
+                    kind = "builtin"
+                else:
+                    kind = None
+                previous_name = text
+            if kind is not None:
+                tokens.append((start, position, kind))
+
+
+# Lexers by file extension
+LEXERS = {
+    ".py": PythonLexer,
+    ".pyw": PythonLexer,
+}
+
+
+def get_lexer(file_path: str):
+    '''
+    Return a lexer for a file from its extension.
+
+    Args:
+        file_path (str): The path of the file, or None.
+    Returns:
+        A lexer, or None if the file is not highlighted.
+    '''
+    if file_path is None:
+        return None
+    lexer = LEXERS.get(os.path.splitext(file_path)[1].lower())
+    return lexer() if lexer is not None else None
+
+
+class Highlighter:
+    '''
+    Highlights the lines of a document with a lexer.
+
+    The state every line ends in is cached, so a line can be lexed on its
+    own once the states before it are known. An edit only forgets the
+    states of the lines it touched; lexing again from there stops
+    early as soon as a line ends in the same state as before, because
+    every line after it then does too. Lines are only lexed up to where
+    they are needed, so the cost follows the scrolling, not the length
+    of the document.
+    '''
+
+    def __init__(self, editor_logic, lexer):
+        '''
+        Initialize the highlighter.
+
+        Args:
+            editor_logic (EditorLogic): The editor whose text is lexed.
+            lexer: The lexer, e.g. a PythonLexer.
+        '''
+        self.editor_logic = editor_logic
+        self.lexer = lexer
+        self.reset()
+
+    # Public Methods
+
+    def reset(self):
+        '''
+        Forget every cached state.
+        '''
+        # The state each line ends in, or None where it is unknown: the
+        # line changed since it was lexed, or was never lexed
+        self.states = [None] * self.editor_logic.get_line_count()
+        # Lines from the start whose states are up to date
+        self.valid_lines = 0
+
+    def lines_changed(self, first_line: int, line_delta: int):
+        '''
+        Update the cached states after an edit.
+
+        Args:
+            first_line (int): The first logical line the edit touched.
+            line_delta (int): The number of lines the edit added after
+                first_line, or removed after it if negative.
+        '''
+        states = self.states
+        first_line = min(first_line, len(states) - 1)
+        if first_line < self.valid_lines < len(states):
+            # Lexing resumes before the line it was going to resume at,
+            # whose state no longer follows from the one before it
+            states[self.valid_lines] = None
+        # The last edited line keeps the state the old text ended in,
+        # which the line after it was lexed from; lines added before it
+        # have none
+        if line_delta > 0:
+            states[first_line:first_line] = [None] * line_delta
+        elif line_delta < 0:
+            del states[first_line:first_line - line_delta]
+        if first_line > self.valid_lines:
+            # Lexing that converges before this line skips ahead to the
+            # next unknown state, which has to be this one then
+            states[first_line + max(line_delta, 0)] = None
+        self.valid_lines = min(self.valid_lines, first_line)
+
+    def is_lexed(self, line: int) -> bool:
+        '''
+        Return whether the state a line starts in is known, so its tokens
+        are available.
+        '''
+        return line <= self.valid_lines
+
+    def lex_to(self, line: int, deadline: float = None) -> bool:
+        '''
+        Bring the states of the lines before a line up to date.
+
+        Args:
+            line (int): The line whose tokens are needed.
+            deadline (float): A time.monotonic() time to stop at, or None
+                to lex as far as needed.
+        Returns:
+            bool: Whether the line was reached before the deadline.
+        '''
+        line = min(line, len(self.states))
+        while self.valid_lines < line:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._lex_batch(min(line, self.valid_lines + LEX_BATCH_LINES))
+        return True
+
+    def get_tokens(self, line: int) -> list:
+        '''
+        Return the highlighted tokens of a line.
+
+        Args:
+            line (int): The line number.
+        Returns:
+            list: The tokens as (start, end, kind), or None if the lines
+                before it were not lexed yet.
+        '''
+        if not self.is_lexed(line):
+            return None
+        state = self.states[line - 1] if line else NORMAL
+        tokens, _ = self.lexer.lex_line(self.editor_logic.get_line(line),
+                                        state)
+        return tokens
+
+    # Protected Methods
+
+    def _lex_batch(self, end: int):
+        '''
+        Lex the lines from the first unknown state up to end, reading
+        their text in one piece.
+        '''
+        first = self.valid_lines
+        editor_logic = self.editor_logic
+        start_offset = editor_logic.get_line_start(first)
+        end_offset = editor_logic.get_line_start(end)
+        lines = editor_logic.get_range(start_offset, end_offset).split("\n")
+        states = self.states
+        state = states[first - 1] if first else NORMAL
+        for line in range(first, end):
+            state = self.lexer.end_state(lines[line - first], state)
+            old_state = states[line]
+            states[line] = state
+            if old_state is not None and old_state == state:
+                # The lines after this one start in the same state as
+                # before, so their states hold up to the next unknown one
+                self.valid_lines = self._next_unknown(line + 1)
+                return
+        self.valid_lines = end
+
+    def _next_unknown(self, line: int) -> int:
+        '''
+        Return the first line from line on whose state is unknown, or the
+        line count.
+        '''
+        try:
+            return self.states.index(None, line)
+        except ValueError:
+            return len(self.states)
+
+
+def _find_closing_quotes(line: str, position: int, quotes: str) -> int:
+    '''
+    Return the offset after the first unescaped quotes from a position,
+    or -1 if the line does not close them.
+    '''
+    while True:
+        index = line.find(quotes, position)
+        if index < 0:
+            return -1
+        escape = index
+        while escape > 0 and line[escape - 1] == "\\":
+            escape -= 1
+        if (index - escape) % 2 == 0:
+            return index + len(quotes)
+        position = index + 1
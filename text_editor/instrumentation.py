@@ -0,0 +1,255 @@
+# instrumentation.py
+import cProfile
+import os
+import time
+
+
+# Set to a file path to record stats from startup and write them on quit
+STATS_ENV_VAR = "TEXT_EDITOR_STATS"
+# Set to a file path to run cProfile from startup and write it on quit
+PROFILE_ENV_VAR = "TEXT_EDITOR_PROFILE"
+# Storage attributes reported as counters when a storage has them
+STORAGE_COUNTERS = ("gap_moves", "gap_moved_chars", "gap_expansions")
+# Latency histogram buckets are powers of two microseconds
+HISTOGRAM_BUCKETS = 32
+
+
+class LatencyHistogram:
+    '''
+    A histogram of latencies with one bucket per power of two
+    microseconds, so recording a sample is O(1) and the memory is fixed.
+    '''
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        '''
+        Record one latency.
+
+        Args:
+            seconds (float): The latency in seconds.
+        '''
+        microseconds = int(seconds * 1_000_000)
+        bucket = min(microseconds.bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        '''
+        Return an upper bound for a percentile of the latencies.
+
+        Args:
+            fraction (float): The percentile as a fraction, e.g. 0.95.
+        Returns:
+            float: The upper edge of the bucket holding it, in seconds.
+        '''
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(self.max, (1 << bucket) / 1_000_000)
+        return self.max
+
+    def mean(self) -> float:
+        '''Return the mean latency in seconds.'''
+        return self.total / self.count if self.count else 0.0
+
+
+class Instrumentation:
+    '''
+    Opt-in timing for the editor's hot path. An input event is timed
+    phase by phase (storage call, layout, paint) and from the event to
+    the paint that shows it, and named counters are kept. While disabled
+    every method returns at once.
+
+    A cProfile capture can be started and stopped independently.
+    '''
+
+    def __init__(self, enabled: bool = False):
+        '''
+        Initialize the instrumentation.
+
+        Args:
+            enabled (bool): Whether to record from the start.
+        '''
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.profiler = None
+        self.stats_path = None
+        self.profile_path = None
+        # Start of the current phase and of the current input event
+        self.phase_start = 0.0
+        self.event_start = 0.0
+        # Start of the first event waiting for the next paint
+        self.unpainted_event_start = None
+
+    @classmethod
+    def from_environment(cls) -> "Instrumentation":
+        '''
+        Create the instrumentation configured by the TEXT_EDITOR_STATS
+        and TEXT_EDITOR_PROFILE environment variables.
+        '''
+        instrumentation = cls()
+        instrumentation.stats_path = os.environ.get(STATS_ENV_VAR)
+        instrumentation.profile_path = os.environ.get(PROFILE_ENV_VAR)
+        if instrumentation.stats_path:
+            instrumentation.enabled = True
+        if instrumentation.profile_path:
+            instrumentation.start_profile()
+        return instrumentation
+
+    # Public Methods
+
+    def event_started(self):
+        '''
+        Mark the start of an input event.
+        '''
+        if not self.enabled:
+            return
+        self.event_start = self.phase_start = time.perf_counter()
+
+    def phase_done(self, phase: str):
+        '''
+        Record the time since the last phase (or the event) started.
+
+        Args:
+            phase (str): The name of the phase that just finished.
+        '''
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._record(phase, now - self.phase_start)
+        self.phase_start = now
+        if self.unpainted_event_start is None:
+            self.unpainted_event_start = self.event_start
+
+    def paint_started(self):
+        '''
+        Mark the start of a paint.
+        '''
+        if not self.enabled:
+            return
+        self.phase_start = time.perf_counter()
+
+    def paint_done(self):
+        '''
+        Record the paint, and the latency from the oldest event it shows
+        to the end of the paint.
+        '''
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._record("paint", now - self.phase_start)
+        if self.unpainted_event_start is not None:
+            self._record("event_to_paint", now - self.unpainted_event_start)
+            self.unpainted_event_start = None
+
+    def count(self, name: str, amount: int = 1):
+        '''
+        Add to a named counter.
+
+        Args:
+            name (str): The counter.
+            amount (int): How much to add.
+        '''
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        '''Forget all recorded latencies and counters.'''
+        self.histograms.clear()
+        self.counters.clear()
+        self.unpainted_event_start = None
+
+    def start_profile(self):
+        '''Start a cProfile capture.'''
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self, path: str = None):
+        '''
+        Stop the cProfile capture and write it for pstats.
+
+        Args:
+            path (str): The file to write, or None to discard it.
+        '''
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        if path:
+            self.profiler.dump_stats(path)
+        self.profiler = None
+
+    def format_report(self, storage=None) -> str:
+        '''
+        Format the latencies and counters as text.
+
+        Args:
+            storage: A text storage whose counters to include.
+        Returns:
+            str: The report.
+        '''
+        lines = [f"{'phase':<16} {'count':>8} {'mean ms':>9} "
+                 f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+                 f"{'max ms':>9}"]
+        for phase, histogram in sorted(self.histograms.items()):
+            lines.append(
+                f"{phase:<16} {histogram.count:>8} "
+                f"{histogram.mean() * 1000:>9.3f} "
+                f"{histogram.percentile(0.50) * 1000:>9.3f} "
+                f"{histogram.percentile(0.95) * 1000:>9.3f} "
+                f"{histogram.percentile(0.99) * 1000:>9.3f} "
+                f"{histogram.max * 1000:>9.3f}")
+
+        counters = dict(self.counters)
+        for name in STORAGE_COUNTERS:
+            if hasattr(storage, name):
+                counters[name] = getattr(storage, name)
+        lines.append("")
+        lines.extend(f"{name:<24} {value}"
+                     for name, value in sorted(counters.items()))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str, storage=None):
+        '''
+        Write the report to a file.
+
+        Args:
+            path (str): The file to write.
+            storage: A text storage whose counters to include.
+        '''
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.format_report(storage))
+
+    def close(self, storage=None):
+        '''
+        Write the stats and profile requested by the environment.
+
+        Args:
+            storage: A text storage whose counters to include.
+        '''
+        if self.stats_path:
+            self.dump(self.stats_path, storage)
+        if self.profile_path:
+            self.stop_profile(self.profile_path)
+
+    # Protected Methods
+
+    def _record(self, phase: str, seconds: float):
+        '''
+        Add a latency to a phase's histogram.
+        '''
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = LatencyHistogram()
+        histogram.record(seconds)
@@ -0,0 +1,426 @@
+# layout.py
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from text_editor.editor_logic import EditorLogic
+from text_editor.glyphs import GlyphWidths
+from text_editor.utils import split_line_into_rows
+from text_storage.prefix_sum import PrefixSumList
+
+
+# Number of logical lines whose wrapped rows are kept
+MAX_CACHED_LINES = 2000
+# Longest text whose rows are all counted from its line lengths. Longer
+# ones are estimated, since some storages read the whole text for them.
+MAX_COUNTED_LENGTH = 4 * 1024 * 1024
+
+
+def count_rows(line_length: int, max_chars_per_line: int,
+               is_last_line: bool) -> int:
+    '''
+    Return how many rows split_line_into_rows gives for a line, without
+    reading its text.
+
+    Args:
+        line_length (int): The length of the line, counting its newline.
+        max_chars_per_line (int): The maximum number of characters per row.
+        is_last_line (bool): Whether this is the last line of the text.
+    '''
+    if is_last_line:
+        return line_length // max_chars_per_line + 1
+    return max(1, -(-line_length // max_chars_per_line))
+
+
+class LayoutEngine:
+    '''
+    Wraps logical lines into visual rows for the GUI.
+
+    Wrapped rows are cached per logical line and only built for lines
+    that are drawn. The number of rows of every line is derived from the
+    line lengths alone, so the total row count for the scrollbar never
+    needs the text. Edits invalidate only the lines they touched, and a
+    width change recounts the rows and drops the cached rows.
+
+    Row counts are kept in a PrefixSumList, so converting between text
+    offsets, rows and columns costs O(log n) on any line.
+
+    Rows wrap after max_chars_per_line characters, or, after
+    set_max_width(), when their glyphs fill a width in pixels, for fonts
+    whose characters differ in width. Row counts then depend on the text,
+    so lines that were not laid out yet are counted with an estimate from
+    their length, which is corrected when their rows are built.
+
+    Texts longer than MAX_COUNTED_LENGTH are not read to count their
+    rows: every line starts with an estimate from the average line
+    length, and a width change keeps the counts of the old width. A
+    line is counted exactly when it is laid out or a position on it is
+    converted, so opening and resizing cost the same for any size.
+    '''
+
+    def __init__(self, editor_logic: EditorLogic,
+                 max_chars_per_line: int = 1,
+                 glyph_widths: GlyphWidths = None):
+        '''
+        Initialize the layout engine.
+
+        Args:
+            editor_logic (EditorLogic): The editor whose text is laid out.
+            max_chars_per_line (int): The maximum number of characters
+                per row.
+            glyph_widths (GlyphWidths): The widths of the font's
+                characters. Without them every character is one unit
+                wide.
+        '''
+        self.editor_logic = editor_logic
+        self.max_chars_per_line = max(1, max_chars_per_line)
+        self.glyph_widths = glyph_widths
+        # The width rows wrap at, or None to wrap by characters
+        self.max_width = None
+        self.rows_cache = OrderedDict()
+        self.row_counts = PrefixSumList()
+        self.reset()
+
+    # Public Methods
+
+    def reset(self):
+        '''
+        Drop every cached row and recount the rows of all lines, or
+        estimate them for long texts.
+        '''
+        self.rows_cache.clear()
+        if self.editor_logic.get_length() > MAX_COUNTED_LENGTH:
+            self.row_counts = self._estimate_rows()
+            return
+        lengths = list(self.editor_logic.get_line_lengths())
+        last_line = len(lengths) - 1
+        width = self.max_chars_per_line
+        row_counts = [max(1, -(-length // width)) for length in lengths]
+        row_counts[last_line] = count_rows(lengths[last_line], width, True)
+        self.row_counts = PrefixSumList(row_counts)
+
+    def set_max_chars_per_line(self, max_chars_per_line: int):
+        '''
+        Change the wrapping width. Rows are rebuilt lazily as lines are
+        drawn again.
+
+        Args:
+            max_chars_per_line (int): The maximum number of characters
+                per row.
+        '''
+        max_chars_per_line = max(1, max_chars_per_line)
+        if (max_chars_per_line != self.max_chars_per_line
+                or self.max_width is not None):
+            self.max_chars_per_line = max_chars_per_line
+            self.max_width = None
+            self._rewrap()
+
+    def set_max_width(self, max_width: int):
+        '''
+        Wrap rows when their glyphs fill a width instead of after a number
+        of characters. Needs glyph widths.
+
+        Args:
+            max_width (int): The width of a row in pixels.
+        '''
+        max_width = max(1, max_width)
+        if max_width != self.max_width:
+            self.max_width = max_width
+            # Used to estimate the rows of lines not laid out yet
+            self.max_chars_per_line = max(
+                1, max_width // self.glyph_widths.average_width)
+            self._rewrap()
+
+    def get_rows(self, line: int) -> list[str]:
+        '''
+        Return the wrapped rows of a logical line. Every row but the
+        ones of the last line ends with the line's newline.
+
+        Args:
+            line (int): The line number.
+        '''
+        rows = self.rows_cache.get(line)
+        if rows is not None:
+            self.rows_cache.move_to_end(line)
+            return rows
+
+        is_last_line = line == len(self.row_counts) - 1
+        text = self.editor_logic.get_line(line)
+        if not is_last_line:
+            text += "\n"
+        if self.max_width is None:
+            rows = split_line_into_rows(text, self.max_chars_per_line,
+                                        is_last_line)
+        else:
+            rows = self._wrap_to_width(text)
+        if len(rows) != self.row_counts.get(line):
+            # Replace the estimate
+            self.row_counts.set(line, len(rows))
+        self.rows_cache[line] = rows
+        if len(self.rows_cache) > MAX_CACHED_LINES:
+            self.rows_cache.popitem(last=False)
+        return rows
+
+    def get_row_count(self, line: int) -> int:
+        '''
+        Return the number of rows of a logical line.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.row_counts.get(line)
+
+    def get_line_count(self) -> int:
+        '''Return the number of logical lines.'''
+        return len(self.row_counts)
+
+    def visual_line_count(self) -> int:
+        '''Return the number of rows of the whole text.'''
+        return self.row_counts.total()
+
+    def rows_before(self, line: int) -> int:
+        '''
+        Return the number of rows of the lines before a logical line.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.row_counts.prefix(line)
+
+    def line_at_row(self, row: int) -> tuple[int, int]:
+        '''
+        Return the logical line shown on a row and the row it starts on.
+        Rows past the end belong to the last line.
+
+        Args:
+            row (int): The row number.
+        '''
+        line, first_row = self.row_counts.find(max(0, row))
+        last_line = len(self.row_counts) - 1
+        if line > last_line:
+            line = last_line
+            first_row = self.row_counts.prefix(last_line)
+        return line, first_row
+
+    def offset_to_row_col(self, offset: int) -> tuple[int, int]:
+        '''
+        Convert a text offset to the row and column where it is drawn.
+
+        Args:
+            offset (int): The offset in the text.
+        Returns:
+            tuple[int, int]: The row and the column in that row.
+        '''
+        line = self.editor_logic.get_line_number(offset)
+        column = offset - self.editor_logic.get_line_start(line)
+        if self.max_width is None:
+            self._recount(line)
+            row_in_line, column = divmod(column, self.max_chars_per_line)
+        else:
+            starts = self.get_row_starts(line)
+            row_in_line = bisect_right(starts, column) - 1
+            column -= starts[row_in_line]
+        return self.rows_before(line) + row_in_line, column
+
+    def row_col_to_offset(self, row: int, column: int) -> int:
+        '''
+        Convert a row and column to the nearest text offset, keeping it
+        on that row.
+
+        Args:
+            row (int): The row number.
+            column (int): The column in the row.
+        Returns:
+            int: The offset in the text.
+        '''
+        if row >= self.visual_line_count():
+            return self.editor_logic.get_length()
+        line, first_row = self.line_at_row(row)
+        starts = self.get_row_starts(line)
+        row_in_line = min(row - first_row, len(starts) - 1)
+
+        line_length = self.editor_logic.get_line_length(line)
+        if line < len(self.row_counts) - 1:
+            line_length -= 1  # The newline
+        offset_in_line = starts[row_in_line] + max(0, column)
+        if row_in_line < len(starts) - 1:
+            # Stay before the start of the next row of a wrapped line
+            offset_in_line = min(offset_in_line, starts[row_in_line + 1] - 1)
+        offset_in_line = min(offset_in_line, line_length)
+        return self.editor_logic.get_line_start(line) + offset_in_line
+
+    def get_row_starts(self, line: int) -> list[int]:
+        '''
+        Return the column of its line each row of a line starts at.
+
+        Args:
+            line (int): The line number.
+        '''
+        if self.max_width is None:
+            self._recount(line)
+            return range(0, self.get_row_count(line)
+                         * self.max_chars_per_line, self.max_chars_per_line)
+        rows = self.get_rows(line)
+        return [0, *accumulate(len(row) for row in rows[:-1])]
+
+    def get_positions(self, row_text: str):
+        '''
+        Return the x position of every character of a row, plus its end,
+        from the cached glyph widths.
+
+        Args:
+            row_text (str): The text of the row.
+        '''
+        if self.glyph_widths is None:
+            return range(len(row_text) + 1)
+        return self.glyph_widths.positions(row_text)
+
+    def column_to_x(self, row: int, column: int) -> int:
+        '''
+        Return where a column of a row is drawn, from the start of the row.
+
+        Args:
+            row (int): The row number.
+            column (int): The column in the row.
+        '''
+        positions = self.get_positions(self._get_row_text(row))
+        return positions[max(0, min(column, len(positions) - 1))]
+
+    def x_to_column(self, row: int, x: int) -> int:
+        '''
+        Return the column of the gap between two characters nearest to a
+        position, e.g. a click.
+
+        Args:
+            row (int): The row number.
+            x (int): The position from the start of the row.
+        '''
+        positions = self.get_positions(self._get_row_text(row))
+        column = bisect_left(positions, x)
+        if column == len(positions):
+            return column - 1
+        if column and x - positions[column - 1] < positions[column] - x:
+            column -= 1
+        return column
+
+    def lines_changed(self, first_line: int, line_delta: int):
+        '''
+        Update the layout after an edit.
+
+        Args:
+            first_line (int): The first logical line the edit touched.
+            line_delta (int): The number of lines the edit added after
+                first_line, or removed after it if negative.
+        '''
+        old_line_count = len(self.row_counts)
+        first_line = min(first_line, old_line_count - 1)
+        if line_delta > 0:
+            self.row_counts.insert(
+                first_line + 1, self._count_new_rows(first_line + 1,
+                                                     line_delta))
+        elif line_delta < 0:
+            self.row_counts.delete(first_line + 1,
+                                   first_line + 1 - line_delta)
+
+        # Recount the first touched line, the last line, and the previous
+        # last line if the end of the text moved to a different line
+        last_line = len(self.row_counts) - 1
+        recount = {first_line, last_line}
+        if old_line_count - 1 <= last_line:
+            recount.add(old_line_count - 1)
+        for line in recount:
+            self._recount(line)
+
+        self._shift_cache(first_line, line_delta)
+
+    # Protected Methods
+
+    def _get_row_text(self, row: int) -> str:
+        '''
+        Return the text of a row, or "" past the end.
+        '''
+        line, first_row = self.line_at_row(row)
+        rows = self.get_rows(line)
+        row_in_line = row - first_row
+        return rows[row_in_line] if row_in_line < len(rows) else ""
+
+    def _wrap_to_width(self, text: str) -> list[str]:
+        '''
+        Split a line (including its newline) into rows no wider than
+        max_width. A row holds at least one character.
+        '''
+        advance = self.glyph_widths.advance
+        max_width = self.max_width
+        rows = []
+        row_start = 0
+        x = 0
+        for index, char in enumerate(text):
+            width = advance(x, char)
+            if x + width > max_width and index > row_start:
+                rows.append(text[row_start:index])
+                row_start = index
+                x = 0
+                width = advance(0, char)
+            x += width
+        rows.append(text[row_start:])
+        return rows
+
+    def _rewrap(self):
+        '''
+        Drop the cached rows after a width change and recount the rows,
+        except for long texts, whose lines keep the counts of the old
+        width as estimates until they are laid out.
+        '''
+        if self.editor_logic.get_length() > MAX_COUNTED_LENGTH:
+            self.rows_cache.clear()
+        else:
+            self.reset()
+
+    def _estimate_rows(self) -> PrefixSumList:
+        '''
+        Return row counts for every line estimated from the average line
+        length, without reading the text.
+        '''
+        line_count = self.editor_logic.get_line_count()
+        average_length = self.editor_logic.get_length() // line_count + 1
+        rows = max(1, -(-average_length // self.max_chars_per_line))
+        return PrefixSumList(array("q", [rows]) * line_count)
+
+    def _recount(self, line: int):
+        '''
+        Recount the rows of a line from its length.
+        '''
+        is_last_line = line == len(self.row_counts) - 1
+        rows = count_rows(self.editor_logic.get_line_length(line),
+                          self.max_chars_per_line, is_last_line)
+        self.row_counts.set(line, rows)
+
+    def _count_new_rows(self, first_line: int, line_count: int) -> list[int]:
+        '''
+        Count the rows of inserted lines from their text in one pass,
+        which costs about as much as inserting them. The count of the
+        last line of the text may be off; the caller recounts it.
+        '''
+        start = self.editor_logic.get_line_start(first_line)
+        end = self.editor_logic.get_line_start(first_line + line_count)
+        lines = self.editor_logic.get_range(start, end).split("\n")
+        width = self.max_chars_per_line
+        return [max(1, -(-(len(line) + 1) // width))
+                for line in lines[:line_count]]
+
+    def _shift_cache(self, first_line: int, line_delta: int):
+        '''
+        Drop the cached rows of the edited lines and renumber the cached
+        lines after them.
+        '''
+        shifted = OrderedDict()
+        for line, rows in self.rows_cache.items():
+            if line < first_line:
+                shifted[line] = rows
+            elif line > first_line - min(0, line_delta):
+                shifted[line + line_delta] = rows
+        # The old last line might not be last anymore, or the other way
+        last_line = len(self.row_counts) - 1
+        shifted.pop(last_line, None)
+        shifted.pop(last_line - line_delta, None)
+        self.rows_cache = shifted
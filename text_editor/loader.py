@@ -0,0 +1,124 @@
+# loader.py
+import os
+import queue
+import threading
+from text_storage.file_io import DEFAULT_ENCODING, iter_file_chunks
+
+
+# Bytes read for the first chunk, which should fill the first screen
+FIRST_CHUNK_SIZE = 64 * 1024
+# Bytes read for each later chunk
+LOAD_CHUNK_SIZE = 256 * 1024
+# Decoded chunks the reader may get ahead of the editor
+MAX_QUEUED_CHUNKS = 64
+# How often the reader checks whether it was cancelled while waiting
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class FileLoader:
+    '''
+    Reads and decodes a file in a background thread. The editor takes the
+    decoded chunks with get_chunk() whenever it has time, e.g. between
+    frames, and can show progress() meanwhile.
+    '''
+
+    def __init__(self, path: str, encoding: str = DEFAULT_ENCODING):
+        '''
+        Initialize the loader. Reading starts with start().
+
+        Args:
+            path (str): The file to read.
+            encoding (str): The encoding of the file.
+        Raises:
+            OSError: If the file does not exist.
+        '''
+        self.path = path
+        self.encoding = encoding
+        self.total_bytes = os.path.getsize(path)
+        # Bytes of the file in the chunks taken so far
+        self.bytes_read = 0
+        self.done = False
+        # The error that stopped the reader, if any
+        self.error = None
+        self.chunks = queue.Queue(MAX_QUEUED_CHUNKS)
+        self.cancelled = threading.Event()
+        self.thread = None
+
+    # Public Methods
+
+    def start(self):
+        '''
+        Start reading in the background.
+        '''
+        self.thread = threading.Thread(target=self._run, name="loader",
+                                       daemon=True)
+        self.thread.start()
+
+    def get_chunk(self) -> str:
+        '''
+        Return the next decoded chunk without waiting.
+
+        Returns:
+            str: The text, or None if no chunk is ready yet or the file
+                has been read completely (then done is set) or could not
+                be read (then error is set too).
+        '''
+        if self.done:
+            return None
+        try:
+            item = self.chunks.get_nowait()
+        except queue.Empty:
+            return None
+        if isinstance(item, tuple):
+            text, self.bytes_read = item
+            return text
+        self.done = True
+        self.error = item
+        return None
+
+    def progress(self) -> float:
+        '''
+        Return the share of the file taken so far, from 0 to 1.
+        '''
+        if self.done or not self.total_bytes:
+            return 1.0
+        return self.bytes_read / self.total_bytes
+
+    def cancel(self):
+        '''
+        Stop reading. Chunks not taken yet are dropped.
+        '''
+        self.cancelled.set()
+        self.done = True
+
+    # Protected Methods
+
+    def _run(self):
+        '''
+        The reader thread: queue the chunks of the file, then None, or
+        the error that stopped it.
+        '''
+        try:
+            for chunk in iter_file_chunks(self.path, self.encoding,
+                                          LOAD_CHUNK_SIZE, FIRST_CHUNK_SIZE):
+                if not self._put(chunk):
+                    return
+        except (OSError, ValueError) as e:
+            self._put(e)
+            return
+        self._put(None)
+
+    def _put(self, item) -> bool:
+        '''
+        Queue an item, waiting while the queue is full.
+
+        Returns:
+            bool: False if the loader was cancelled meanwhile.
+        '''
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=CANCEL_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
@@ -1,7 +1,53 @@
+import argparse
 import tkinter as tk
 from tkinter import messagebox
-from text_storage.gap_buffer import GapBuffer
+from text_storage.file_io import (DEFAULT_STORAGE_BACKEND,
+                                  FILE_STORAGE_BACKENDS, STORAGE_BACKENDS,
+                                  load_storage)
 from gui import TextEditorGUI
+from loader import FileLoader
+
+
+def parse_args():
+    '''
+    Parse the command line arguments.
+    '''
+    parser = argparse.ArgumentParser(description="Text Editor")
+    parser.add_argument("path", nargs="?",
+                        help="The file to open")
+    parser.add_argument("--storage",
+                        choices=[*STORAGE_BACKENDS, *FILE_STORAGE_BACKENDS],
+                        default=DEFAULT_STORAGE_BACKEND,
+                        help="The text storage backend to use")
+    args = parser.parse_args()
+    if args.storage in FILE_STORAGE_BACKENDS and args.path is None:
+        parser.error(f"--storage {args.storage} needs a file to open")
+    return args
+
+
+def open_storage(storage: str, path: str = None):
+    '''
+    Create the text storage for a file. Files for the in-memory backends
+    are streamed into it by the returned loader after the window opens;
+    the file backends read the file here. A file that cannot be opened
+    or decoded is reported in a dialog.
+
+    Args:
+        storage (str): The name of the storage backend.
+        path (str): The file to open, or None for an empty document.
+    Returns:
+        tuple: The storage and the FileLoader to start, or None as the
+        loader when the storage already holds the file. None if the file
+        could not be opened.
+    '''
+    try:
+        if path is None or storage in FILE_STORAGE_BACKENDS:
+            return load_storage(storage, path), None
+        return load_storage(storage), FileLoader(path)
+    except (OSError, ValueError) as e:
+        # UnicodeDecodeError is a ValueError
+        messagebox.showerror("Open Error", f"Failed to open file: {e}")
+        return None
 
 
 def main():
@@ -9,6 +55,8 @@ def main():
     Entry point for the text editor application.
     Initializes the main window and starts the Tkinter event loop.
     '''
+    args = parse_args()
+
     # Create the main application window
     root = tk.Tk()
     root.title('Text Editor')
@@ -16,15 +64,22 @@ def main():
     root.minsize(400, 300)  # Set the minimum window size
 
     # Create the text_storage object
-    text_storage = GapBuffer(initial_size=50)
+    opened = open_storage(args.storage, args.path)
+    if opened is None:
+        return
+    text_storage, loader = opened
 
     # Initialize the custom text editor GUI
     try:
-        TextEditorGUI(root, text_storage)
+        gui = TextEditorGUI(root, text_storage, args.path)
     except Exception as e:
         messagebox.showerror("Initialization Error",
                              f"Failed to load editor: {e}")
         return
+    if loader is not None:
+        gui.start_loading(loader)
+    # Restore the text of a session that crashed
+    gui.offer_recovery()
 
     # Start the Tkinter event loop
     root.mainloop()
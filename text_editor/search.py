@@ -0,0 +1,297 @@
+# search.py
+import re
+from text_storage.text_storage import TextStorage
+
+
+# Characters kept from the previous chunk so regex matches can span
+# chunk edges. Regex matches longer than this may be missed.
+REGEX_OVERLAP = 4096
+# Characters kept before the search position so that ^, \b and short
+# lookbehinds see the text before a chunk edge
+LOOKBEHIND = 64
+
+
+def compile_pattern(pattern: str, regex: bool = False,
+                    ignore_case: bool = False) -> re.Pattern:
+    '''
+    Compile a search pattern. Plain text is escaped, and ^ and $ match at
+    line boundaries.
+
+    Args:
+        pattern (str): The text or regular expression to find.
+        regex (bool): Whether the pattern is a regular expression.
+        ignore_case (bool): Whether to ignore case.
+    Returns:
+        re.Pattern: The compiled pattern.
+    Raises:
+        re.error: If the regular expression is invalid.
+    '''
+    flags = re.MULTILINE
+    if ignore_case:
+        flags |= re.IGNORECASE
+    return re.compile(pattern if regex else re.escape(pattern), flags)
+
+
+def iter_match_objects(storage: TextStorage, pattern: re.Pattern,
+                       start: int = 0, end: int = None, overlap: int = None):
+    '''
+    Yield the matches of a pattern in a range of the storage, reading it
+    chunk by chunk with iter_chunks() instead of building the whole text.
+
+    Args:
+        storage (TextStorage): The storage to search.
+        pattern (re.Pattern): The compiled pattern.
+        start (int): The offset to search from.
+        end (int): The offset to search to, or None for the end.
+        overlap (int): The longest match that can span a chunk edge;
+            REGEX_OVERLAP by default.
+    Yields:
+        tuple[int, re.Match]: The offset of the match's string in the
+            storage, and the match.
+    '''
+    if overlap is None:
+        overlap = REGEX_OVERLAP
+    # The window holds the unsearched text plus up to LOOKBEHIND
+    # characters before it
+    context = min(start, LOOKBEHIND)
+    window = storage.get_range(start - context, start)
+    window_start = start - context
+    search_from = context
+
+    chunks = storage.iter_chunks(start, end)
+    for chunk in chunks:
+        window += chunk
+        # Matches starting after here are searched again with the next
+        # chunk, which may make them longer
+        limit = len(window) - overlap
+        deferred = limit
+        for match in pattern.finditer(window, search_from):
+            if match.start() >= limit or match.end() == len(window):
+                deferred = min(match.start(), limit)
+                break
+            yield window_start, match
+            search_from = match.end() + (match.end() == match.start())
+
+        # Nothing else starts before the deferred match, so only the
+        # text from there on (and the lookbehind) has to be kept
+        search_from = max(search_from, deferred)
+        trim = max(0, search_from - LOOKBEHIND)
+        window = window[trim:]
+        window_start += trim
+        search_from -= trim
+
+    # Whatever is left can not grow any more
+    for match in pattern.finditer(window, search_from):
+        yield window_start, match
+
+
+def iter_matches(storage: TextStorage, pattern: str, start: int = 0,
+                 end: int = None, regex: bool = False,
+                 ignore_case: bool = False):
+    '''
+    Yield the start and end offsets of every match in the storage.
+
+    Args:
+        storage (TextStorage): The storage to search.
+        pattern (str): The text or regular expression to find.
+        start (int): The offset to search from.
+        end (int): The offset to search to, or None for the end.
+        regex (bool): Whether the pattern is a regular expression.
+        ignore_case (bool): Whether to ignore case.
+    '''
+    if not pattern:
+        return
+    compiled = compile_pattern(pattern, regex, ignore_case)
+    overlap = REGEX_OVERLAP if regex else len(pattern)
+    for offset, match in iter_match_objects(storage, compiled, start, end,
+                                            overlap):
+        yield offset + match.start(), offset + match.end()
+
+
+def find(storage: TextStorage, pattern: str, start: int = 0,
+         end: int = None, regex: bool = False,
+         ignore_case: bool = False) -> tuple[int, int]:
+    '''
+    Find the first match at or after an offset.
+
+    Args:
+        storage (TextStorage): The storage to search.
+        pattern (str): The text or regular expression to find.
+        start (int): The offset to search from.
+        end (int): The offset to search to, or None for the end.
+        regex (bool): Whether the pattern is a regular expression.
+        ignore_case (bool): Whether to ignore case.
+    Returns:
+        tuple[int, int]: The start and end of the match, or None.
+    '''
+    return next(iter_matches(storage, pattern, start, end, regex,
+                             ignore_case), None)
+
+
+def find_next(storage: TextStorage, pattern: str, position: int,
+              regex: bool = False, ignore_case: bool = False,
+              wrap: bool = True) -> tuple[int, int]:
+    '''
+    Find the next match after a position, wrapping around to the start
+    of the text if there is none.
+
+    Args:
+        storage (TextStorage): The storage to search.
+        pattern (str): The text or regular expression to find.
+        position (int): The offset to search from, usually the cursor.
+        regex (bool): Whether the pattern is a regular expression.
+        ignore_case (bool): Whether to ignore case.
+        wrap (bool): Whether to search from the start afterwards.
+    Returns:
+        tuple[int, int]: The start and end of the match, or None.
+    '''
+    match = find(storage, pattern, position, None, regex, ignore_case)
+    if match is None and wrap and position > 0:
+        match = find(storage, pattern, 0, None, regex, ignore_case)
+        if match is not None and match[0] >= position:
+            return None
+    return match
+
+
+def replace_all(editor_logic, pattern: str, replacement: str,
+                regex: bool = False, ignore_case: bool = False) -> int:
+    '''
+    Replace every match with one bulk rewrite: the text from the first to
+    the last match is rebuilt in a single pass and swapped in with one
+    edit, which is also a single undo step.
+
+    Args:
+        editor_logic (EditorLogic): The editor to edit.
+        pattern (str): The text or regular expression to find.
+        replacement (str): The text to put instead. For regular
+            expressions it may refer to groups, as in re.sub.
+        regex (bool): Whether the pattern is a regular expression.
+        ignore_case (bool): Whether to ignore case.
+    Returns:
+        int: The number of replacements.
+    '''
+    if not pattern:
+        return 0
+    storage = editor_logic.text_storage
+    compiled = compile_pattern(pattern, regex, ignore_case)
+    overlap = REGEX_OVERLAP if regex else len(pattern)
+
+    # Group references need expanding; anything else is inserted as is
+    expand = regex and "\\" in replacement
+    parts = []
+    first = last = None
+    last_window = None
+    count = 0
+    # The cursor keeps its place: it moves by the change in length of
+    # the matches before it
+    cursor = editor_logic.cursor_position
+    new_cursor = cursor
+    for offset, match in iter_match_objects(storage, compiled,
+                                            overlap=overlap):
+        match_start = offset + match.start()
+        if first is None:
+            first = match_start
+        elif match.string is last_window:
+            # The text since the last match is still in the same window
+            parts.append(match.string[last - offset:match.start()])
+        else:
+            parts.append(storage.get_range(last, match_start))
+        new_text = match.expand(replacement) if expand else replacement
+        parts.append(new_text)
+        last = offset + match.end()
+        if last <= cursor:
+            new_cursor += len(new_text) - (last - match_start)
+        elif match_start < cursor:
+            new_cursor -= cursor - match_start
+        last_window = match.string
+        count += 1
+
+    if count:
+        editor_logic.replace_range(first, last, "".join(parts), new_cursor)
+    return count
+
+
+class IncrementalSearch:
+    '''
+    Search as you type. Each query reuses the results of the previous
+    ones: a longer query can only match where the shorter one did or
+    later, and going back to a shorter query returns its cached match.
+    Call reset() after the text changes.
+    '''
+
+    def __init__(self, storage: TextStorage, origin: int = 0,
+                 ignore_case: bool = False):
+        '''
+        Initialize the search.
+
+        Args:
+            storage (TextStorage): The storage to search.
+            origin (int): Where the search starts, usually the cursor.
+            ignore_case (bool): Whether to ignore case.
+        '''
+        self.storage = storage
+        self.origin = origin
+        self.ignore_case = ignore_case
+        # Query: its match, for every query typed since the last reset
+        self.results = {}
+
+    # Public Methods
+
+    def update(self, query: str) -> tuple[int, int]:
+        '''
+        Return the first match of the query at or after the origin,
+        wrapping around.
+
+        Args:
+            query (str): The text typed so far.
+        Returns:
+            tuple[int, int]: The start and end of the match, or None.
+        '''
+        if not query:
+            return None
+        if query in self.results:
+            return self.results[query]
+
+        start = self.origin
+        prefix = self._longest_cached_prefix(query)
+        if prefix is not None:
+            previous = self.results[prefix]
+            if previous is None:
+                # Nothing matched the shorter query, so nothing matches
+                self.results[query] = None
+                return None
+            # Before its match even the shorter query did not match. If
+            # the search wrapped, the longer query may still match later.
+            if previous[0] >= self.origin:
+                start = previous[0]
+
+        match = find(self.storage, query, start,
+                     ignore_case=self.ignore_case)
+        if match is None and start > 0:
+            match = find(self.storage, query, 0,
+                         self.origin + len(query) - 1,
+                         ignore_case=self.ignore_case)
+        self.results[query] = match
+        return match
+
+    def reset(self, origin: int = None):
+        '''
+        Forget the cached results, e.g. after an edit.
+
+        Args:
+            origin (int): A new place for the search to start.
+        '''
+        if origin is not None:
+            self.origin = origin
+        self.results.clear()
+
+    # Protected Methods
+
+    def _longest_cached_prefix(self, query: str) -> str:
+        '''
+        Return the longest cached query that query starts with, or None.
+        '''
+        for length in range(len(query) - 1, 0, -1):
+            if query[:length] in self.results:
+                return query[:length]
+        return None
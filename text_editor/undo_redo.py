@@ -0,0 +1,273 @@
+# undo_redo.py
+from collections import deque
+
+
+# Characters of history kept before the oldest edits are dropped
+DEFAULT_MEMORY_LIMIT = 8 * 1024 * 1024
+# Memory charged for each command on top of its text
+COMMAND_OVERHEAD = 64
+# Longest run of keystrokes merged into one command
+MAX_COALESCED_LENGTH = 256
+
+
+class EditCommand:
+    '''
+    A reversible edit (Command pattern). Only the delta is stored: the
+    text removed and the text inserted at one position, never a copy of
+    the document.
+    '''
+    __slots__ = ("position", "removed", "inserted", "cursor_before",
+                 "cursor_after")
+
+    def __init__(self, position: int, removed: str, inserted: str,
+                 cursor_before: int, cursor_after: int):
+        '''
+        Initialize the command.
+
+        Args:
+            position (int): Where the edit happened.
+            removed (str): The text the edit removed.
+            inserted (str): The text the edit inserted.
+            cursor_before (int): The cursor position before the edit.
+            cursor_after (int): The cursor position after the edit.
+        '''
+        self.position = position
+        self.removed = removed
+        self.inserted = inserted
+        self.cursor_before = cursor_before
+        self.cursor_after = cursor_after
+
+    @property
+    def edits(self) -> tuple:
+        '''The edits of the command, as for MultiEditCommand.'''
+        return (self,)
+
+    @property
+    def cursors_before(self) -> list[int]:
+        '''The cursors before the edit, as for MultiEditCommand.'''
+        return [self.cursor_before]
+
+    @property
+    def cursors_after(self) -> list[int]:
+        '''The cursors after the edit, as for MultiEditCommand.'''
+        return [self.cursor_after]
+
+    def size(self) -> int:
+        '''Return the memory charged for this command.'''
+        return len(self.removed) + len(self.inserted) + COMMAND_OVERHEAD
+
+    def merge(self, other: "EditCommand") -> bool:
+        '''
+        Merge a following keystroke into this command if it continues
+        the same run: typing on after the inserted text, or deleting
+        backwards or forwards next to the removed text. A new word after
+        whitespace starts a new command.
+
+        Args:
+            other (EditCommand): The edit that followed this one.
+        Returns:
+            bool: Whether the edit was merged.
+        '''
+        if not isinstance(other, EditCommand):
+            return False
+        if len(self.removed) + len(self.inserted) >= MAX_COALESCED_LENGTH:
+            return False
+
+        if self.removed or other.removed:
+            # Deletions only merge with deletions
+            if self.inserted or other.inserted:
+                return False
+            if other.position + len(other.removed) == self.position:
+                # Backspace
+                self.removed = other.removed + self.removed
+                self.position = other.position
+            elif other.position == self.position:
+                # Delete key
+                self.removed += other.removed
+            else:
+                return False
+        else:
+            if other.position != self.position + len(self.inserted):
+                return False
+            if self.inserted[-1].isspace() and not other.inserted.isspace():
+                return False
+            self.inserted += other.inserted
+
+        self.cursor_after = other.cursor_after
+        return True
+
+
+class MultiEditCommand:
+    '''
+    One step of multi-cursor editing: an edit at every cursor. The edits
+    are sorted and do not overlap, and their positions are all in the
+    text as it was before the step, so each one is found by adding up
+    the length changes of the edits before it.
+    '''
+    __slots__ = ("edits", "cursors_before", "cursors_after")
+
+    def __init__(self, edits: list[EditCommand], cursors_before: list[int],
+                 cursors_after: list[int]):
+        '''
+        Initialize the command.
+
+        Args:
+            edits (list[EditCommand]): The edits, sorted by position.
+            cursors_before (list[int]): The cursors before the step, the
+                primary cursor first.
+            cursors_after (list[int]): The cursors after the step, the
+                primary cursor first.
+        '''
+        self.edits = edits
+        self.cursors_before = cursors_before
+        self.cursors_after = cursors_after
+
+    def size(self) -> int:
+        '''Return the memory charged for this command.'''
+        return sum(edit.size() for edit in self.edits)
+
+    def merge(self, other: "MultiEditCommand") -> bool:
+        '''
+        Merge the next keystroke at the same cursors if every cursor's
+        edit continues its run, as in EditCommand.merge.
+
+        Args:
+            other (MultiEditCommand): The step that followed this one.
+        Returns:
+            bool: Whether the step was merged.
+        '''
+        if not isinstance(other, MultiEditCommand):
+            return False
+        if len(other.edits) != len(self.edits):
+            return False
+
+        merged = []
+        shift = 0
+        previous_end = 0
+        for edit, next_edit in zip(self.edits, other.edits):
+            # Move the next edit to the text before this step
+            position = next_edit.position - shift
+            if position < previous_end:
+                return False
+            candidate = EditCommand(edit.position, edit.removed,
+                                    edit.inserted, edit.cursor_before,
+                                    edit.cursor_after)
+            if not candidate.merge(EditCommand(
+                    position, next_edit.removed, next_edit.inserted,
+                    next_edit.cursor_before, next_edit.cursor_after)):
+                return False
+            merged.append(candidate)
+            shift += len(edit.inserted) - len(edit.removed)
+            previous_end = candidate.position + len(candidate.removed)
+
+        self.edits = merged
+        self.cursors_after = other.cursors_after
+        return True
+
+
+class UndoManager:
+    '''
+    Keeps the undo and redo history as EditCommand deltas.
+
+    Consecutive keystrokes are coalesced into word sized commands, bulk
+    operations are recorded as single commands, and once the history
+    uses more than memory_limit characters the oldest commands are
+    dropped first. Recording is O(1) apart from merging a keystroke.
+    '''
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        '''
+        Initialize the undo manager.
+
+        Args:
+            memory_limit (int): The most characters of history to keep.
+        '''
+        self.memory_limit = memory_limit
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.memory_used = 0
+        # Whether the next keystroke may merge into the last command
+        self.can_merge = False
+
+    # Public Methods
+
+    def record(self, command: EditCommand, coalesce: bool = False):
+        '''
+        Record an edit that was just applied. This clears the redo
+        history.
+
+        Args:
+            command (EditCommand): The edit.
+            coalesce (bool): Whether the edit is a keystroke that may be
+                merged into the previous command.
+        '''
+        for redo_command in self.redo_stack:
+            self.memory_used -= redo_command.size()
+        self.redo_stack.clear()
+
+        if coalesce and self.can_merge and self.undo_stack:
+            last = self.undo_stack[-1]
+            old_size = last.size()
+            if last.merge(command):
+                self.memory_used += last.size() - old_size
+                self._evict()
+                return
+
+        self.undo_stack.append(command)
+        self.memory_used += command.size()
+        self.can_merge = coalesce
+        self._evict()
+
+    def seal(self):
+        '''
+        Stop the next keystroke from merging into the last command, e.g.
+        after the cursor was moved.
+        '''
+        self.can_merge = False
+
+    def can_undo(self) -> bool:
+        '''Return whether there is an edit to undo.'''
+        return bool(self.undo_stack)
+
+    def can_redo(self) -> bool:
+        '''Return whether there is an edit to redo.'''
+        return bool(self.redo_stack)
+
+    def pop_undo(self) -> EditCommand:
+        '''
+        Move the last edit to the redo history and return it, or None.
+        '''
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        self.redo_stack.append(command)
+        self.can_merge = False
+        return command
+
+    def pop_redo(self) -> EditCommand:
+        '''
+        Move the last undone edit back to the undo history and return
+        it, or None.
+        '''
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        self.undo_stack.append(command)
+        self.can_merge = False
+        return command
+
+    def clear(self):
+        '''Forget the whole history.'''
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.memory_used = 0
+        self.can_merge = False
+
+    # Protected Methods
+
+    def _evict(self):
+        '''
+        Drop the oldest commands until the history fits in the limit.
+        '''
+        while self.memory_used > self.memory_limit and self.undo_stack:
+            self.memory_used -= self.undo_stack.popleft().size()
@@ -26,47 +26,33 @@ def split_text_into_lines(text: str, max_chars_per_line: int) -> list[str]:
     if not text or text == "":
         return lines
 
-    current_line = ""
-
-    for char in text:
-        current_line += char
-        if len(current_line) >= max_chars_per_line or char == "\n":
-            lines.append(current_line)
-            current_line = ""
-
-    lines.append(current_line)
+    # Wrap each line on its own instead of growing a string per character
+    text_lines = text.split("\n")
+    for text_line in text_lines[:-1]:
+        lines.extend(split_line_into_rows(text_line + "\n",
+                                          max_chars_per_line))
+    lines.extend(split_line_into_rows(text_lines[-1], max_chars_per_line,
+                                      is_last_line=True))
 
     return lines
 
 
-def get_cursor_position(lines: list[str],
-                        cursor_offset: int) -> tuple[int, int]:
+def split_line_into_rows(line: str, max_chars_per_line: int,
+                         is_last_line: bool = False) -> list[str]:
     '''
-    Get the cursor position on the canvas.
+    Split one line of text (including its newline) into rows of a
+    maximum length. Joining the rows of every line gives the same result
+    as split_text_into_lines on the whole text.
 
     Args:
-        lines (list[str]): The lines of text on the canvas.
-        cursor_offset (int): The cursor offset within the text.
+        line (str): The line to split.
+        max_chars_per_line (int): The maximum number of characters per line.
+        is_last_line (bool): Whether this is the last line of the text,
+            which always ends with a (possibly empty) partial row.
     '''
-
-    if not lines:
-        return 0, 0
-
-    # If the last line is an empty string,
-    # set the cursor position to the last line
-
-    if lines[-1] == "":
-        cursor_line = len(lines) - 1
-        cursor_offset = 0
-        return cursor_line, cursor_offset
-
-    cursor_line = 0
-
-    for line in lines:
-        if cursor_offset > len(line):
-            cursor_offset -= len(line)
-            cursor_line += 1
-        else:
-            break
-
-    return cursor_line, cursor_offset
+    max_chars_per_line = max(1, max_chars_per_line)
+    rows = [line[i:i + max_chars_per_line]
+            for i in range(0, len(line), max_chars_per_line)]
+    if is_last_line and len(line) % max_chars_per_line == 0:
+        rows.append("")
+    return rows
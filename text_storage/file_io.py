@@ -0,0 +1,146 @@
+# file_io.py
+import codecs
+import io
+import os
+import stat
+import tempfile
+from text_storage.gap_buffer import GapBuffer
+from text_storage.mapped_file import MappedFileStorage
+from text_storage.piece_table import PieceTable
+from text_storage.rope import Rope
+from text_storage.text_storage import TextStorage
+from text_storage.utf8_buffer import Utf8Buffer
+
+
+DEFAULT_ENCODING = "utf-8"
+# Size of the write buffer in bytes
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Bytes read at a time by iter_file_chunks
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def create_gap_buffer(text: str) -> GapBuffer:
+    '''
+    Create a gap buffer holding text.
+    '''
+    gap_buffer = GapBuffer(initial_size=50)
+    gap_buffer.insert_text(text)
+    return gap_buffer
+
+
+# Text storage backends by name. Each one is created from the text of
+# the opened file.
+STORAGE_BACKENDS = {
+    "gap_buffer": create_gap_buffer,
+    "piece_table": PieceTable,
+    "rope": Rope,
+}
+# Backends that read the file themselves instead of taking its text
+FILE_STORAGE_BACKENDS = {
+    "mapped": MappedFileStorage,
+    "utf8": Utf8Buffer.from_file,
+}
+DEFAULT_STORAGE_BACKEND = "gap_buffer"
+
+
+def load_storage(backend: str, path: str = None,
+                 encoding: str = DEFAULT_ENCODING) -> TextStorage:
+    '''
+    Create a text storage, loading the file at path if one is given.
+
+    Args:
+        backend (str): The name of the storage backend.
+        path (str): The file to open, or None for an empty document.
+        encoding (str): The encoding of the file.
+    Returns:
+        TextStorage: The storage holding the file's text.
+    '''
+    if backend in FILE_STORAGE_BACKENDS:
+        return FILE_STORAGE_BACKENDS[backend](path, encoding)
+
+    text = ""
+    if path is not None:
+        with open(path, encoding=encoding) as file:
+            text = file.read()
+    return STORAGE_BACKENDS[backend](text)
+
+
+def iter_file_chunks(path: str, encoding: str = DEFAULT_ENCODING,
+                     chunk_size: int = READ_CHUNK_SIZE,
+                     first_chunk_size: int = None):
+    '''
+    Read and decode a file in chunks, translating newlines the same way
+    as reading the file in text mode.
+
+    Args:
+        path (str): The file to read.
+        encoding (str): The encoding of the file.
+        chunk_size (int): The number of bytes read at a time.
+        first_chunk_size (int): A smaller size for the first read, so
+            the start of the file is available sooner.
+    Yields:
+        tuple[str, int]: The decoded text and the number of bytes read
+            from the file so far.
+    Raises:
+        OSError: If the file can not be read.
+        UnicodeDecodeError: If the file is not valid in the encoding.
+    '''
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(), translate=True)
+    bytes_read = 0
+    size = first_chunk_size or chunk_size
+    with open(path, "rb") as file:
+        while True:
+            data = file.read(size)
+            bytes_read += len(data)
+            text = decoder.decode(data, final=not data)
+            if text:
+                yield text, bytes_read
+            if not data:
+                return
+            size = chunk_size
+
+
+def save_storage(storage: TextStorage, path: str,
+                 encoding: str = DEFAULT_ENCODING):
+    '''
+    Save the text of a storage to a file without building the whole text
+    in memory.
+
+    Chunks from storage.iter_encoded_chunks() are written through a
+    buffered writer to a temporary file in the same directory, which
+    then replaces the target file in one step. A failed save leaves the
+    original file untouched.
+
+    Args:
+        storage (TextStorage): The storage to save.
+        path (str): The file to write.
+        encoding (str): The encoding to write the text with.
+    '''
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".",
+                                     suffix=".tmp")
+    try:
+        with io.open(fd, "wb", buffering=WRITE_BUFFER_SIZE) as file:
+            for data in storage.iter_encoded_chunks(encoding):
+                file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        _copy_permissions(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _copy_permissions(source: str, target: str):
+    '''
+    Give target the permission bits of source, if source exists.
+    '''
+    try:
+        mode = stat.S_IMODE(os.stat(source).st_mode)
+    except FileNotFoundError:
+        return
+    os.chmod(target, mode)
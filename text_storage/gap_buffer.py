@@ -1,9 +1,16 @@
 # gap_buffer.py
-from text_storage.text_storage import TextStorage
+from text_storage.line_index import LineIndex
+from text_storage.text_storage import TextSnapshot, TextStorage
 
 
 DEFAULT_INITIAL_SIZE = 10
 
+# Encodings used for the compact buffer. Both are fixed width, so a
+# character index maps straight to a byte index.
+NARROW_ENCODING = "latin-1"  # 1 byte per character
+WIDE_ENCODING = "utf-32-le"  # 4 bytes per character
+CHAR_SIZES = {NARROW_ENCODING: 1, WIDE_ENCODING: 4}
+
 
 class GapBuffer(TextStorage):
     # Constructor
@@ -13,12 +20,25 @@ class GapBuffer(TextStorage):
         A gap buffer implementation for text storage.
         Initialize the gap buffer.
 
+        The text is kept in a bytearray instead of a list of one character
+        strings. While every character fits in Latin-1 each one costs a
+        single byte; the first wider character re-encodes the buffer as
+        UTF-32 (4 bytes per character).
+
         Args:
             initial_size (int): The initial size of the buffer.
         '''
-        self.buffer = [""] * initial_size
+        self.encoding = NARROW_ENCODING
+        self.char_size = CHAR_SIZES[NARROW_ENCODING]
+        self.buffer = bytearray(initial_size)
+        # Gap bounds are character indexes, not byte indexes
         self.gap_start = 0
         self.gap_end = initial_size
+        self.line_index = LineIndex()
+        # Counters read by the editor's instrumentation
+        self.gap_moves = 0
+        self.gap_moved_chars = 0
+        self.gap_expansions = 0
 
     # Public Methods
 
@@ -29,15 +49,46 @@ class GapBuffer(TextStorage):
         Returns:
             str: The text in the text editor.
         '''
-        return "".join(self.buffer[:self.gap_start]) + "".join(
-            self.buffer[self.gap_end:])
+        size = self.char_size
+        with memoryview(self.buffer) as view:
+            text_bytes = b"".join((view[:self.gap_start * size],
+                                   view[self.gap_end * size:]))
+        # One bulk decode for the whole document
+        return text_bytes.decode(self.encoding)
 
     def get_length(self) -> int:
         '''
         Return the length of the text
         '''
         # return len(self.get_text())
-        return len(self.buffer) - (self.gap_end - self.gap_start)
+        return self._get_capacity() - (self.gap_end - self.gap_start)
+
+    def get_range(self, start: int, end: int) -> str:
+        '''
+        Return the text from start to end, decoding only that span.
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character.
+        Returns:
+            str: The text in the range.
+        '''
+        start = max(0, start)
+        end = min(end, self.get_length())
+        if start >= end:
+            return ""
+        size = self.char_size
+        gap_length = self.gap_end - self.gap_start
+        with memoryview(self.buffer) as view:
+            if end <= self.gap_start:
+                return str(view[start * size:end * size], self.encoding)
+            if start >= self.gap_start:
+                return str(view[(start + gap_length) * size:
+                                (end + gap_length) * size], self.encoding)
+            text_bytes = b"".join((view[start * size:self.gap_start * size],
+                                   view[self.gap_end * size:
+                                        (end + gap_length) * size]))
+        return text_bytes.decode(self.encoding)
 
     def insert(self, char: str):
         '''
@@ -46,17 +97,61 @@ class GapBuffer(TextStorage):
         Args:
             char (str): The character to insert.
         '''
+        encoded = self._encode(char)
         if self.gap_start == self.gap_end:
             self._expand_buffer()
-        self.buffer[self.gap_start] = char
+        self.line_index.insert(self.gap_start, char)
+        start = self.gap_start * self.char_size
+        self.buffer[start:start + self.char_size] = encoded
         self.gap_start += 1
+        self._changed(self.gap_start - 1, 0, char)
+
+    def insert_text(self, text: str):
+        '''
+        Insert a string at the current gap position with one capacity
+        check and one block copy.
+
+        Args:
+            text (str): The text to insert.
+        '''
+        if not text:
+            return
+        encoded = self._encode(text)
+        count = len(text)
+        if self.gap_end - self.gap_start < count:
+            self._expand_buffer(count)
+        self.line_index.insert(self.gap_start, text)
+        start = self.gap_start * self.char_size
+        self.buffer[start:start + len(encoded)] = encoded
+        self.gap_start += count
+        self._changed(self.gap_start - count, 0, text)
 
     def delete(self):
         '''
         Delete the character before the cursor
         '''
         if self.gap_start > 0:
+            self.line_index.delete(self.gap_start - 1, self.gap_start)
             self.gap_start -= 1
+            self._changed(self.gap_start, 1)
+
+    def delete_range(self, start: int, end: int):
+        '''
+        Delete the text from start to end by moving the gap to end and
+        widening it back to start.
+
+        Args:
+            start (int): The offset of the first character to delete.
+            end (int): The offset after the last character to delete.
+        '''
+        start = max(0, start)
+        end = min(end, self.get_length())
+        if start >= end:
+            return
+        self.move_cursor(end)
+        self.gap_start = start
+        self.line_index.delete(start, end)
+        self._changed(start, end - start)
 
     def move_cursor(self, position: int):
         '''
@@ -65,66 +160,167 @@ class GapBuffer(TextStorage):
         Args:
             position (int): The new cursor position.
         '''
+        position = max(0, min(position, self.get_length()))
+        if position == self.gap_start:
+            return
+
+        self.gap_moves += 1
+        self.gap_moved_chars += abs(position - self.gap_start)
         if position < self.gap_start:
             # Move the gap left
             self._move_cursor_left(position)
-        elif position > self.gap_start:
+        else:
             self._move_cursor_right(position)
 
+    def snapshot(self) -> "GapBufferSnapshot":
+        '''
+        Return an immutable copy of the text. The encoded bytes around
+        the gap are copied in one pass without decoding them. That is
+        faster than get_text(), but still a full O(n) copy on the calling
+        thread, since the bytearray is edited in place and cannot be
+        shared; callers take snapshots less often as the text grows.
+        '''
+        size = self.char_size
+        with memoryview(self.buffer) as view:
+            data = b"".join((view[:self.gap_start * size],
+                             view[self.gap_end * size:]))
+        return GapBufferSnapshot(data, self.encoding)
+
     # Protected Methods
 
+    def _get_capacity(self) -> int:
+        '''
+        Return the size of the buffer in characters, including the gap.
+        '''
+        return len(self.buffer) // self.char_size
+
+    def _encode(self, text: str) -> bytes:
+        '''
+        Encode text for the buffer, widening the buffer first if the text
+        does not fit in the current encoding.
+
+        Args:
+            text (str): The text to encode.
+        Returns:
+            bytes: The encoded text.
+        '''
+        try:
+            return text.encode(self.encoding)
+        except UnicodeEncodeError:
+            self._widen_buffer()
+            return text.encode(self.encoding)
+
+    def _widen_buffer(self):
+        '''
+        Re-encode the buffer with 4 bytes per character so that any code
+        point can be stored. The gap keeps the same character positions.
+        '''
+        self.buffer = bytearray(
+            self.buffer.decode(self.encoding).encode(WIDE_ENCODING))
+        self.encoding = WIDE_ENCODING
+        self.char_size = CHAR_SIZES[WIDE_ENCODING]
+
     def _move_cursor_left(self, position):
         '''
         Move the cursor to the left, adjusting the gap.
+        The characters between the new position and the gap are moved
+        to the other side of the gap in a single block copy.
+        Example (move to position 1):
+            Original: [a][b][c][_][_][d]
+            New:      [a][_][_][b][c][d]
 
         Args:
             position (int): The new cursor position.
         '''
-        while position < self.gap_start:
-            self.gap_start -= 1
-            self.buffer[self.gap_end - 1] = self.buffer[self.gap_start]
-            self.gap_end -= 1
+        size = self.char_size
+        count = self.gap_start - position
+        new_gap_end = self.gap_end - count
+        self.buffer[new_gap_end * size:self.gap_end * size] = \
+            self.buffer[position * size:self.gap_start * size]
+        self.gap_start = position
+        self.gap_end = new_gap_end
 
     def _move_cursor_right(self, position):
         '''
         Move the cursor to the right, adjusting the gap.
+        The characters between the gap and the new position are moved
+        to the other side of the gap in a single block copy.
+        Example (move to position 3):
+            Original: [a][_][_][b][c][d]
+            New:      [a][b][c][_][_][d]
 
         Args:
             position (int): The new cursor position.
         '''
-        while position > self.gap_start:
-            self.buffer[self.gap_start] = self.buffer[self.gap_end]
-            self.gap_start += 1
-            self.gap_end += 1
+        size = self.char_size
+        count = position - self.gap_start
+        new_gap_end = self.gap_end + count
+        self.buffer[self.gap_start * size:position * size] = \
+            self.buffer[self.gap_end * size:new_gap_end * size]
+        self.gap_start = position
+        self.gap_end = new_gap_end
 
-    def _expand_buffer(self):
+    def _expand_buffer(self, required: int = 1):
         '''
         Expand the size of the buffer when the gap is full.
         Example:
             Original: [a][b][_][_][c][d]  ([] = cell, _ = gap)
             New:      [a][b][_][_][_][_][c][d]
+
+        Args:
+            required (int): The minimum number of free characters the
+                gap must have afterwards.
         '''
-        # Double the size of the buffer, filling with empty strings
-        new_buffer = [""] * (len(self.buffer) * 2)
+        # Double the size of the buffer (or more if the gap would still
+        # be too small), filling the new gap with zeros
+        self.gap_expansions += 1
+        capacity = self._get_capacity()
+        new_capacity = max(capacity * 2, self.get_length() + required)
+        new_buffer = bytearray(new_capacity * self.char_size)
 
         # Copy content before gap to new buffer
         # e.g., [a][b] -> [a][b][_][_][_][_][_][_]
-        new_buffer[:self.gap_end] = self.buffer[:self.gap_end]
+        gap_end_byte = self.gap_end * self.char_size
+        new_buffer[:gap_end_byte] = self.buffer[:gap_end_byte]
 
         # Calculate where to place content that was after the gap
         # If original buffer was size 6 with gap_end=4,
         # and new buffer is size 12,
         # then after_gap_index would be 10 (12 - (6 - 4))
-        gap_end_to_buffer_end_length = len(self.buffer) - self.gap_end
-        after_gap_index = len(new_buffer) - gap_end_to_buffer_end_length
+        gap_end_to_buffer_end_length = capacity - self.gap_end
+        after_gap_index = new_capacity - gap_end_to_buffer_end_length
 
         # Copy content after gap to end of new buffer
         # e.g., [a][b][_][_][_][_][_][_] -> [a][b][_][_][_][_][c][d]
-        new_buffer[after_gap_index:] = self.buffer[self.gap_end:]
+        new_buffer[after_gap_index * self.char_size:] = \
+            self.buffer[gap_end_byte:]
 
         # Adjust gap_end to account for new buffer size
-        buffer_size_increase = len(new_buffer) - len(self.buffer)
+        buffer_size_increase = new_capacity - capacity
         self.gap_end += buffer_size_increase
 
         # Replace old buffer with new expanded buffer
         self.buffer = new_buffer
+
+
+class GapBufferSnapshot(TextSnapshot):
+    '''
+    The text of a gap buffer at one moment, kept encoded and decoded a
+    range at a time when read.
+    '''
+
+    def __init__(self, data: bytes, encoding: str):
+        self.data = data
+        self.encoding = encoding
+        self.char_size = CHAR_SIZES[encoding]
+
+    def get_length(self) -> int:
+        return len(self.data) // self.char_size
+
+    def get_range(self, start: int, end: int) -> str:
+        start = max(0, start)
+        end = min(end, self.get_length())
+        if start >= end:
+            return ""
+        size = self.char_size
+        return self.data[start * size:end * size].decode(self.encoding)
@@ -0,0 +1,152 @@
+# line_index.py
+from text_storage.prefix_sum import PrefixSumList
+
+
+class LineIndex:
+    '''
+    Tracks where lines start in a document without keeping its text.
+
+    The length of every line (counting its trailing newline) is stored in
+    a PrefixSumList, so line starts are prefix sums and finding the line
+    of an offset is a prefix search. Both take O(log n), and an edit only
+    rewrites the lengths of the lines it touches.
+    '''
+
+    def __init__(self, text: str = ""):
+        '''
+        Initialize the index for a document.
+
+        Args:
+            text (str): The text the document starts with.
+        '''
+        lengths = [len(line) + 1 for line in text.split("\n")]
+        # The last line has no trailing newline
+        lengths[-1] -= 1
+        self.lengths = PrefixSumList(lengths)
+
+    @classmethod
+    def from_lengths(cls, lengths) -> "LineIndex":
+        '''
+        Create an index from the length of every line, counting their
+        newlines, for backends that count lines without building the
+        text.
+
+        Args:
+            lengths: The line lengths.
+        '''
+        index = cls()
+        index.lengths = PrefixSumList(lengths)
+        return index
+
+    # Public Methods
+
+    def line_count(self) -> int:
+        '''Return the number of lines. An empty document has one line.'''
+        return len(self.lengths)
+
+    def line_of(self, offset: int) -> int:
+        '''
+        Return the line containing an offset.
+
+        Args:
+            offset (int): The character offset in the document.
+        '''
+        line, _ = self._find(offset)
+        return line
+
+    def offset_of(self, line: int) -> int:
+        '''
+        Return the offset where a line starts. Lines past the end start
+        at the end of the document.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.lengths.prefix(max(0, line))
+
+    def line_end(self, line: int) -> int:
+        '''
+        Return the offset of the end of a line, before its newline.
+
+        Args:
+            line (int): The line number.
+        '''
+        end = self.offset_of(line + 1)
+        if line + 1 < self.line_count():
+            end -= 1
+        return end
+
+    def line_length(self, line: int) -> int:
+        '''
+        Return the length of a line, counting its newline.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.lengths.get(line)
+
+    def line_lengths(self) -> list[int]:
+        '''
+        Return the length of every line, counting their newlines.
+        '''
+        return self.lengths.values()
+
+    def insert(self, offset: int, text: str):
+        '''
+        Update the index for text inserted at an offset.
+
+        Args:
+            offset (int): The offset the text was inserted at.
+            text (str): The inserted text.
+        '''
+        if not text:
+            return
+        line, line_start = self._find(offset)
+        length = self.lengths.get(line)
+        if "\n" not in text:
+            self.lengths.set(line, length + len(text))
+            return
+
+        # The line is split in two around the inserted lines
+        parts = text.split("\n")
+        column = offset - line_start
+        first = column + len(parts[0]) + 1
+        middle = [len(part) + 1 for part in parts[1:-1]]
+        last = length - column + len(parts[-1])
+        self.lengths.set(line, first)
+        self.lengths.insert(line + 1, middle + [last])
+
+    def delete(self, start: int, end: int):
+        '''
+        Update the index for the text from start to end being deleted.
+
+        Args:
+            start (int): The offset of the first deleted character.
+            end (int): The offset after the last deleted character.
+        '''
+        if start >= end:
+            return
+        first, first_start = self._find(start)
+        last, last_start = self._find(end)
+        if first == last:
+            self.lengths.set(first, self.lengths.get(first) - (end - start))
+            return
+
+        # The first and last lines are joined into one
+        tail = last_start + self.lengths.get(last) - end
+        self.lengths.set(first, start - first_start + tail)
+        self.lengths.delete(first + 1, last + 1)
+
+    # Protected Methods
+
+    def _find(self, offset: int) -> tuple[int, int]:
+        '''
+        Return the line containing an offset and the offset of its start.
+        The end of the document belongs to the last line.
+        '''
+        line, line_start = self.lengths.find(max(0, offset))
+        last_line = len(self.lengths) - 1
+        if line > last_line:
+            line = last_line
+            line_start = self.lengths.prefix(last_line)
+        return line, line_start
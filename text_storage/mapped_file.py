@@ -0,0 +1,354 @@
+# mapped_file.py
+import mmap
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import partial
+from text_storage.piece_table import PieceTable, Piece, ORIGINAL
+from text_storage.prefix_sum import PrefixSumList
+
+
+# Bytes per page of the mapped file, at least one UTF-8 character (4)
+PAGE_SIZE = 64 * 1024
+# Continuation bytes a UTF-8 character has at most
+MAX_CONTINUATION_BYTES = 3
+# Decoded pages kept in memory
+MAX_CACHED_PAGES = 64
+# Encodings whose pages can be decoded independently of each other
+SUPPORTED_ENCODINGS = ("utf-8", "latin-1")
+
+
+class MappedFileStorage(PieceTable):
+    # Constructor
+
+    def __init__(self, path: str, encoding: str = "utf-8"):
+        '''
+        A piece table whose original text is a memory-mapped file.
+        Initialize the storage.
+
+        The file is mapped read-only and split into pages. Opening it
+        only checks the encoding and counts the characters and newlines
+        of each page; pages are
+        decoded when a piece needs them and only the most recently used
+        ones are kept. Edits go to the add buffer as in PieceTable, so
+        memory grows with the visible text and the edits, not the file.
+        Newlines are translated to "\n" when pages are decoded, as when
+        reading the file in text mode.
+
+        Args:
+            path (str): The path of the file to open.
+            encoding (str): The encoding of the file, utf-8 or latin-1.
+        Raises:
+            UnicodeDecodeError: If the file is not valid in the encoding.
+        '''
+        if encoding not in SUPPORTED_ENCODINGS:
+            raise ValueError(f"Unsupported encoding for mapped files: "
+                             f"{encoding}")
+        super().__init__()
+        # Newlines in each piece, kept in step with piece_lengths
+        self.piece_newlines = PrefixSumList()
+        self.path = path
+        self.encoding = encoding
+        self.file = open(path, "rb")
+        self.mapped = None
+        self.page_cache = OrderedDict()
+        # Page start offsets in bytes, characters and newlines, with
+        # one extra entry for the end of the file
+        self.page_byte_starts = [0]
+        self.page_char_starts = [0]
+        self.page_newline_starts = [0]
+
+        file_size = self._get_file_size()
+        if file_size:
+            self.mapped = mmap.mmap(self.file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+            try:
+                self._index_pages(file_size)
+            except ValueError:
+                self.close()
+                raise
+        self.length = self.page_char_starts[-1]
+        if self.length:
+            self._replace_pieces(0, 0, [Piece(ORIGINAL, 0, self.length)])
+        self.line_index = MappedLineIndex(self)
+
+    # Public Methods
+
+    def close(self):
+        '''
+        Release the mapping and the file. The storage can not be read
+        afterwards.
+        '''
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+        self.file.close()
+        self.page_cache.clear()
+
+    def count_original_newlines(self, offset: int) -> int:
+        '''
+        Return the number of newlines in the file before an offset.
+
+        Args:
+            offset (int): The character offset in the original file.
+        '''
+        page = self._find_page(offset)
+        if offset >= self.page_char_starts[page + 1]:
+            # The end of the file
+            return self.page_newline_starts[page + 1]
+        column = offset - self.page_char_starts[page]
+        newlines = self.page_newline_starts[page]
+        if column:
+            newlines += self._decode_page(page).count("\n", 0, column)
+        return newlines
+
+    def count_newlines(self, piece: Piece) -> int:
+        '''
+        Return the number of newlines in a piece.
+
+        Args:
+            piece (Piece): The piece, of any source.
+        '''
+        if piece.source == ORIGINAL:
+            return (self.count_original_newlines(piece.start + piece.length)
+                    - self.count_original_newlines(piece.start))
+        return self._read_piece(piece).count("\n")
+
+    def find_original_newline(self, index: int) -> int:
+        '''
+        Return the character offset of a newline in the file.
+
+        Args:
+            index (int): The zero based number of the newline.
+        '''
+        page = bisect_right(self.page_newline_starts, index) - 1
+        text = self._decode_page(page)
+        position = -1
+        for _ in range(index - self.page_newline_starts[page] + 1):
+            position = text.find("\n", position + 1)
+        return self.page_char_starts[page] + position
+
+    # Protected Methods
+
+    def _replace_pieces(self, first: int, last: int, pieces: list):
+        '''
+        Replace pieces, counting the newlines of the new ones.
+        '''
+        super()._replace_pieces(first, last, pieces)
+        self.piece_newlines.delete(first, last)
+        self.piece_newlines.insert(
+            first, [self.count_newlines(piece) for piece in pieces])
+
+    def _get_file_size(self) -> int:
+        self.file.seek(0, 2)
+        return self.file.tell()
+
+    def _index_pages(self, file_size: int):
+        '''
+        Split the file into pages that end on character boundaries and
+        record how many characters and newlines each one holds.
+        '''
+        mapped = self.mapped
+        start = 0
+        while start < file_size:
+            end = min(start + PAGE_SIZE, file_size)
+            if self.encoding == "utf-8":
+                # Do not split a multi-byte character: step back over its
+                # continuation bytes (0b10xxxxxx) to where it starts
+                stop = end - MAX_CONTINUATION_BYTES
+                while end < file_size and 0x80 <= mapped[end] < 0xC0:
+                    if end == stop:
+                        raise UnicodeDecodeError(
+                            self.encoding, mapped[stop:stop + 4], 0, 4,
+                            "too many continuation bytes")
+                    end -= 1
+            if (end < file_size and mapped[end] == ord("\n")
+                    and mapped[end - 1] == ord("\r") and end - 1 > start):
+                # Keep "\r\n" on one page, it is one newline
+                end -= 1
+            page = mapped[start:end]
+            if page.isascii() or self.encoding != "utf-8":
+                chars = len(page)
+            else:
+                chars = len(page.decode(self.encoding))
+            newlines = page.count(b"\n")
+            if b"\r" in page:
+                # "\r\n" becomes one character, a lone "\r" a newline
+                crlf_count = page.count(b"\r\n")
+                chars -= crlf_count
+                newlines += page.count(b"\r") - crlf_count
+            self.page_byte_starts.append(end)
+            self.page_char_starts.append(self.page_char_starts[-1] + chars)
+            self.page_newline_starts.append(
+                self.page_newline_starts[-1] + newlines)
+            start = end
+
+    def _find_page(self, offset: int) -> int:
+        '''
+        Return the page holding a character offset. The end of the file
+        belongs to the last page.
+        '''
+        page = bisect_right(self.page_char_starts, offset) - 1
+        return max(0, min(page, len(self.page_char_starts) - 2))
+
+    def _decode_page(self, page: int) -> str:
+        '''
+        Return the decoded text of a page, decoding it if it is not in
+        the cache and evicting the least recently used page if needed.
+        '''
+        text = self.page_cache.get(page)
+        if text is not None:
+            self.page_cache.move_to_end(page)
+            return text
+        text = self._load_page(page)
+        self.page_cache[page] = text
+        if len(self.page_cache) > MAX_CACHED_PAGES:
+            self.page_cache.popitem(last=False)
+        return text
+
+    def _read_original(self, start: int, end: int) -> str:
+        '''
+        Return a span of the file, decoding only the pages it covers.
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character.
+        Returns:
+            str: The text of the span.
+        '''
+        return self._read_pages(start, end, self._decode_page)
+
+    def _get_original_reader(self):
+        '''
+        Return a function reading spans of the file from another thread.
+        It decodes pages itself instead of sharing the page cache.
+        '''
+        return partial(self._read_pages, decode=self._load_page)
+
+    def _load_page(self, page: int) -> str:
+        '''
+        Decode a page of the mapped file without caching it.
+        '''
+        if self.mapped is None:
+            return ""
+        raw = self.mapped[self.page_byte_starts[page]:
+                          self.page_byte_starts[page + 1]]
+        text = raw.decode(self.encoding)
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
+
+    def _read_pages(self, start: int, end: int, decode) -> str:
+        '''
+        Return a span of the file, decoding the pages it covers with
+        decode(page).
+        '''
+        parts = []
+        page = self._find_page(start)
+        while start < end:
+            page_start = self.page_char_starts[page]
+            page_end = self.page_char_starts[page + 1]
+            text = decode(page)
+            parts.append(text[start - page_start:min(end, page_end)
+                              - page_start])
+            start = page_end
+            page += 1
+        return "".join(parts)
+
+
+class MappedLineIndex:
+    '''
+    A line index for MappedFileStorage that is derived from the piece
+    list instead of storing every line, so opening a file with millions
+    of lines does not build a per line table.
+
+    The storage keeps the number of newlines in each piece in a
+    PrefixSumList next to the piece lengths: newlines in the original
+    file are counted from per page totals and the decoded page cache,
+    newlines in inserted text once when its piece is made. Queries cost
+    O(log pieces + page size).
+    '''
+
+    def __init__(self, storage: MappedFileStorage):
+        self.storage = storage
+
+    # Public Methods
+
+    def line_count(self) -> int:
+        '''Return the number of lines.'''
+        return 1 + self.storage.piece_newlines.total()
+
+    def line_of(self, offset: int) -> int:
+        '''Return the line containing an offset.'''
+        storage = self.storage
+        index, piece_start = storage.piece_lengths.find(max(0, offset))
+        newlines = storage.piece_newlines.prefix(index)
+        if index < len(storage.pieces):
+            piece = storage.pieces[index]
+            newlines += storage.count_newlines(
+                Piece(piece.source, piece.start, offset - piece_start))
+        return newlines
+
+    def offset_of(self, line: int) -> int:
+        '''Return the offset where a line starts.'''
+        if line <= 0:
+            return 0
+        storage = self.storage
+        # The piece holding the newline before the line
+        index, newlines = storage.piece_newlines.find(line - 1)
+        if index >= len(storage.pieces):
+            return storage.length
+        return (storage.piece_lengths.prefix(index)
+                + self._find_newline(storage.pieces[index],
+                                     line - 1 - newlines) + 1)
+
+    def line_end(self, line: int) -> int:
+        '''Return the offset of the end of a line, before its newline.'''
+        end = self.offset_of(line + 1)
+        if line + 1 < self.line_count():
+            end -= 1
+        return end
+
+    def line_length(self, line: int) -> int:
+        '''Return the length of a line, counting its newline.'''
+        return self.offset_of(line + 1) - self.offset_of(line)
+
+    def line_lengths(self):
+        '''
+        Yield the length of every line, counting their newlines. This
+        reads the whole document, one chunk at a time.
+        '''
+        length = 0
+        for chunk in self.storage.iter_chunks():
+            parts = chunk.split("\n")
+            for part in parts[:-1]:
+                yield length + len(part) + 1
+                length = 0
+            length += len(parts[-1])
+        yield length
+
+    def insert(self, offset: int, text: str):
+        '''Lines are derived from the pieces.'''
+
+    def delete(self, start: int, end: int):
+        '''Lines are derived from the pieces.'''
+
+    # Protected Methods
+
+    def _find_newline(self, piece: Piece, index: int) -> int:
+        '''
+        Return the offset of a newline inside a piece.
+
+        Args:
+            piece (Piece): The piece to search.
+            index (int): The zero based number of the newline.
+        '''
+        if piece.source == ORIGINAL:
+            storage = self.storage
+            before = storage.count_original_newlines(piece.start)
+            return (storage.find_original_newline(before + index)
+                    - piece.start)
+        text = self.storage._read_piece(piece)
+        position = -1
+        for _ in range(index + 1):
+            position = text.find("\n", position + 1)
+        return position
@@ -0,0 +1,345 @@
+# piece_table.py
+import io
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import accumulate
+from text_storage.line_index import LineIndex
+from text_storage.prefix_sum import PrefixSumList
+from text_storage.text_storage import TextSnapshot, TextStorage
+
+
+# Piece sources
+ORIGINAL = 0  # The read-only text the table was created with
+ADD = 1  # The append-only buffer holding the small inserts since
+# Any other source is the string of one large insert, kept as it is
+
+# A piece is a span of one of the sources
+Piece = namedtuple("Piece", ["source", "start", "length"])
+
+# Inserts at least this long, e.g. a chunk of a loading file, are not
+# copied into the add buffer
+LARGE_INSERT_SIZE = 4096
+
+
+class PieceTable(TextStorage):
+    # Snapshots share the text instead of copying it
+    snapshot_copies_text = False
+
+    # Constructor
+
+    def __init__(self, original_text: str = ""):
+        '''
+        A piece table implementation for text storage.
+        Initialize the piece table.
+
+        The original text is never copied or modified. Inserted text is
+        appended to the add buffer, or kept as its own string when it is
+        large, and the document is described by a list of pieces pointing
+        into these sources, so an edit only
+        touches the piece list no matter where it happens. The piece
+        lengths are kept in a PrefixSumList, so the piece holding an
+        offset is found in O(log n) however many edits split the text.
+
+        Args:
+            original_text (str): The text the document starts with.
+        '''
+        self.original = original_text
+        self.add_buffer = io.StringIO()
+        self.add_length = 0
+        self.pieces = []
+        self.piece_lengths = PrefixSumList()
+        if original_text:
+            self._replace_pieces(0, 0, [Piece(ORIGINAL, 0,
+                                              len(original_text))])
+        self.length = len(original_text)
+        self.cursor = 0
+        self.line_index = LineIndex(original_text)
+
+    # Public Methods
+
+    def get_text(self) -> str:
+        '''
+        Return the current text as a single string.
+
+        Returns:
+            str: The text in the text editor.
+        '''
+        return "".join(self._read_piece(piece) for piece in self.pieces)
+
+    def get_length(self) -> int:
+        '''
+        Return the length of the text
+        '''
+        return self.length
+
+    def get_range(self, start: int, end: int) -> str:
+        '''
+        Return the text from start to end, reading only the pieces that
+        overlap the range.
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character.
+        Returns:
+            str: The text in the range.
+        '''
+        start = max(0, start)
+        end = min(end, self.length)
+        if start >= end:
+            return ""
+        parts = []
+        index, piece_start = self._find_piece(start)
+        while piece_start < end:
+            piece = self.pieces[index]
+            low = max(start, piece_start) - piece_start
+            high = min(end, piece_start + piece.length) - piece_start
+            parts.append(self._read_piece(
+                Piece(piece.source, piece.start + low, high - low)))
+            piece_start += piece.length
+            index += 1
+        return "".join(parts)
+
+    def insert(self, char: str):
+        '''
+        Insert a character at the cursor position
+
+        Args:
+            char (str): The character to insert.
+        '''
+        self.insert_text(char)
+
+    def insert_text(self, text: str):
+        '''
+        Insert a string at the cursor position. Typing at the end of the
+        most recently inserted text grows its piece instead of adding a
+        new one.
+
+        Args:
+            text (str): The text to insert.
+        '''
+        if not text:
+            return
+
+        if len(text) >= LARGE_INSERT_SIZE:
+            # Strings are immutable, so snapshots share it
+            new_piece = Piece(text, 0, len(text))
+        else:
+            new_piece = Piece(ADD, self._append_to_add_buffer(text),
+                              len(text))
+        self.line_index.insert(self.cursor, text)
+        index, piece_start = self._find_piece(self.cursor)
+
+        if piece_start == self.cursor:
+            previous = self.pieces[index - 1] if index > 0 else None
+            if (previous is not None and new_piece.source == ADD
+                    and previous.source == ADD
+                    and previous.start + previous.length == new_piece.start):
+                # Extend the previous piece
+                self._replace_pieces(index - 1, index, [previous._replace(
+                    length=previous.length + len(text))])
+            else:
+                self._replace_pieces(index, index, [new_piece])
+        else:
+            # Split the piece around the new text
+            piece = self.pieces[index]
+            split = self.cursor - piece_start
+            self._replace_pieces(index, index + 1, [
+                Piece(piece.source, piece.start, split),
+                new_piece,
+                Piece(piece.source, piece.start + split,
+                      piece.length - split),
+            ])
+
+        self.length += len(text)
+        self.cursor += len(text)
+        self._changed(self.cursor - len(text), 0, text)
+
+    def delete(self):
+        '''
+        Delete the character before the cursor
+        '''
+        if self.cursor > 0:
+            self.delete_range(self.cursor - 1, self.cursor)
+
+    def delete_range(self, start: int, end: int):
+        '''
+        Delete the text from start to end by trimming the pieces at
+        both ends of the range and dropping the ones in between.
+
+        Args:
+            start (int): The offset of the first character to delete.
+            end (int): The offset after the last character to delete.
+        '''
+        start = max(0, start)
+        end = min(end, self.length)
+        if start >= end:
+            return
+
+        first, first_start = self._find_piece(start)
+        last, last_start = self._find_piece(end)
+
+        replacement = []
+        if start > first_start:
+            piece = self.pieces[first]
+            replacement.append(piece._replace(length=start - first_start))
+        if last < len(self.pieces):
+            piece = self.pieces[last]
+            offset = end - last_start
+            replacement.append(Piece(piece.source, piece.start + offset,
+                                     piece.length - offset))
+        self._replace_pieces(first, min(last + 1, len(self.pieces)),
+                             replacement)
+        self.line_index.delete(start, end)
+
+        self.length -= end - start
+        self.cursor = start
+        self._changed(start, end - start)
+
+    def move_cursor(self, position: int):
+        '''
+        Move the cursor to a new position. No text is moved.
+
+        Args:
+            position (int): The new cursor position.
+        '''
+        self.cursor = max(0, min(position, self.length))
+
+    def snapshot(self) -> "PieceTableSnapshot":
+        '''
+        Return an immutable copy of the text. Pieces are immutable and
+        the original text and large inserts never change, so only the
+        piece list and the add buffer (the small edits, not the loaded
+        document) are copied.
+        '''
+        return PieceTableSnapshot(list(self.pieces),
+                                  self.add_buffer.getvalue(),
+                                  self._get_original_reader())
+
+    # Protected Methods
+
+    def _find_piece(self, offset: int) -> tuple[int, int]:
+        '''
+        Find the piece containing an offset.
+
+        Args:
+            offset (int): The offset in the document.
+        Returns:
+            tuple[int, int]: The index of the piece and the document
+            offset where it starts. An offset at the end of the document
+            returns (len(self.pieces), self.length).
+        '''
+        return self.piece_lengths.find(offset)
+
+    def _replace_pieces(self, first: int, last: int, pieces: list):
+        '''
+        Replace the pieces from first to last (exclusive), keeping the
+        piece lengths in step.
+
+        Args:
+            first (int): The index of the first piece to replace.
+            last (int): The index after the last piece to replace.
+            pieces (list): The new pieces.
+        '''
+        self.pieces[first:last] = pieces
+        if last - first == 1 and len(pieces) == 1:
+            self.piece_lengths.set(first, pieces[0].length)
+            return
+        self.piece_lengths.delete(first, last)
+        self.piece_lengths.insert(first, [piece.length for piece in pieces])
+
+    def _append_to_add_buffer(self, text: str) -> int:
+        '''
+        Append text to the add buffer.
+
+        Args:
+            text (str): The text to append.
+        Returns:
+            int: The offset of the text in the add buffer.
+        '''
+        start = self.add_length
+        self.add_buffer.seek(start)
+        self.add_buffer.write(text)
+        self.add_length += len(text)
+        return start
+
+    def _read_piece(self, piece: Piece) -> str:
+        '''
+        Return the text a piece points to.
+
+        Args:
+            piece (Piece): The piece to read.
+        Returns:
+            str: The text of the piece.
+        '''
+        if piece.source == ORIGINAL:
+            return self._read_original(piece.start,
+                                       piece.start + piece.length)
+        if piece.source != ADD:
+            return piece.source[piece.start:piece.start + piece.length]
+        self.add_buffer.seek(piece.start)
+        return self.add_buffer.read(piece.length)
+
+    def _read_original(self, start: int, end: int) -> str:
+        '''
+        Return a span of the original text.
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character.
+        Returns:
+            str: The text of the span.
+        '''
+        return self.original[start:end]
+
+    def _get_original_reader(self):
+        '''
+        Return a function reading spans of the original text that is
+        safe to call from another thread.
+        '''
+        return self._read_original
+
+
+class PieceTableSnapshot(TextSnapshot):
+    '''
+    The text of a piece table at one moment: its pieces, a copy of the
+    add buffer and a reader for the original text. Pieces of large
+    inserts hold their own text.
+    '''
+
+    def __init__(self, pieces: list, add_text: str, read_original):
+        self.pieces = pieces
+        self.add_text = add_text
+        self.read_original = read_original
+        # Document offset where each piece starts, built when first read
+        self.piece_starts = None
+
+    def get_length(self) -> int:
+        self._index_pieces()
+        return self.piece_starts[-1]
+
+    def get_range(self, start: int, end: int) -> str:
+        self._index_pieces()
+        start = max(0, start)
+        end = min(end, self.piece_starts[-1])
+        parts = []
+        index = bisect_right(self.piece_starts, start) - 1
+        while start < end:
+            piece = self.pieces[index]
+            piece_start = self.piece_starts[index]
+            low = piece.start + start - piece_start
+            high = piece.start + min(end, piece_start + piece.length) \
+                - piece_start
+            if piece.source == ORIGINAL:
+                parts.append(self.read_original(low, high))
+            elif piece.source == ADD:
+                parts.append(self.add_text[low:high])
+            else:
+                parts.append(piece.source[low:high])
+            start = piece_start + piece.length
+            index += 1
+        return "".join(parts)
+
+    def _index_pieces(self):
+        if self.piece_starts is None:
+            self.piece_starts = [0, *accumulate(
+                piece.length for piece in self.pieces)]
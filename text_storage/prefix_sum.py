@@ -0,0 +1,248 @@
+# prefix_sum.py
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+
+# Number of values per block. Edits cost O(BLOCK_SIZE + log n).
+BLOCK_SIZE = 512
+
+
+class FenwickTree:
+    '''
+    A Fenwick (binary indexed) tree over a fixed number of integers,
+    giving O(log n) point updates, prefix sums and prefix searches.
+    '''
+
+    def __init__(self, values=()):
+        '''
+        Build the tree from a sequence of values in O(n).
+
+        Args:
+            values: The initial values.
+        '''
+        self.tree = [0] + list(values)
+        size = len(self.tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                self.tree[parent] += self.tree[i]
+
+    def __len__(self) -> int:
+        return len(self.tree) - 1
+
+    def add(self, index: int, delta: int):
+        '''
+        Add delta to the value at an index.
+        '''
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        '''
+        Return the sum of the values before an index.
+        '''
+        total = 0
+        i = index
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def search(self, target: int) -> tuple[int, int]:
+        '''
+        Find the first index whose running sum (inclusive) is greater
+        than target.
+
+        Args:
+            target (int): The sum to search for.
+        Returns:
+            tuple[int, int]: The index and the sum of the values before
+            it. Returns (len(self), total) if no such index exists.
+        '''
+        position = 0
+        remaining = target
+        step = 1 << (len(self.tree).bit_length() - 1)
+        while step:
+            next_position = position + step
+            if (next_position < len(self.tree)
+                    and self.tree[next_position] <= remaining):
+                position = next_position
+                remaining -= self.tree[next_position]
+            step >>= 1
+        return position, target - remaining
+
+
+class PrefixSumList:
+    '''
+    A list of non-negative integers supporting O(log n) prefix sums and
+    prefix searches together with cheap inserts and deletes.
+
+    Values are kept in blocks of about BLOCK_SIZE compact integers.
+    Two Fenwick trees over the blocks hold their lengths and sums; they
+    are rebuilt only when blocks are split or removed.
+    '''
+
+    def __init__(self, values=()):
+        '''
+        Initialize the list.
+
+        Args:
+            values: The initial values.
+        '''
+        values = array("q", values)
+        self.blocks = [values[i:i + BLOCK_SIZE]
+                       for i in range(0, len(values), BLOCK_SIZE)]
+        self._rebuild_trees()
+
+    # Public Methods
+
+    def __len__(self) -> int:
+        return self.length
+
+    def total(self) -> int:
+        '''Return the sum of all values.'''
+        return self.sum
+
+    def get(self, index: int) -> int:
+        '''Return the value at an index.'''
+        block, offset = self._locate(index)
+        return self.blocks[block][offset]
+
+    def set(self, index: int, value: int):
+        '''Replace the value at an index.'''
+        block, offset = self._locate(index)
+        delta = value - self.blocks[block][offset]
+        if delta:
+            self.blocks[block][offset] = value
+            self.sum_tree.add(block, delta)
+            self.sum += delta
+
+    def insert(self, index: int, values):
+        '''
+        Insert values before an index.
+
+        Args:
+            index (int): The index to insert at; len(self) appends.
+            values: The values to insert.
+        '''
+        values = array("q", values)
+        if not values:
+            return
+        if not self.blocks:
+            self.blocks = [array("q")]
+            self._rebuild_trees()
+        if index >= self.length:
+            block = len(self.blocks) - 1
+            offset = len(self.blocks[block])
+        else:
+            block, offset = self._locate(index)
+
+        self.blocks[block][offset:offset] = values
+        added = sum(values)
+        self.length += len(values)
+        self.sum += added
+        if len(self.blocks[block]) > 2 * BLOCK_SIZE:
+            # Split the block and rebuild the block trees
+            large = self.blocks[block]
+            self.blocks[block:block + 1] = [
+                large[i:i + BLOCK_SIZE]
+                for i in range(0, len(large), BLOCK_SIZE)]
+            self._rebuild_trees()
+        else:
+            self.length_tree.add(block, len(values))
+            self.sum_tree.add(block, added)
+
+    def delete(self, start: int, end: int):
+        '''
+        Delete the values from start (inclusive) to end (exclusive).
+        '''
+        start = max(0, start)
+        end = min(end, self.length)
+        if start >= end:
+            return
+        first_block, first_offset = self._locate(start)
+        last_block, last_offset = self._locate_end(end)
+
+        if first_block == last_block:
+            block = self.blocks[first_block]
+            removed = sum(block[first_offset:last_offset])
+            del block[first_offset:last_offset]
+            self.length -= end - start
+            self.sum -= removed
+            if block:
+                self.length_tree.add(first_block, start - end)
+                self.sum_tree.add(first_block, -removed)
+                return
+        else:
+            del self.blocks[first_block][first_offset:]
+            del self.blocks[last_block][:last_offset]
+            del self.blocks[first_block + 1:last_block]
+        self.blocks = [block for block in self.blocks if block]
+        self._rebuild_trees()
+
+    def prefix(self, index: int) -> int:
+        '''
+        Return the sum of the values before an index.
+        '''
+        if index >= self.length:
+            return self.sum
+        if index <= 0:
+            return 0
+        block, offset = self._locate(index)
+        return (self.sum_tree.prefix(block)
+                + sum(self.blocks[block][:offset]))
+
+    def find(self, target: int) -> tuple[int, int]:
+        '''
+        Find the index whose span of the running sum contains target,
+        i.e. the first index where prefix(index + 1) > target.
+
+        Args:
+            target (int): The sum to search for.
+        Returns:
+            tuple[int, int]: The index and prefix(index). Returns
+            (len(self), total()) if target is past the total.
+        '''
+        block, before = self.sum_tree.search(target)
+        if block >= len(self.blocks):
+            return self.length, self.sum
+        sums = list(accumulate(self.blocks[block]))
+        offset = bisect_right(sums, target - before)
+        if offset:
+            before += sums[offset - 1]
+        return self.length_tree.prefix(block) + offset, before
+
+    def values(self) -> list[int]:
+        '''Return all values as a list.'''
+        return [value for block in self.blocks for value in block]
+
+    # Protected Methods
+
+    def _rebuild_trees(self):
+        '''Rebuild the block trees and totals after blocks change.'''
+        lengths = [len(block) for block in self.blocks]
+        sums = [sum(block) for block in self.blocks]
+        self.length_tree = FenwickTree(lengths)
+        self.sum_tree = FenwickTree(sums)
+        self.length = sum(lengths)
+        self.sum = sum(sums)
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        '''
+        Return the block holding an index and the offset inside it.
+        '''
+        if not 0 <= index < self.length:
+            raise IndexError("PrefixSumList index out of range")
+        block, before = self.length_tree.search(index)
+        return block, index - before
+
+    def _locate_end(self, end: int) -> tuple[int, int]:
+        '''
+        Return the block and offset of an exclusive end index, keeping
+        it in the block of the last value in the range.
+        '''
+        block, offset = self._locate(end - 1)
+        return block, offset + 1
@@ -0,0 +1,377 @@
+# rope.py
+from text_storage.line_index import LineIndex
+from text_storage.text_storage import TextSnapshot, TextStorage
+
+
+# Leaves hold at most this many characters
+MAX_LEAF_SIZE = 1024
+
+
+class RopeLeaf:
+    '''An immutable leaf of a rope holding a chunk of text.'''
+    __slots__ = ("text", "length", "height")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        self.height = 1
+
+
+class RopeNode:
+    '''
+    An immutable internal node of a rope. The length of the subtree and
+    its height are cached so length queries and rebalancing are O(1).
+    '''
+    __slots__ = ("left", "right", "length", "height")
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.length = left.length + right.length
+        self.height = max(left.height, right.height) + 1
+
+
+class Rope(TextStorage):
+    # Snapshots share the text instead of copying it
+    snapshot_copies_text = False
+
+    # Constructor
+
+    def __init__(self, text: str = ""):
+        '''
+        A balanced rope implementation for text storage.
+        Initialize the rope.
+
+        The text is split into leaves of at most MAX_LEAF_SIZE characters
+        held in an AVL balanced binary tree, so insertions, deletions and
+        lookups at any position cost O(log n). Nodes are never modified;
+        edits build new nodes along one path and share the rest.
+
+        Args:
+            text (str): The text the document starts with.
+        '''
+        self.root = build_rope(text)
+        self.cursor = 0
+        self.line_index = LineIndex(text)
+
+    # Public Methods
+
+    def get_text(self) -> str:
+        '''
+        Return the current text as a single string.
+
+        Returns:
+            str: The text in the text editor.
+        '''
+        return "".join(leaf.text for leaf in iter_leaves(self.root))
+
+    def get_length(self) -> int:
+        '''
+        Return the length of the text
+        '''
+        return length_of(self.root)
+
+    def get_range(self, start: int, end: int) -> str:
+        '''
+        Return the text from start to end, visiting only the leaves that
+        overlap the range.
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character.
+        Returns:
+            str: The text in the range.
+        '''
+        return "".join(iter_rope_range(self.root, start, end))
+
+    def insert(self, char: str):
+        '''
+        Insert a character at the cursor position
+
+        Args:
+            char (str): The character to insert.
+        '''
+        self.insert_text(char)
+
+    def insert_text(self, text: str):
+        '''
+        Insert a string at the cursor position. If the leaf at the cursor
+        has room the text is added to it, otherwise the rope is split at
+        the cursor and joined back around the new text.
+
+        Args:
+            text (str): The text to insert.
+        '''
+        if not text:
+            return
+
+        root = None
+        if self.root is not None:
+            root = insert_into_leaf(self.root, self.cursor, text)
+        if root is None:
+            left, right = split_rope(self.root, self.cursor)
+            root = concat_ropes(concat_ropes(left, build_rope(text)), right)
+        self.root = root
+        self.line_index.insert(self.cursor, text)
+        self.cursor += len(text)
+        self._changed(self.cursor - len(text), 0, text)
+
+    def delete(self):
+        '''
+        Delete the character before the cursor
+        '''
+        if self.cursor > 0:
+            self.delete_range(self.cursor - 1, self.cursor)
+
+    def delete_range(self, start: int, end: int):
+        '''
+        Delete the text from start to end.
+
+        Args:
+            start (int): The offset of the first character to delete.
+            end (int): The offset after the last character to delete.
+        '''
+        start = max(0, start)
+        end = min(end, self.get_length())
+        if start >= end:
+            return
+
+        root = delete_from_leaf(self.root, start, end)
+        if root is None:
+            left, rest = split_rope(self.root, start)
+            _, right = split_rope(rest, end - start)
+            root = concat_ropes(left, right)
+        self.root = root
+        self.line_index.delete(start, end)
+        self.cursor = start
+        self._changed(start, end - start)
+
+    def move_cursor(self, position: int):
+        '''
+        Move the cursor to a new position. No text is moved.
+
+        Args:
+            position (int): The new cursor position.
+        '''
+        self.cursor = max(0, min(position, self.get_length()))
+
+    def snapshot(self) -> "RopeSnapshot":
+        '''
+        Return an immutable copy of the text in O(1). Nodes are never
+        modified, so keeping the current root is enough.
+        '''
+        return RopeSnapshot(self.root)
+
+
+class RopeSnapshot(TextSnapshot):
+    '''The text of a rope at one moment, held by its root node.'''
+
+    def __init__(self, root):
+        self.root = root
+
+    def get_length(self) -> int:
+        return length_of(self.root)
+
+    def get_range(self, start: int, end: int) -> str:
+        return "".join(iter_rope_range(self.root, start, end))
+
+
+# Rope Functions
+# Ropes are passed around as their root node; None is the empty rope.
+
+def length_of(node) -> int:
+    '''Return the length of a rope.'''
+    return node.length if node is not None else 0
+
+
+def height_of(node) -> int:
+    '''Return the height of a rope.'''
+    return node.height if node is not None else 0
+
+
+def build_rope(text: str):
+    '''
+    Build a perfectly balanced rope from a string.
+
+    Args:
+        text (str): The text of the rope.
+    Returns:
+        The root of the rope, or None for empty text.
+    '''
+    leaves = [RopeLeaf(text[i:i + MAX_LEAF_SIZE])
+              for i in range(0, len(text), MAX_LEAF_SIZE)]
+    return _build_from_leaves(leaves, 0, len(leaves))
+
+
+def _build_from_leaves(leaves: list, start: int, end: int):
+    if start >= end:
+        return None
+    if end - start == 1:
+        return leaves[start]
+    middle = (start + end) // 2
+    return RopeNode(_build_from_leaves(leaves, start, middle),
+                    _build_from_leaves(leaves, middle, end))
+
+
+def iter_leaves(node):
+    '''
+    Yield the leaves of a rope from left to right.
+
+    Args:
+        node: The root of the rope.
+    '''
+    stack = [node] if node is not None else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, RopeLeaf):
+            yield node
+        else:
+            stack.append(node.right)
+            stack.append(node.left)
+
+
+def iter_rope_range(node, start: int, end: int):
+    '''
+    Yield the text of a rope from start to end as leaf sized slices.
+    Costs O(log n) plus the number of leaves in the range.
+
+    Args:
+        node: The root of the rope.
+        start (int): The offset of the first character.
+        end (int): The offset after the last character.
+    '''
+    stack = [(node, 0)] if node is not None else []
+    while stack:
+        node, node_start = stack.pop()
+        if node_start >= end or node_start + node.length <= start:
+            continue
+        if isinstance(node, RopeLeaf):
+            yield node.text[max(0, start - node_start):end - node_start]
+        else:
+            stack.append((node.right, node_start + node.left.length))
+            stack.append((node.left, node_start))
+
+
+def concat_ropes(left, right):
+    '''
+    Join two ropes, keeping the result AVL balanced. Costs
+    O(|height(left) - height(right)|).
+
+    Args:
+        left: The root of the rope holding the start of the text.
+        right: The root of the rope holding the end of the text.
+    Returns:
+        The root of the joined rope.
+    '''
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if (isinstance(left, RopeLeaf) and isinstance(right, RopeLeaf)
+            and left.length + right.length <= MAX_LEAF_SIZE):
+        return RopeLeaf(left.text + right.text)
+    if left.height > right.height + 1:
+        return _balance(left.left, concat_ropes(left.right, right))
+    if right.height > left.height + 1:
+        return _balance(concat_ropes(left, right.left), right.right)
+    return RopeNode(left, right)
+
+
+def _balance(left, right) -> RopeNode:
+    '''
+    Build a node from two subtrees whose heights differ by at most two,
+    rotating once or twice if needed.
+    '''
+    if left.height > right.height + 1:
+        if left.left.height >= left.right.height:
+            return RopeNode(left.left, RopeNode(left.right, right))
+        middle = left.right
+        return RopeNode(RopeNode(left.left, middle.left),
+                        RopeNode(middle.right, right))
+    if right.height > left.height + 1:
+        if right.right.height >= right.left.height:
+            return RopeNode(RopeNode(left, right.left), right.right)
+        middle = right.left
+        return RopeNode(RopeNode(left, middle.left),
+                        RopeNode(middle.right, right.right))
+    return RopeNode(left, right)
+
+
+def split_rope(node, index: int):
+    '''
+    Split a rope in two at an offset.
+
+    Args:
+        node: The root of the rope.
+        index (int): The offset to split at.
+    Returns:
+        tuple: The roots of the ropes before and after the offset.
+    '''
+    if node is None:
+        return None, None
+    if index <= 0:
+        return None, node
+    if index >= node.length:
+        return node, None
+    if isinstance(node, RopeLeaf):
+        return RopeLeaf(node.text[:index]), RopeLeaf(node.text[index:])
+    left_length = node.left.length
+    if index < left_length:
+        left, right = split_rope(node.left, index)
+        return left, concat_ropes(right, node.right)
+    if index > left_length:
+        left, right = split_rope(node.right, index - left_length)
+        return concat_ropes(node.left, left), right
+    return node.left, node.right
+
+
+def insert_into_leaf(node, index: int, text: str):
+    '''
+    Insert text into the leaf at an offset, copying only the path to it.
+
+    Args:
+        node: The root of the rope.
+        index (int): The offset to insert at.
+        text (str): The text to insert.
+    Returns:
+        The root of the new rope, or None if the leaf has no room.
+    '''
+    if isinstance(node, RopeLeaf):
+        if node.length + len(text) > MAX_LEAF_SIZE:
+            return None
+        return RopeLeaf(node.text[:index] + text + node.text[index:])
+    left_length = node.left.length
+    # At a boundary prefer the left leaf so typing appends to it
+    if index <= left_length:
+        left = insert_into_leaf(node.left, index, text)
+        return RopeNode(left, node.right) if left is not None else None
+    right = insert_into_leaf(node.right, index - left_length, text)
+    return RopeNode(node.left, right) if right is not None else None
+
+
+def delete_from_leaf(node, start: int, end: int):
+    '''
+    Delete a range that lies inside one leaf, copying only the path to
+    it.
+
+    Args:
+        node: The root of the rope.
+        start (int): The offset of the first character to delete.
+        end (int): The offset after the last character to delete.
+    Returns:
+        The root of the new rope, or None if the range spans more than
+        one leaf or would empty the leaf.
+    '''
+    if isinstance(node, RopeLeaf):
+        if end - start >= node.length:
+            return None
+        return RopeLeaf(node.text[:start] + node.text[end:])
+    left_length = node.left.length
+    if end <= left_length:
+        left = delete_from_leaf(node.left, start, end)
+        return RopeNode(left, node.right) if left is not None else None
+    if start >= left_length:
+        right = delete_from_leaf(node.right, start - left_length,
+                                 end - left_length)
+        return RopeNode(node.left, right) if right is not None else None
+    return None
@@ -1,17 +1,57 @@
+import codecs
 from abc import ABC, abstractmethod
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+# Default number of characters per chunk for iter_chunks
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# A change to the text of a storage: removed_length characters were
+# removed at offset and inserted put there instead. version is the
+# storage's version after the change.
+ChangeEvent = namedtuple("ChangeEvent",
+                         ["offset", "removed_length", "inserted", "version"])
 
 
 class TextStorage(ABC):
+    # Change events. Class defaults, so that backends need no base
+    # constructor: the number of changes so far, the listeners and the
+    # changes of the batch in progress, if any.
+    version = 0
+    change_listeners = ()
+    pending_changes = None
+    # Whether snapshot() copies the whole text on the calling thread, so
+    # that callers should take snapshots less often as the text grows
+    snapshot_copies_text = True
+
     @abstractmethod
     def insert(self, char: str):
         '''Insert a characer at the current cursor position'''
         pass
 
+    @abstractmethod
+    def insert_text(self, text: str):
+        '''Insert a string at the current cursor position'''
+        pass
+
     @abstractmethod
     def delete(self):
         '''Delete the character before the cursor'''
         pass
 
+    @abstractmethod
+    def delete_range(self, start: int, end: int):
+        '''
+        Delete the text from start (inclusive) to end (exclusive) and
+        leave the cursor at start.
+
+        Args:
+            start (int): The offset of the first character to delete.
+            end (int): The offset after the last character to delete.
+        '''
+        pass
+
     @abstractmethod
     def move_cursor(self, position: int):
         '''Move the cursor to a new position'''
@@ -27,6 +67,205 @@ class TextStorage(ABC):
         '''
         pass
 
+    @abstractmethod
+    def get_range(self, start: int, end: int) -> str:
+        '''
+        Return the text from start (inclusive) to end (exclusive),
+        reading only that span of the storage.
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character.
+        Returns:
+            str: The text in the range.
+        '''
+        pass
+
     @abstractmethod
     def get_length(self) -> int:
         '''Return the length of the text'''
+        pass
+
+    def iter_chunks(self, start: int = 0, end: int = None,
+                    size: int = DEFAULT_CHUNK_SIZE):
+        '''
+        Yield the text from start to end in chunks of at most size
+        characters, so the whole text is never held as one string.
+        The storage must not be edited while iterating.
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character, or None for
+                the end of the text.
+            size (int): The maximum number of characters per chunk.
+        '''
+        length = self.get_length()
+        end = length if end is None else min(end, length)
+        for chunk_start in range(max(0, start), end, size):
+            yield self.get_range(chunk_start, min(chunk_start + size, end))
+
+    def iter_encoded_chunks(self, encoding: str):
+        '''
+        Yield the whole text encoded, a chunk at a time, e.g. to write it
+        to a file. Backends that keep the text encoded override this to
+        skip the encoding.
+
+        Args:
+            encoding (str): The encoding to use.
+        Raises:
+            UnicodeEncodeError: If the text can not be encoded.
+        '''
+        encoder = codecs.getincrementalencoder(encoding)()
+        for chunk in self.iter_chunks():
+            yield encoder.encode(chunk)
+        yield encoder.encode("", final=True)
+
+    def subscribe(self, listener):
+        '''
+        Call a function after every operation that changes the text, so
+        caches of the text can be updated by the size of the change.
+
+        Args:
+            listener: Called with the list of ChangeEvents the operation
+                made, in order; each offset is in the text the changes
+                before it left.
+        '''
+        self.change_listeners = (*self.change_listeners, listener)
+
+    def unsubscribe(self, listener):
+        '''
+        Stop calling a function added with subscribe.
+        '''
+        listeners = list(self.change_listeners)
+        listeners.remove(listener)
+        self.change_listeners = tuple(listeners)
+
+    @contextmanager
+    def batch(self):
+        '''
+        Deliver the changes made in a with block to the listeners as one
+        list when it ends, e.g. the changes of an edit at several
+        cursors. Batches nest; the outermost one delivers.
+        '''
+        if self.pending_changes is not None:
+            yield
+            return
+        self.pending_changes = []
+        try:
+            yield
+        finally:
+            changes, self.pending_changes = self.pending_changes, None
+            if changes:
+                for listener in self.change_listeners:
+                    listener(changes)
+
+    def snapshot(self) -> "TextSnapshot":
+        '''
+        Return an immutable copy of the text that later edits do not
+        change and that can be read from another thread. This copies the
+        whole text; backends override it with something cheaper and clear
+        snapshot_copies_text when it does not grow with the text.
+        '''
+        return TextSnapshot(self.get_text())
+
+    # Protected Methods
+
+    def _changed(self, offset: int, removed_length: int, inserted: str = ""):
+        '''
+        Report a change to the text. Backends call this after every edit.
+
+        Args:
+            offset (int): Where the text changed.
+            removed_length (int): The number of characters removed.
+            inserted (str): The text inserted.
+        '''
+        self.version += 1
+        if not self.change_listeners:
+            return
+        change = ChangeEvent(offset, removed_length, inserted, self.version)
+        if self.pending_changes is not None:
+            self.pending_changes.append(change)
+            return
+        for listener in self.change_listeners:
+            listener([change])
+
+    # Line Methods
+    # Backends keep self.line_index (a LineIndex) up to date on every
+    # edit, so these never need the whole text.
+
+    def line_count(self) -> int:
+        '''Return the number of lines in the text'''
+        return self.line_index.line_count()
+
+    def line_of(self, offset: int) -> int:
+        '''
+        Return the line containing an offset.
+
+        Args:
+            offset (int): The character offset in the text.
+        '''
+        return self.line_index.line_of(offset)
+
+    def offset_of(self, line: int) -> int:
+        '''
+        Return the offset where a line starts.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.line_index.offset_of(line)
+
+    def line_length(self, line: int) -> int:
+        '''
+        Return the length of a line, counting its newline.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.line_index.line_length(line)
+
+    def line_lengths(self):
+        '''Return the lengths of all lines, counting their newlines'''
+        return self.line_index.line_lengths()
+
+    def get_line(self, line: int) -> str:
+        '''
+        Return the text of a line without its newline.
+
+        Args:
+            line (int): The line number.
+        '''
+        return self.get_range(self.line_index.offset_of(line),
+                              self.line_index.line_end(line))
+
+
+class TextSnapshot:
+    '''
+    The text of a storage at one moment. It has the reading methods of
+    TextStorage but never changes, so it can be read from another thread
+    while the storage is edited.
+    '''
+
+    def __init__(self, text: str = ""):
+        self.text = text
+
+    def get_length(self) -> int:
+        '''Return the length of the text'''
+        return len(self.text)
+
+    def get_range(self, start: int, end: int) -> str:
+        '''
+        Return the text from start (inclusive) to end (exclusive).
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character.
+        '''
+        return self.text[max(0, start):max(0, end)]
+
+    def get_text(self) -> str:
+        '''Return the text as a single string'''
+        return self.get_range(0, self.get_length())
+
+    # Snapshots are read in chunks the same way as storages
+    iter_chunks = TextStorage.iter_chunks
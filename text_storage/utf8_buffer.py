@@ -0,0 +1,354 @@
+# utf8_buffer.py
+import codecs
+from bisect import bisect_right
+from itertools import accumulate
+from text_storage.line_index import LineIndex
+from text_storage.prefix_sum import PrefixSumList
+from text_storage.text_storage import TextSnapshot, TextStorage
+
+
+ENCODING = "utf-8"
+# Largest block in bytes. An edit copies the block it falls in.
+MAX_BLOCK_SIZE = 4096
+# Blocks that deletes shrink below this are merged with the next one
+MIN_BLOCK_SIZE = MAX_BLOCK_SIZE // 4
+
+
+class Utf8Buffer(TextStorage):
+    # Snapshots share the text instead of copying it
+    snapshot_copies_text = False
+
+    # Constructor
+
+    def __init__(self, data: bytes = b""):
+        '''
+        A text storage that keeps the text as UTF-8 bytes.
+        Initialize the buffer.
+
+        The bytes are split into immutable blocks of at most
+        MAX_BLOCK_SIZE bytes that end on character boundaries. The
+        number of characters in each block is kept in a PrefixSumList,
+        a sparse index from character offsets to byte offsets: an
+        offset is found by a prefix search over the blocks, and then
+        only its block is looked at. A block with as many bytes as
+        characters is pure ASCII, so the byte offset is the character
+        offset; other blocks are decoded to find it.
+
+        Mostly-ASCII text costs about a byte per character, and files
+        are loaded and saved without decoding or encoding them.
+
+        Args:
+            data (bytes): The UTF-8 text the document starts with, with
+                "\\n" newlines.
+        Raises:
+            UnicodeDecodeError: If data is not valid UTF-8.
+        '''
+        self.blocks = _split_blocks(data)
+        self.char_counts = PrefixSumList(
+            _count_chars(block) for block in self.blocks)
+        self.cursor = 0
+        self.line_index = LineIndex.from_lengths(_get_line_lengths(data))
+
+    @classmethod
+    def from_file(cls, path: str, encoding: str = ENCODING) -> "Utf8Buffer":
+        '''
+        Load a file without decoding it. Newlines are translated as when
+        reading the file in text mode.
+
+        Args:
+            path (str): The path of the file to open.
+            encoding (str): The encoding of the file, which must be
+                UTF-8 (or ASCII, which is a part of it).
+        Returns:
+            Utf8Buffer: The buffer holding the file's text.
+        Raises:
+            ValueError: If the encoding is not supported.
+            UnicodeDecodeError: If the file is not valid UTF-8.
+        '''
+        name = codecs.lookup(encoding).name
+        if name not in ("utf-8", "ascii"):
+            raise ValueError(f"Unsupported encoding for UTF-8 buffers: "
+                             f"{encoding}")
+        with open(path, "rb") as file:
+            data = file.read()
+        if name == "ascii" and not data.isascii():
+            # Raises the same error as reading the file as text
+            data.decode(name)
+        if b"\r" in data:
+            data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        return cls(data)
+
+    # Public Methods
+
+    def get_text(self) -> str:
+        '''
+        Return the current text as a single string.
+
+        Returns:
+            str: The text in the text editor.
+        '''
+        return b"".join(self.blocks).decode(ENCODING)
+
+    def get_length(self) -> int:
+        '''
+        Return the length of the text
+        '''
+        return self.char_counts.total()
+
+    def get_range(self, start: int, end: int) -> str:
+        '''
+        Return the text from start to end, decoding only the bytes of
+        the range.
+
+        Args:
+            start (int): The offset of the first character.
+            end (int): The offset after the last character.
+        Returns:
+            str: The text in the range.
+        '''
+        start = max(0, start)
+        end = min(end, self.get_length())
+        if start >= end:
+            return ""
+        index, block_start = self.char_counts.find(start)
+        parts = []
+        while block_start < end:
+            count = self.char_counts.get(index)
+            low = self._byte_offset(index, max(start, block_start)
+                                    - block_start)
+            high = self._byte_offset(index, min(end, block_start + count)
+                                     - block_start)
+            parts.append(self.blocks[index][low:high])
+            block_start += count
+            index += 1
+        return b"".join(parts).decode(ENCODING)
+
+    def insert(self, char: str):
+        '''
+        Insert a character at the cursor position
+
+        Args:
+            char (str): The character to insert.
+        '''
+        self.insert_text(char)
+
+    def insert_text(self, text: str):
+        '''
+        Insert a string at the cursor position. The text is encoded once
+        and spliced into the block holding the cursor, which is split if
+        it grows too large.
+
+        Args:
+            text (str): The text to insert.
+        '''
+        if not text:
+            return
+        data = text.encode(ENCODING)
+        self.line_index.insert(self.cursor, text)
+        if not self.blocks:
+            self._replace_blocks(0, 1, data, len(text))
+        else:
+            # At a block boundary the text goes at the end of the block
+            # before it, so typing at the end of the text appends
+            index, block_start = self.char_counts.find(
+                max(0, self.cursor - 1))
+            column = self.cursor - block_start
+            split = self._byte_offset(index, column)
+            block = self.blocks[index]
+            self._replace_blocks(index, index + 1,
+                                 block[:split] + data + block[split:],
+                                 self.char_counts.get(index) + len(text))
+        self.cursor += len(text)
+        self._changed(self.cursor - len(text), 0, text)
+
+    def delete(self):
+        '''
+        Delete the character before the cursor
+        '''
+        if self.cursor > 0:
+            self.delete_range(self.cursor - 1, self.cursor)
+
+    def delete_range(self, start: int, end: int):
+        '''
+        Delete the text from start to end. The blocks at both ends of the
+        range are trimmed and joined, and the ones between are dropped.
+
+        Args:
+            start (int): The offset of the first character to delete.
+            end (int): The offset after the last character to delete.
+        '''
+        start = max(0, start)
+        end = min(end, self.get_length())
+        if start >= end:
+            return
+        first, first_start = self.char_counts.find(start)
+        last, last_start = self.char_counts.find(end - 1)
+        head = self.blocks[first][:self._byte_offset(first,
+                                                     start - first_start)]
+        tail = self.blocks[last][self._byte_offset(last, end - last_start):]
+        count = (start - first_start + last_start
+                 + self.char_counts.get(last) - end)
+
+        last += 1
+        if (len(head) + len(tail) < MIN_BLOCK_SIZE
+                and last < len(self.blocks)):
+            # Merge what is left with the next block
+            tail += self.blocks[last]
+            count += self.char_counts.get(last)
+            last += 1
+        self._replace_blocks(first, last, head + tail, count)
+        self.line_index.delete(start, end)
+        self.cursor = start
+        self._changed(start, end - start)
+
+    def move_cursor(self, position: int):
+        '''
+        Move the cursor to a new position. No text is moved.
+
+        Args:
+            position (int): The new cursor position.
+        '''
+        self.cursor = max(0, min(position, self.get_length()))
+
+    def iter_encoded_chunks(self, encoding: str):
+        '''
+        Yield the text encoded for a file. UTF-8 (and ASCII, when the
+        text is pure ASCII) is the stored bytes as they are.
+        '''
+        name = codecs.lookup(encoding).name
+        if name == "utf-8" or (name == "ascii" and self._is_ascii()):
+            yield from self.blocks
+            return
+        yield from super().iter_encoded_chunks(encoding)
+
+    def snapshot(self) -> "Utf8BufferSnapshot":
+        '''
+        Return an immutable copy of the text. Blocks are never changed in
+        place, so only the list of blocks and their character counts are
+        copied.
+        '''
+        return Utf8BufferSnapshot(list(self.blocks),
+                                  self.char_counts.values())
+
+    # Protected Methods
+
+    def _byte_offset(self, index: int, column: int) -> int:
+        '''
+        Return the byte offset of a character in a block. ASCII blocks
+        need no decoding.
+
+        Args:
+            index (int): The index of the block.
+            column (int): The character offset in the block.
+        '''
+        block = self.blocks[index]
+        if column == 0 or len(block) == self.char_counts.get(index):
+            return column
+        return len(block.decode(ENCODING)[:column].encode(ENCODING))
+
+    def _replace_blocks(self, first: int, last: int, data: bytes,
+                        count: int):
+        '''
+        Replace the blocks from first to last (exclusive) with data,
+        split into blocks if it is too large.
+
+        Args:
+            first (int): The index of the first block to replace.
+            last (int): The index after the last block to replace.
+            data (bytes): The new bytes.
+            count (int): The number of characters in data.
+        '''
+        if len(data) <= MAX_BLOCK_SIZE:
+            blocks = [data] if data else []
+            counts = [count] if data else []
+        else:
+            blocks = _split_blocks(data)
+            counts = [_count_chars(block) for block in blocks]
+        last = min(last, len(self.blocks))
+        if last - first == 1 and len(blocks) == 1:
+            self.blocks[first] = data
+            self.char_counts.set(first, count)
+            return
+        self.blocks[first:last] = blocks
+        self.char_counts.delete(first, last)
+        self.char_counts.insert(first, counts)
+
+    def _is_ascii(self) -> bool:
+        '''
+        Return whether the text is pure ASCII, which is the case when it
+        has as many bytes as characters.
+        '''
+        return sum(map(len, self.blocks)) == self.get_length()
+
+
+class Utf8BufferSnapshot(TextSnapshot):
+    '''
+    The text of a UTF-8 buffer at one moment: its blocks and their
+    character counts.
+    '''
+
+    def __init__(self, blocks: list[bytes], char_counts: list[int]):
+        self.blocks = blocks
+        self.char_counts = char_counts
+        self.block_starts = [0, *accumulate(char_counts)]
+
+    def get_length(self) -> int:
+        return self.block_starts[-1]
+
+    def get_range(self, start: int, end: int) -> str:
+        start = max(0, start)
+        end = min(end, self.block_starts[-1])
+        parts = []
+        index = bisect_right(self.block_starts, start) - 1
+        while start < end:
+            block = self.blocks[index]
+            block_start = self.block_starts[index]
+            low = start - block_start
+            high = min(end, self.block_starts[index + 1]) - block_start
+            if len(block) == self.char_counts[index]:
+                parts.append(block[low:high].decode(ENCODING))
+            else:
+                parts.append(block.decode(ENCODING)[low:high])
+            start = self.block_starts[index + 1]
+            index += 1
+        return "".join(parts)
+
+
+def _split_blocks(data: bytes) -> list[bytes]:
+    '''
+    Split UTF-8 bytes into blocks of at most MAX_BLOCK_SIZE bytes that
+    do not cut a character in two.
+    '''
+    blocks = []
+    start = 0
+    while start < len(data):
+        end = min(start + MAX_BLOCK_SIZE, len(data))
+        # Continuation bytes are 0b10xxxxxx
+        while start < end < len(data) and 0x80 <= data[end] < 0xC0:
+            end -= 1
+        if end == start:
+            end = min(start + MAX_BLOCK_SIZE, len(data))
+        blocks.append(bytes(data[start:end]))
+        start = end
+    return blocks
+
+
+def _count_chars(block: bytes) -> int:
+    '''
+    Return the number of characters in a block of UTF-8 bytes.
+    '''
+    if block.isascii():
+        return len(block)
+    return len(block.decode(ENCODING))
+
+
+def _get_line_lengths(data: bytes) -> list[int]:
+    '''
+    Return the length in characters of every line, counting newlines.
+    '''
+    lengths = [len(line) + 1 if line.isascii()
+               else len(line.decode(ENCODING)) + 1
+               for line in data.split(b"\n")]
+    # The last line has no trailing newline
+    lengths[-1] -= 1
+    return lengths